@@ -0,0 +1,79 @@
+"""
+Reports entries/second for BeancountExporter, writing to a file, against the
+print-per-entry exporter it replaced.
+
+Run from the repository root with: python -m benchmarks.bench_beancount_export
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable
+
+from benchmarks.synthetic import journal_entries
+from metamoney.exporters.beancount import BeancountExporter
+from metamoney.models.transactions import JournalEntry
+
+
+def legacy_export(path: Path, journal_entries: Iterable[JournalEntry]):
+    with open(path, "w") as stream:
+        prev_entry = None
+        for entry in journal_entries:
+            cur_date = entry.timestamp
+            prev_date = prev_entry.timestamp if prev_entry else cur_date
+            if prev_entry and (
+                cur_date.day > prev_date.day
+                or cur_date.month > prev_date.month
+                or cur_date.year > prev_date.year
+            ):
+                balanced = list(filter(lambda t: t.balance, prev_entry.transactions))
+                lines = list(
+                    map(
+                        lambda t: f"{cur_date.strftime('%Y-%m-%d')} balance {t.account} {t.balance} {t.currency}",
+                        balanced,
+                    )
+                )
+                lines.append("\n")
+                print("\n".join(lines), file=stream, end="")
+
+            lines = [f"{entry.timestamp.strftime('%Y-%m-%d')} * \"{entry.narration}\""]
+            for t in entry.transactions:
+                lines.append(f"\t{t.account} {t.amount} {t.currency}")
+            lines.append("\n")
+            print("\n".join(lines), file=stream, end="")
+            prev_entry = entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--buffer-size", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    entries = list(journal_entries(args.entries))
+    exporter = BeancountExporter(buffer_size=args.buffer_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = Path(directory) / "legacy.beancount"
+        buffered_path = Path(directory) / "buffered.beancount"
+
+        timings = {}
+        start = time.perf_counter()
+        legacy_export(legacy_path, entries)
+        timings["print"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exporter.export_to_path(buffered_path, entries)
+        timings["buffered"] = time.perf_counter() - start
+
+        if legacy_path.read_bytes() != buffered_path.read_bytes():
+            raise AssertionError("Buffered export differs from the legacy export")
+
+    print(f"{'exporter':<10}{'seconds':>10}{'entries/s':>14}")
+    for name, elapsed in timings.items():
+        print(f"{name:<10}{elapsed:>10.2f}{args.entries / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
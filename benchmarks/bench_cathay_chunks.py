@@ -0,0 +1,64 @@
+"""
+Compares reading a single large synthetic Cathay export in one process against
+splitting it into chunks parsed by several worker processes. Files are split
+however small they are, but there are never more workers than usable CPUs.
+
+Run from the repository root with: python -m benchmarks.bench_cathay_chunks
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_cathay_csv
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.importers.chunks import DEFAULT_CHUNK_BYTES, parallel_jobs
+from metamoney.models.data_sources import DataSource
+from metamoney.models.stream_info import StreamInfo
+
+
+def read_all(importer: CathayCsvImporter, statement: Path) -> int:
+    with open(statement) as stream:
+        data_source = DataSource(
+            importer.data_institution(),
+            importer.data_format(),
+            StreamInfo(stream, str(statement)),
+        )
+        return sum(1 for _ in importer.extract(data_source))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        statement = Path(directory) / "cathay.csv"
+        with open(statement, "w", newline="") as stream:
+            write_cathay_csv(stream, args.rows)
+
+        timings = {}
+        parallel = parallel_jobs(args.jobs)
+        for name, jobs in (("serial", 1), (f"{parallel} jobs", parallel)):
+            importer = CathayCsvImporter(
+                jobs=jobs, chunk_bytes=args.chunk_bytes, min_parallel_bytes=0
+            )
+            # Skip the per-row warning for the header, which isn't what's measured
+            importer.logger.disabled = True
+            start = time.perf_counter()
+            read_all(importer, statement)
+            timings[name] = time.perf_counter() - start
+
+    print(f"{'reader':<10}{'seconds':>10}{'rows/s':>14}")
+    for name, elapsed in timings.items():
+        print(f"{name:<10}{elapsed:>10.2f}{args.rows / elapsed:>14,.0f}")
+    serial, parallel = timings.values()
+    print(f"speedup: {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares CathayCsvImporter.read_cathay_csv_row against the strptime-based row
+parser it replaced, on rows from a synthetic Cathay export.
+
+Run from the repository root with: python -m benchmarks.bench_cathay_parse
+"""
+
+import argparse
+import logging
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from benchmarks.synthetic import cathay_rows
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.models.transactions import CathayTransaction
+
+logger = logging.getLogger("bench_cathay_parse")
+
+
+def legacy_clean_number_string(num_string: str) -> Decimal:
+    clean = num_string.replace(",", "").replace(chr(8722), "")
+    if len(clean) > 0:
+        return Decimal(clean)
+    else:
+        return Decimal(0)
+
+
+def legacy_read_cathay_csv_row(row: list[str]) -> CathayTransaction:
+    logger.debug(row)
+    return CathayTransaction(
+        uuid.uuid4().hex,
+        datetime.strptime(row[0], "%Y/%m/%d\n%H:%M"),
+        datetime.strptime(row[1], "%Y/%m/%d"),
+        row[2].strip(),
+        legacy_clean_number_string(row[3]),
+        legacy_clean_number_string(row[4]),
+        legacy_clean_number_string(row[5]),
+        row[6],
+        row[7].strip(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = list(cathay_rows(args.rows))
+    importer = CathayCsvImporter()
+
+    timings = {}
+    for name, parse in (
+        ("strptime", legacy_read_cathay_csv_row),
+        ("fast", importer.read_cathay_csv_row),
+    ):
+        start = time.perf_counter()
+        for row in rows:
+            parse(row)
+        timings[name] = time.perf_counter() - start
+
+    print(f"{'parser':<10}{'seconds':>10}{'rows/s':>14}")
+    for name, elapsed in timings.items():
+        print(f"{name:<10}{elapsed:>10.2f}{args.rows / elapsed:>14,.0f}")
+    print(f"speedup: {timings['strptime'] / timings['fast']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
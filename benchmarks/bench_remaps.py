@@ -0,0 +1,132 @@
+"""
+Compares the allocations made by applying remaps to journal entries with
+copy-on-write updates against the deepcopy-based remaps they replaced.
+
+Run from the repository root with: python -m benchmarks.bench_remaps
+"""
+
+import argparse
+import time
+import tracemalloc
+from copy import deepcopy
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable
+
+from metamoney.mappers.mapper import AddCounterTransactionRemap, SetNarrationRemap
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+
+
+@dataclass
+class MutableTransaction:
+    transaction_id: str
+    timestamp: datetime
+    payee: str | None
+    description: str | None
+    amount: Decimal
+    balance: Decimal | None
+    currency: str
+    account: str
+    institution: str | None
+
+
+@dataclass
+class MutableEntry:
+    timestamp: datetime
+    narration: str
+    transactions: list[MutableTransaction]
+
+
+def deepcopy_set_narration(new_narration: str):
+    def remap(entry: MutableEntry) -> MutableEntry:
+        new_entry = deepcopy(entry)
+        new_entry.narration = new_narration
+        return new_entry
+
+    return remap
+
+
+def deepcopy_add_counter(category: str):
+    def remap(entry: MutableEntry) -> MutableEntry:
+        new_entry = deepcopy(entry)
+        asset = entry.transactions[0]
+        new_entry.transactions.append(
+            MutableTransaction(
+                "counter",
+                asset.timestamp,
+                None,
+                None,
+                -asset.amount,
+                None,
+                asset.currency,
+                category,
+                None,
+            )
+        )
+        return new_entry
+
+    return remap
+
+
+def make_fields(i: int) -> tuple:
+    timestamp = datetime(2020, 1, 1) + timedelta(hours=i)
+    return (
+        f"{i:032x}",
+        timestamp,
+        "VULTR INC",
+        "VULTR INC CARD",
+        Decimal(-(i % 5000)),
+        Decimal(100000 - i),
+        "NTD",
+        "Assets:Checking:Cathay",
+        "cathay_tw",
+    )
+
+
+def measure(entries: list, remaps: list[Callable]) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = []
+    for entry in entries:
+        for remap in remaps:
+            entry = remap(entry)
+        results.append(entry)
+    elapsed = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated / len(entries), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    frozen_entries = []
+    mutable_entries = []
+    for i in range(args.entries):
+        fields = make_fields(i)
+        frozen_entries.append(
+            JournalEntry(fields[1], fields[3], (GenericTransaction(*fields),))
+        )
+        mutable_entries.append(
+            MutableEntry(fields[1], fields[3], [MutableTransaction(*fields)])
+        )
+
+    cow_bytes, cow_time = measure(
+        frozen_entries,
+        [AddCounterTransactionRemap("Expenses:Hosting"), SetNarrationRemap("Vultr")],
+    )
+    copy_bytes, copy_time = measure(
+        mutable_entries,
+        [deepcopy_add_counter("Expenses:Hosting"), deepcopy_set_narration("Vultr")],
+    )
+
+    print(f"{'remaps':<12}{'bytes/entry':>14}{'seconds':>10}")
+    print(f"{'deepcopy':<12}{copy_bytes:>14.0f}{copy_time:>10.2f}")
+    print(f"{'replace':<12}{cow_bytes:>14.0f}{cow_time:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
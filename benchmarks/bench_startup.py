@@ -0,0 +1,96 @@
+"""
+Measures how long it takes to start the metamoney CLI, using the cumulative
+import times reported by python -X importtime and the wall time of running
+"metamoney list outputs".
+
+Run from the repository root with: python -m benchmarks.bench_startup
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MINIMAL_CONFIG = "importers = []\nexporters = []\nmappings = []\n"
+
+
+def import_times(env: dict[str, str]) -> dict[str, int]:
+    """Returns the cumulative import time of each module in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import metamoney.cli"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def command_time(env: dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "metamoney.cli", "list", "outputs"],
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--output", type=Path, help="Also write the results to this JSON file."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # Use an empty config so that results don't depend on the user's own
+        config_dir = Path(home) / ".metamoney"
+        config_dir.mkdir()
+        (config_dir / "__init__.py").write_text(MINIMAL_CONFIG)
+        env = {**os.environ, "HOME": home}
+
+        runs = [import_times(env) for _ in range(args.runs)]
+        commands = [command_time(env) for _ in range(args.runs)]
+
+    modules = {
+        module: statistics.median(run.get(module, 0) for run in runs)
+        for module in runs[0]
+    }
+    results = {
+        "import_metamoney_cli_ms": modules["metamoney.cli"] / 1000,
+        "list_outputs_ms": statistics.median(commands) * 1000,
+        "slowest_imports_ms": {
+            module: cumulative / 1000
+            for module, cumulative in sorted(
+                modules.items(), key=lambda item: item[1], reverse=True
+            )[1 : args.top + 1]
+        },
+    }
+
+    print(f"import metamoney.cli: {results['import_metamoney_cli_ms']:.1f} ms")
+    print(f"metamoney list outputs: {results['list_outputs_ms']:.1f} ms")
+    print("slowest imports (cumulative):")
+    for module, cumulative in results["slowest_imports_ms"].items():
+        print(f"  {cumulative:>8.1f} ms  {module}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
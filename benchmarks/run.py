@@ -0,0 +1,155 @@
+"""
+Measures the throughput of each stage of the journal pipeline (extract,
+transform, mapping and Beancount export) on synthetic Cathay statements, and
+compares it against a baseline saved by an earlier run.
+
+Each size is run as a single streaming pipeline, with every stage timed by
+metamoney.profiling.Profiler, so memory stays bounded even at 1M rows.
+
+Run from the repository root with: python -m benchmarks.run
+Save a baseline with --save-baseline; later runs compare against it and exit
+with status 1 if any stage is slower by more than --threshold.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.synthetic import synthetic_mappings, write_cathay_csv
+from metamoney.exporters.beancount import BeancountExporter
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.mappers.mapper import GeneralMapper, InitialMapper
+from metamoney.models.data_sources import DataSource
+from metamoney.models.stream_info import StreamInfo
+from metamoney.profiling import Profiler
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = Path(__file__).parent / ".baseline.json"
+# Stage names used by Profiler, and what they're reported as
+STAGES = {
+    "extract": "extract",
+    "transform": "transform",
+    "general_map": "map",
+    "export": "export",
+}
+
+
+def run_pipeline(statement: Path, output: Path, mappings: list) -> dict[str, float]:
+    """Runs the pipeline once, returning the rows/second of each stage."""
+    importer = CathayCsvImporter()
+    # Skip the per-row warning for the header, which isn't what's measured
+    importer.logger.disabled = True
+    mapper = GeneralMapper(mappings)
+    profiler = Profiler(trace_memory=False)
+
+    with profiler, open(statement) as stream:
+        data_source = DataSource(
+            importer.data_institution(),
+            importer.data_format(),
+            StreamInfo(stream, str(statement)),
+        )
+        transactions = profiler.stage("extract", importer.extract(data_source))
+        generic = profiler.stage("transform", importer.transform(transactions))
+        entries = InitialMapper().map(generic, [])
+        mapped = profiler.stage("general_map", mapper.map([], entries))
+        with profiler.measure("export") as export_stats:
+            BeancountExporter().export_to_path(output, mapped)
+            export_stats.rows = profiler.stages["general_map"].rows
+
+    return {
+        stage: profiler.stages[name].rows_per_second or 0.0
+        for name, stage in STAGES.items()
+    }
+
+
+def run(sizes: list[int], mapping_count: int, repeat: int) -> dict[str, float]:
+    mappings = synthetic_mappings(mapping_count)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            statement = Path(directory) / f"cathay-{size}.csv"
+            with open(statement, "w", newline="") as stream:
+                write_cathay_csv(stream, size)
+            output = Path(directory) / "out.beancount"
+
+            best: dict[str, float] = {}
+            for _ in range(repeat):
+                for stage, rate in run_pipeline(statement, output, mappings).items():
+                    best[stage] = max(best.get(stage, 0.0), rate)
+            for stage, rate in best.items():
+                results[f"{stage}@{size}"] = rate
+            statement.unlink()
+    return results
+
+
+def compare(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    print(f"{'benchmark':<20}{'rows/s':>14}{'baseline':>14}{'change':>10}")
+    regressions = []
+    for name, rate in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            print(f"{name:<20}{rate:>14,.0f}{'-':>14}{'-':>10}")
+            continue
+        change = rate / previous - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = " !"
+        print(f"{name:<20}{rate:>14,.0f}{previous:>14,.0f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        default=DEFAULT_SIZES,
+        help="Comma-separated numbers of rows to run the pipeline on.",
+    )
+    parser.add_argument("--mappings", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The fraction by which a stage can slow down before it's reported.",
+    )
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.mappings, args.repeat)
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "mappings": args.mappings,
+                    "results": {**baseline, **results},
+                },
+                indent=2,
+            )
+        )
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Generators for synthetic statements in the formats metamoney imports."""
+
+import csv
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, TextIO
+
+from metamoney.mappers.conditions import (
+    AllCondition,
+    AnyCondition,
+    TransactionFieldMatchesCondition,
+)
+from metamoney.mappers.mapper import (
+    AddCounterTransactionRemap,
+    Mapping,
+    SetNarrationRemap,
+)
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+
+CATHAY_HEADER = [
+    "Transaction date",
+    "Billing date",
+    "Description",
+    "Withdraw",
+    "Deposit",
+    "Balance",
+    "Transaction data",
+    "Notes",
+]
+CATHAY_DESCRIPTIONS = ["ATM", "CARD", "TRANSFER", "SALARY", "FEE", "INTEREST"]
+CATHAY_PAYEES = [
+    "VULTR INC",
+    "7-ELEVEN",
+    "FAMILY MART",
+    "TAIPOWER",
+    "CHUNGHWA TELECOM",
+    "UBER EATS",
+    "",
+]
+
+
+def cathay_rows(
+    count: int, seed: int = 0, start: datetime = datetime(2015, 1, 1)
+) -> Iterator[list[str]]:
+    """
+    Yields rows of a Cathay Bank CSV export, oldest first. Exports list the
+    newest transaction first, so write them out in reverse.
+    """
+    rng = random.Random(seed)
+    timestamp = start
+    balance = 1_000_000
+    for _ in range(count):
+        timestamp += timedelta(minutes=rng.randint(0, 600))
+        amount = rng.randint(1, 20_000)
+        if rng.random() < 0.2:
+            balance += amount
+            withdraw, deposit = "", f"{amount:,}"
+        else:
+            balance -= amount
+            withdraw, deposit = f"{amount:,}", ""
+        yield [
+            timestamp.strftime("%Y/%m/%d\n%H:%M"),
+            timestamp.strftime("%Y/%m/%d"),
+            rng.choice(CATHAY_DESCRIPTIONS),
+            withdraw,
+            deposit,
+            f"{balance:,}",
+            f"{rng.randrange(10**12):012d}",
+            rng.choice(CATHAY_PAYEES),
+        ]
+
+
+def write_cathay_csv(stream: TextIO, count: int, seed: int = 0):
+    writer = csv.writer(stream)
+    writer.writerow(CATHAY_HEADER)
+    writer.writerows(reversed(list(cathay_rows(count, seed))))
+
+
+def journal_entries(count: int, seed: int = 0) -> Iterator[JournalEntry]:
+    """Yields mapped journal entries in date order, each with a counter posting."""
+    rng = random.Random(seed)
+    timestamp = datetime(2015, 1, 1)
+    balance = Decimal(1_000_000)
+    for i in range(count):
+        timestamp += timedelta(minutes=rng.randint(0, 600))
+        amount = Decimal(-rng.randint(1, 20_000))
+        balance += amount
+        payee = rng.choice(CATHAY_PAYEES)
+        asset = GenericTransaction(
+            f"{i:032x}",
+            timestamp,
+            payee,
+            f"{payee} {rng.choice(CATHAY_DESCRIPTIONS)}",
+            amount,
+            balance,
+            "NTD",
+            "Assets:Checking:Cathay",
+            "cathay_tw",
+        )
+        counter = GenericTransaction(
+            f"{i + count:032x}",
+            timestamp,
+            None,
+            None,
+            -amount,
+            None,
+            "NTD",
+            "Expenses:Synthetic",
+            None,
+        )
+        yield JournalEntry(timestamp, asset.description or "", (asset, counter))
+
+
+def synthetic_mappings(count: int, seed: int = 0) -> list[Mapping]:
+    """
+    Builds a config's worth of mappings in the shapes people write: payee
+    prefixes, description patterns, and combinations of the two. Only a few
+    match the payees in synthetic statements, as in a real config.
+    """
+    rng = random.Random(seed)
+    payees = [payee for payee in CATHAY_PAYEES if payee]
+    mappings = []
+    for i in range(count):
+        if i < len(payees):
+            payee = payees[i]
+        else:
+            payee = f"MERCHANT {i}"
+        kind = rng.random()
+        if kind < 0.5:
+            condition = TransactionFieldMatchesCondition("payee", f"^{payee}.*")
+        elif kind < 0.7:
+            condition = TransactionFieldMatchesCondition(
+                "description",
+                f".*{payee.split()[0]}.*(?:{rng.choice(CATHAY_DESCRIPTIONS)})",
+            )
+        elif kind < 0.9:
+            condition = AllCondition(
+                TransactionFieldMatchesCondition("account", "^Assets.*"),
+                TransactionFieldMatchesCondition("payee", f"{payee}.*"),
+            )
+        else:
+            condition = AnyCondition(
+                TransactionFieldMatchesCondition("payee", f"{payee}.*"),
+                TransactionFieldMatchesCondition("description", f"{payee} FEE"),
+            )
+        mappings.append(
+            Mapping(
+                condition,
+                [
+                    AddCounterTransactionRemap(f"Expenses:Synthetic:Rule{i}"),
+                    SetNarrationRemap(f"Synthetic rule {i}"),
+                ],
+            )
+        )
+    return mappings
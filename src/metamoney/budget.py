@@ -0,0 +1,216 @@
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from metamoney.models.transactions import JournalEntry
+from metamoney.utils import metamoney_home
+
+# An (account, currency) pair
+RollupKey = tuple[str, str]
+
+
+def default_rollup_path() -> Path:
+    return metamoney_home() / "rollups.sqlite3"
+
+
+def month_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+@dataclass(frozen=True)
+class Projection:
+    account: str
+    currency: str
+    monthly: Decimal
+    total: Decimal
+    months: int
+
+
+class RollupStore:
+    """
+    Persistent per-month totals for every account and currency. Entries are
+    folded in once, keyed by the ID of the transaction they were imported
+    from, so projections only ever read the monthly totals.
+
+    The totals only keep the accounts entries were mapped to, so they can't
+    be mapped again when the mappings change. mappings identifies the
+    current ones, e.g. with config_digest; the store records which mappings
+    it was first folded with, so callers can tell when to rebuild it.
+    """
+
+    def __init__(self, path: Path | None = None, mappings: str | None = None):
+        self.path = path or default_rollup_path()
+        self.mappings = mappings
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS rollups (
+                account TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                month TEXT NOT NULL,
+                total TEXT NOT NULL,
+                postings INTEGER NOT NULL,
+                PRIMARY KEY (account, currency, month)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS folded (
+                transaction_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS settings (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID;
+            """)
+        self.connection.commit()
+
+    def __enter__(self) -> "RollupStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+    def folded_with(self) -> str | None:
+        """The mappings the totals were first folded with."""
+        row = self.connection.execute(
+            "SELECT value FROM settings WHERE name = 'mappings'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def stale(self) -> bool:
+        """Whether the totals were folded with other mappings than the current ones."""
+        folded_with = self.folded_with()
+        return (
+            self.mappings is not None
+            and folded_with is not None
+            and folded_with != self.mappings
+        )
+
+    def rebuild(self):
+        """
+        Clears the totals, so every entry is folded in again. Like folding,
+        this is only kept once the store is closed without an error.
+        """
+        for table in ("rollups", "folded", "settings"):
+            self.connection.execute(f"DELETE FROM {table}")
+
+    def fold(self, entries: Iterable[JournalEntry]) -> int:
+        """
+        Adds the postings of entries which haven't been folded in before to
+        their monthly totals, returning how many entries were new.
+        """
+        if self.mappings is not None:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO settings VALUES ('mappings', ?)",
+                (self.mappings,),
+            )
+        totals: dict[tuple[str, str, str], Decimal] = defaultdict(Decimal)
+        counts: dict[tuple[str, str, str], int] = defaultdict(int)
+        folded = 0
+        for entry in entries:
+            if not entry.transactions:
+                continue
+            # Mappers only ever add transactions after the imported one
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO folded VALUES (?)",
+                (entry.transactions[0].transaction_id,),
+            )
+            if not cursor.rowcount:
+                continue
+            folded += 1
+            month = month_key(entry.timestamp.year, entry.timestamp.month)
+            for transaction in entry.transactions:
+                key = (transaction.account, transaction.currency, month)
+                totals[key] += transaction.amount
+                counts[key] += 1
+
+        if not totals:
+            return folded
+        # Totals are stored as text to keep them exact, so they're added up
+        # here rather than in SQL
+        existing = self.read_months({month for _, _, month in totals})
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    account,
+                    currency,
+                    month,
+                    str(total + existing.get((account, currency, month), (0, 0))[0]),
+                    counts[(account, currency, month)]
+                    + existing.get((account, currency, month), (0, 0))[1],
+                )
+                for (account, currency, month), total in totals.items()
+            ],
+        )
+        return folded
+
+    def read_months(
+        self, months: Iterable[str]
+    ) -> dict[tuple[str, str, str], tuple[Decimal, int]]:
+        months = sorted(months)
+        placeholders = ",".join("?" * len(months))
+        rows = self.connection.execute(
+            f"SELECT account, currency, month, total, postings FROM rollups WHERE month IN ({placeholders})",
+            months,
+        )
+        return {
+            (account, currency, month): (Decimal(total), postings)
+            for account, currency, month, total, postings in rows
+        }
+
+    def monthly_totals(
+        self, first: str, last: str, accounts: Sequence[str] = ()
+    ) -> dict[RollupKey, dict[str, Decimal]]:
+        query = "SELECT account, currency, month, total FROM rollups WHERE month BETWEEN ? AND ?"
+        parameters: list[str | int] = [first, last]
+        if accounts:
+            # An account also matches its sub-accounts
+            query += (
+                " AND ("
+                + " OR ".join(
+                    "account = ? OR substr(account, 1, ?) = ?" for _ in accounts
+                )
+                + ")"
+            )
+            for account in accounts:
+                prefix = f"{account}:"
+                parameters += [account, len(prefix), prefix]
+        totals: dict[RollupKey, dict[str, Decimal]] = defaultdict(dict)
+        for account, currency, month, total in self.connection.execute(
+            query, parameters
+        ):
+            totals[(account, currency)][month] = Decimal(total)
+        return totals
+
+    def last_month(self) -> str | None:
+        return self.connection.execute("SELECT max(month) FROM rollups").fetchone()[0]
+
+    def project(
+        self, history: int, horizon: int, accounts: Sequence[str] = ()
+    ) -> list[Projection]:
+        """
+        Projects each account forward by horizon months, at its average over
+        the last history months of data. Months without postings count as 0.
+        """
+        last = self.last_month()
+        if last is None:
+            return []
+        year, month = int(last[:4]), int(last[5:])
+        first_index = year * 12 + month - 1 - (history - 1)
+        first = month_key(first_index // 12, first_index % 12 + 1)
+
+        projections = []
+        for (account, currency), months in sorted(
+            self.monthly_totals(first, last, accounts).items()
+        ):
+            monthly = sum(months.values(), Decimal(0)) / history
+            projections.append(
+                Projection(account, currency, monthly, monthly * horizon, horizon)
+            )
+        return projections
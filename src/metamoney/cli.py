@@ -1,16 +1,27 @@
 import logging
 import sys
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
-from typing import Sequence
+from typing import Callable, Iterable
 
 import click
 
-from metamoney.mappers.mapper import GeneralMapper, InitialMapper
+from metamoney.exporters import AbstractExporter
+from metamoney.importers.importer import AbstractImporter
 from metamoney.models.app_data import AppData
-from metamoney.models.data_sources import DataSource, DataSourceFormat
 from metamoney.models.exports import ExportFormat
-from metamoney.models.stream_info import StreamInfo
-from metamoney.models.transactions import GenericTransaction, JournalEntry
+from metamoney.models.filters import TransactionFilter
+from metamoney.models.transactions import JournalEntry
+from metamoney.workflow import (
+    expand_sources,
+    infer_input_type,
+    journal_entries,
+    journal_files_in_parallel,
+    journal_remote,
+    merge_entries,
+    open_data_source,
+)
 
 logging.basicConfig(level=logging.INFO)
 
@@ -50,6 +61,46 @@ def metamoney_list_outputs():
     for output in app_data.exporter_file_types:
         print(output)
 
+
+def export_target(
+    exporter: AbstractExporter, path: str
+) -> Callable[[Iterable[JournalEntry]], None]:
+    if path == "-":
+        return lambda entries: exporter.export(app_data.output_stream, entries)
+    return lambda entries: exporter.export_to_path(Path(path), entries)
+
+
+def resolve_importers(
+    institution: str, source: tuple[str, ...], input_format: str | None
+) -> list[tuple[str, str, AbstractImporter]]:
+    """
+    Expands --source into (source, input type, importer) triples, exiting if
+    a source can't be imported.
+    """
+    sources = expand_sources(source, input_format)
+    if not sources:
+        print("--source didn't match any files.", file=sys.stderr)
+        exit(1)
+
+    importers: list[tuple[str, str, AbstractImporter]] = []
+    for data_source_name in sources:
+        input_type = infer_input_type(data_source_name, input_format)
+        importer = app_data.get_importer(institution, input_type)
+        if not importer:
+            print(
+                f"Couldn't find an importer for data type {input_type} and institution {institution}",
+                file=sys.stderr,
+            )
+            exit(1)
+        if data_source_name not in ("stdin", "remote"):
+            source_as_path: Path = Path(data_source_name)
+            if not (source_as_path.exists() and source_as_path.is_file()):
+                print("--source must be 'remote', 'stdin', or a valid path to a file.")
+                exit(1)
+        importers.append((data_source_name, input_type, importer))
+    return importers
+
+
 @metamoney.command(help="Create journal / ledger entries from a data source and export them in a given data format.")
 # this should be sourced from the names set in the importers
 @click.option(
@@ -64,8 +115,9 @@ def metamoney_list_outputs():
     "--source",
     "-s",
     type=str,
+    multiple=True,
     required=True,
-    help="The data source to import from. Valid choices are stdin, remote, or a file path.",
+    help="The data source to import from. Valid choices are stdin, remote, or a file path, directory, or glob. May be given more than once.",
 )
 # no default, because we will infer it from the source and/or institution
 @click.option(
@@ -82,65 +134,468 @@ def metamoney_list_outputs():
     default=ExportFormat.BEANCOUNT,
     help="The format to export to."
 )
+@click.option(
+    "--output-file",
+    "-O",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the export to this file instead of stdout.",
+)
+@click.option(
+    "--output",
+    "outputs",
+    multiple=True,
+    metavar="FORMAT=PATH",
+    help="Export to PATH in FORMAT, or to stdout if PATH is '-'. Can be given more than once to write several exports from one import.",
+)
+@click.option(
+    "--merge-into",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Append entries which aren't already in this Beancount ledger to the end of it.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    help="The number of files to import in parallel.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only export transactions which previous incremental runs haven't exported.",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Only import transactions on or after this date (YYYY-MM-DD).",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Only import transactions on or before this date (YYYY-MM-DD).",
+)
+@click.option(
+    "--account",
+    multiple=True,
+    help="Only import transactions in this account or its sub-accounts. Can be given more than once.",
+)
+@click.option(
+    "--reconcile",
+    is_flag=True,
+    help="Warn about reported balances which don't match the running sum of amounts.",
+)
+@click.option(
+    "--convert-to",
+    metavar="CURRENCY",
+    help="Price every posting in another currency in CURRENCY, using the rate nearest to its date.",
+)
+@click.option(
+    "--rates",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="A CSV of daily exchange rates with the columns date, base, quote and rate. Defaults to ~/.metamoney/rates.csv.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Parse every source again, rather than reusing transactions cached from an earlier run on the same file.",
+)
+@click.option(
+    "--profile",
+    metavar="FILE",
+    help="Write timings and row counts for each stage and mapping to FILE as JSON, or to stderr if FILE is '-'.",
+)
+@click.option(
+    "--profile-memory",
+    is_flag=True,
+    help="Also trace the peak memory use of each stage with --profile. This makes everything several times slower, so timings are less accurate.",
+)
 def journal(
     institution: str,
-    source: str,
+    source: tuple[str, ...],
     input_format: str | None,
     output_format: str,
+    output_file: Path | None,
+    outputs: tuple[str, ...],
+    merge_into: Path | None,
+    jobs: int,
+    incremental: bool,
+    since: datetime | None,
+    until: datetime | None,
+    account: tuple[str, ...],
+    reconcile: bool,
+    convert_to: str | None,
+    rates: Path | None,
+    no_cache: bool,
+    profile: str | None,
+    profile_memory: bool,
 ):
-    if not input_format and source != "stdin" and source != "remote":
-        input_type = Path(source).suffix[1:]
-    elif input_format:
-        input_type = input_format
-    else:
-        input_type = DataSourceFormat.CSV
-
     output_type = output_format
 
-    importer = app_data.get_importer(institution, input_type)
-    if not importer:
+    exporter = app_data.get_exporter(output_type)
+    if not exporter:
         print(
-            f"Couldn't find an importer for data type {input_type} and institution {institution}",
+            f"Couldn't find an exporter for data type {output_type}",
             file=sys.stderr,
         )
         exit(1)
 
-    exporter = app_data.get_exporter(output_type)
-    if not exporter:
+    if merge_into:
+        from metamoney.exporters.beancount import BeancountExporter
+
+        if not isinstance(exporter, BeancountExporter):
+            print(
+                "--merge-into can only be used with Beancount output.",
+                file=sys.stderr,
+            )
+            exit(1)
+    if merge_into and output_file:
+        print("--merge-into and --output-file can't be used together.", file=sys.stderr)
+        exit(1)
+
+    targets: list[tuple[AbstractExporter, str]] = []
+    for output in outputs:
+        target_format, separator, target_path = output.partition("=")
+        target_exporter = app_data.get_exporter(target_format)
+        if not separator or not target_path:
+            print(f"--output must be FORMAT=PATH, not {output}", file=sys.stderr)
+            exit(1)
+        if not target_exporter:
+            print(
+                f"Couldn't find an exporter for data type {target_format}",
+                file=sys.stderr,
+            )
+            exit(1)
+        if target_path == "-" and not target_exporter.can_stream:
+            print(f"{target_format} can't be written to stdout.", file=sys.stderr)
+            exit(1)
+        targets.append((target_exporter, target_path))
+    if targets and (merge_into or output_file):
         print(
-            f"Couldn't find an exporter for data type {output_type}",
+            "--output can't be used with --merge-into or --output-file.",
+            file=sys.stderr,
+        )
+        exit(1)
+    if not (targets or merge_into or output_file or exporter.can_stream):
+        print(
+            f"{output_type} can't be written to stdout; use --output-file.",
             file=sys.stderr,
         )
         exit(1)
 
-    generic_transactions: Sequence[GenericTransaction]
-
-    if source == "remote":
-        data_source = importer.retrieve()
-    elif source == "stdin":
-        stream = StreamInfo(sys.stdin, "stdin")
-        data_source = DataSource(institution, input_type, stream)
-    else:
-        source_as_path: Path = Path(source)
-        if not (source_as_path.exists() and source_as_path.is_file()):
-            print("--source must be 'remote', 'stdin', or a valid path to a file.")
+    converter = None
+    if convert_to:
+        from metamoney.currency import (
+            CurrencyConverter,
+            default_rates_path,
+            load_rates,
+        )
+
+        rates_path = rates or default_rates_path()
+        if not rates_path.is_file():
+            print(f"Couldn't find exchange rates at {rates_path}", file=sys.stderr)
             exit(1)
-        stream = StreamInfo(source_as_path.open(), str(source_as_path.resolve()))
-        data_source = DataSource(institution, input_type, stream)
+        converter = CurrencyConverter(load_rates(rates_path), convert_to)
+
+    importers = resolve_importers(institution, source, input_format)
+
+    files = [
+        (data_source_name, input_type)
+        for data_source_name, input_type, _ in importers
+        if data_source_name not in ("stdin", "remote")
+    ]
+    parallel = jobs > 1 and len(files) > 1
+    transaction_filter = TransactionFilter(
+        since.date() if since else None,
+        until.date() if until else None,
+        frozenset(account),
+    )
+    fingerprints = None
+    if incremental:
+        from metamoney.fingerprints import FingerprintStore
+
+        fingerprints = FingerprintStore()
+    statement_cache = None if no_cache else app_data.statement_cache()
+    profiler = None
+    if profile:
+        from metamoney.profiling import Profiler
+
+        profiler = Profiler(trace_memory=profile_memory)
+    # Stages which aren't lazy are timed as a whole
+    measure = profiler.measure if profiler else lambda name: nullcontext()
+
+    with profiler or nullcontext():
+        streams: list[Iterable[JournalEntry]] = []
+        if parallel:
+            # Stages inside worker processes can't be profiled individually
+            with measure("journal_files"):
+                streams.extend(
+                    journal_files_in_parallel(
+                        institution,
+                        files,
+                        jobs,
+                        fingerprints,
+                        transaction_filter,
+                        reconcile,
+                        statement_cache,
+                    )
+                )
 
-    institution_transactions = importer.extract(data_source)
-    generic_transactions = importer.transform(institution_transactions)
+        general_mapper = app_data.general_mapper(profiler)
+        for data_source_name, input_type, importer in importers:
+            if parallel and data_source_name not in ("stdin", "remote"):
+                continue
+            if data_source_name == "remote":
+                with measure("retrieve"):
+                    streams.extend(
+                        journal_remote(
+                            importer,
+                            general_mapper,
+                            fingerprints,
+                            transaction_filter,
+                            reconcile,
+                            statement_cache,
+                        )
+                    )
+                continue
+            with measure("retrieve"):
+                data_source = open_data_source(
+                    importer, institution, input_type, data_source_name
+                )
+            streams.append(
+                journal_entries(
+                    importer,
+                    data_source,
+                    general_mapper,
+                    fingerprints,
+                    profiler,
+                    transaction_filter,
+                    reconcile,
+                    statement_cache,
+                )
+            )
 
-    # TODO: Make this a proper workflow which calls multiple mappers
-    initial_mapper = InitialMapper()
-    entries: Sequence[JournalEntry] = initial_mapper.map(generic_transactions, [])
+        entries = merge_entries(streams)
+        if profiler:
+            entries = profiler.stage("merge", entries)
+        if converter:
+            entries = converter.convert(entries)
+            if profiler:
+                entries = profiler.stage("convert", entries)
+        # Only remember what was exported if the export finished
+        with fingerprints or nullcontext(), measure("export"):
+            if fingerprints:
+                entries = fingerprints.record_new(entries)
+            if profiler:
+                entries = profiler.count("export", entries)
+            if targets:
+                from metamoney.pipeline import fan_out
 
-    general_mapper = GeneralMapper(app_data.mappings)
-    entries = general_mapper.map(generic_transactions, entries)
+                fan_out(
+                    entries,
+                    [
+                        export_target(target_exporter, target_path)
+                        for target_exporter, target_path in targets
+                    ],
+                )
+            elif merge_into:
+                from metamoney.importers.beancount import read_beancount_ledger_path
 
-    # TODO: Add a filter option for dates
+                ledger = read_beancount_ledger_path(merge_into)
+                exporter.append_to_path(
+                    merge_into, ledger.new_entries(entries), ledger.balances
+                )
+            elif output_file:
+                exporter.export_to_path(output_file, entries)
+            else:
+                exporter.export(app_data.output_stream, entries)
 
-    exporter.export(app_data.output_stream, entries)
+    if profiler and profile == "-":
+        print(profiler.to_json(), file=sys.stderr)
+    elif profiler and profile:
+        Path(profile).write_text(profiler.to_json())
+
+
+@metamoney.command(
+    help="Project spending and income per account from monthly totals, after folding in any new transactions from --source."
+)
+@click.option(
+    "--institution",
+    "-I",
+    type=click.Choice(app_data.importer_institutions),
+    help="The institution that --source is from.",
+)
+@click.option(
+    "--source",
+    "-s",
+    multiple=True,
+    help="Statements to fold into the monthly totals first, as for journal. Transactions which have been folded in before are skipped.",
+)
+@click.option(
+    "--input-format",
+    "-i",
+    "input_format",
+    type=click.Choice(app_data.importer_file_types),
+    help="The format of the data source.",
+)
+@click.option(
+    "--history",
+    type=click.IntRange(min=1),
+    default=12,
+    help="The number of months to average over, ending with the latest month with data.",
+)
+@click.option(
+    "--months",
+    type=click.IntRange(min=1),
+    default=12,
+    help="The number of months to project forward.",
+)
+@click.option(
+    "--account",
+    multiple=True,
+    help="Only project this account and its sub-accounts. Can be given more than once.",
+)
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    help="Clear the monthly totals before folding in --source, e.g. after changing mappings. Give every statement the totals should include.",
+)
+def budget(
+    institution: str | None,
+    source: tuple[str, ...],
+    input_format: str | None,
+    history: int,
+    months: int,
+    account: tuple[str, ...],
+    rebuild: bool,
+):
+    if source and not institution:
+        print("--source needs --institution.", file=sys.stderr)
+        exit(1)
+
+    from metamoney.budget import RollupStore
+    from metamoney.utils import config_digest
+
+    with RollupStore(mappings=config_digest()) as rollups:
+        if rebuild:
+            rollups.rebuild()
+        if source:
+            importers = resolve_importers(institution, source, input_format)
+            general_mapper = app_data.general_mapper()
+            statement_cache = app_data.statement_cache()
+            for data_source_name, input_type, importer in importers:
+                data_source = open_data_source(
+                    importer, institution, input_type, data_source_name
+                )
+                rollups.fold(
+                    journal_entries(
+                        importer,
+                        data_source,
+                        general_mapper,
+                        statement_cache=statement_cache,
+                    )
+                )
+
+        projections = rollups.project(history, months, account)
+        last_month = rollups.last_month()
+        if rollups.stale():
+            print(
+                "The config has changed since the monthly totals were folded, so they may use old mappings. Run budget --rebuild with every statement to fold them again.",
+                file=sys.stderr,
+            )
+
+    if not projections:
+        print("No monthly totals to project from.", file=sys.stderr)
+        exit(1)
+
+    print(f"Averaged over {history} months up to {last_month}")
+    width = max(len(projection.account) for projection in projections)
+    print(f"{'account':<{width}}  {'monthly':>14}  {f'{months} months':>16}  currency")
+    for projection in projections:
+        print(
+            f"{projection.account:<{width}}  {projection.monthly:>14,.2f}  "
+            f"{projection.total:>16,.2f}  {projection.currency}"
+        )
+
+
+@metamoney.command(
+    help="Search the postings in a database written by the sqlite exporter, e.g. 'payee ~ VULTR since 2024'. Conditions are FIELD OPERATOR VALUE, where FIELD is payee, description, account, currency, institution or amount, and OPERATOR is =, != or ~ (contains), or <, <=, > or >= for amounts; and since DATE or until DATE, where DATE is a year, month or day. Give the query as one argument, or as separate words.",
+    # So that negative amounts aren't taken for options
+    context_settings={"ignore_unknown_options": True},
+)
+@click.argument("query", nargs=-1)
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="The database to search. Defaults to ~/.metamoney/journal.sqlite3.",
+)
+@click.option(
+    "--totals",
+    is_flag=True,
+    help="Print the total of the matching postings in each account instead of the postings.",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Print at most this many postings.",
+)
+def query(
+    query: tuple[str, ...], database: Path | None, totals: bool, limit: int | None
+):
+    import shlex
+
+    from metamoney.query import JournalStore, default_journal_path, parse_query
+
+    database = database or default_journal_path()
+    if not database.is_file():
+        print(
+            f"Couldn't find a database at {database}. Write one with journal --output sqlite={database}",
+            file=sys.stderr,
+        )
+        exit(1)
+    try:
+        # Separate words are quoted again, so "vultr inc" stays one value
+        parsed = parse_query(query[0] if len(query) == 1 else shlex.join(query))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        exit(1)
+
+    with JournalStore(database) as store:
+        if totals:
+            account_totals = store.totals(parsed)
+            if not account_totals:
+                return
+            width = max(len(total.account) for total in account_totals)
+            for total in account_totals:
+                print(
+                    f"{total.account:<{width}}  {total.total:>16}  "
+                    f"{total.currency}  ({total.postings} postings)"
+                )
+            return
+        for posting in store.postings(parsed, limit):
+            print(
+                f"{posting.timestamp[:10]}  {posting.amount:>14} {posting.currency}  "
+                f"{posting.account}  {posting.payee or ''}"
+            )
+
+
+@metamoney.command(
+    help="Keep metamoney loaded and run commands sent by metamoney-client over a Unix socket, so each one starts without importing or configuring anything. The config is reloaded whenever it changes."
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="The socket to listen on. Defaults to $METAMONEY_SOCKET, or ~/.metamoney/serve.sock.",
+)
+def serve(socket_path: Path | None):
+    from metamoney.client import default_socket_path
+    from metamoney.daemon import serve as serve_forever
+
+    try:
+        serve_forever(socket_path or default_socket_path())
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        exit(1)
 
 
 if __name__ == "__main__":
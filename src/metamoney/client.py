@@ -0,0 +1,81 @@
+"""
+A thin client for "metamoney serve", which forwards its arguments to the
+server and writes what comes back to stdout and stderr. It only imports the
+standard library, so it starts much faster than the CLI itself. If no server
+is running, the command is run in this process instead.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+from pathlib import Path
+from typing import BinaryIO
+
+SOCKET_ENVIRONMENT_VARIABLE = "METAMONEY_SOCKET"
+
+# Every response is a series of frames: a one byte kind, then the length of
+# the payload as a 4 byte big-endian integer, then the payload
+FRAME_HEADER = struct.Struct(">cI")
+STDOUT = b"o"
+STDERR = b"e"
+EXIT = b"x"
+
+
+def default_socket_path() -> Path:
+    configured = os.environ.get(SOCKET_ENVIRONMENT_VARIABLE)
+    if configured:
+        return Path(configured)
+    return Path.home() / ".metamoney" / "serve.sock"
+
+
+def pack_frame(kind: bytes, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+def read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise ConnectionError("The server closed the connection mid-response.")
+    return data
+
+
+def run_remote(connection: socket.socket, args: list[str]) -> int:
+    request = {"args": args, "cwd": os.getcwd(), "stdin": None}
+    # Only pass stdin along if the command will read it
+    if "stdin" in args and not sys.stdin.isatty():
+        request["stdin"] = sys.stdin.read()
+    connection.sendall(json.dumps(request).encode() + b"\n")
+
+    with connection.makefile("rb") as responses:
+        while True:
+            kind, size = FRAME_HEADER.unpack(read_exactly(responses, FRAME_HEADER.size))
+            payload = read_exactly(responses, size)
+            if kind == STDOUT:
+                sys.stdout.buffer.write(payload)
+            elif kind == STDERR:
+                sys.stderr.buffer.write(payload)
+                sys.stderr.flush()
+            elif kind == EXIT:
+                sys.stdout.flush()
+                return int(payload)
+
+
+def main():
+    args = sys.argv[1:]
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(default_socket_path()))
+    except (FileNotFoundError, ConnectionRefusedError):
+        connection.close()
+        from metamoney.cli import metamoney
+
+        metamoney(args, prog_name="metamoney")
+        return
+    with connection:
+        sys.exit(run_remote(connection, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import csv
+from bisect import bisect_left
+from dataclasses import replace
+from datetime import date
+from decimal import Context, Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+from metamoney.utils import metamoney_home
+
+DEFAULT_RATE_CACHE_SIZE = 4096
+ONE = Decimal(1)
+# Inverted rates are rounded to this many significant digits, rather than the
+# 28 that Decimal would give
+INVERSE_RATE_CONTEXT = Context(prec=10)
+
+# Rates are stored per (base, quote) pair: one unit of base costs rate quote
+Pair = tuple[str, str]
+
+
+def default_rates_path() -> Path:
+    return metamoney_home() / "rates.csv"
+
+
+class RateStore:
+    """
+    Daily exchange rates, indexed by pair with dates in sorted order. Lookups
+    find the rate nearest to the requested date with a binary search, and the
+    results are cached since postings on the same day share them.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_RATE_CACHE_SIZE):
+        self.days: dict[Pair, list[int]] = {}
+        self.rates: dict[Pair, list[Decimal]] = {}
+        self.cached_rate = lru_cache(maxsize=cache_size)(self.find_rate)
+
+    def add_rates(self, rows: Iterable[tuple[date, str, str, Decimal]]):
+        by_pair: dict[Pair, dict[int, Decimal]] = {}
+        for day, base, quote, rate in rows:
+            by_pair.setdefault((base, quote), {})[day.toordinal()] = rate
+        for pair, rates in by_pair.items():
+            if pair in self.days:
+                rates = {**dict(zip(self.days[pair], self.rates[pair])), **rates}
+            days = sorted(rates)
+            self.days[pair] = days
+            self.rates[pair] = [rates[day] for day in days]
+        self.cached_rate.cache_clear()
+
+    def find_rate(self, day: int, base: str, quote: str) -> Decimal | None:
+        if base == quote:
+            return ONE
+        pair = (base, quote)
+        inverse = False
+        if pair not in self.days:
+            pair = (quote, base)
+            inverse = True
+            if pair not in self.days:
+                return None
+
+        days = self.days[pair]
+        i = bisect_left(days, day)
+        # Take whichever neighbour is closer, preferring the earlier one
+        if i == len(days) or (i > 0 and day - days[i - 1] <= days[i] - day):
+            i -= 1
+        rate = self.rates[pair][i]
+        return INVERSE_RATE_CONTEXT.divide(ONE, rate) if inverse else rate
+
+    def rate(self, day: date, base: str, quote: str) -> Decimal | None:
+        return self.cached_rate(day.toordinal(), base, quote)
+
+
+def read_rates_csv(stream: TextIO) -> Iterator[tuple[date, str, str, Decimal]]:
+    """Reads rates from a CSV with the columns date, base, quote and rate."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield (
+            date.fromisoformat(row["date"]),
+            row["base"],
+            row["quote"],
+            Decimal(row["rate"]),
+        )
+
+
+def load_rates(path: Path | None = None) -> RateStore:
+    store = RateStore()
+    with open(path or default_rates_path(), newline="") as stream:
+        store.add_rates(read_rates_csv(stream))
+    return store
+
+
+class CurrencyConverter:
+    """
+    Prices every posting which isn't in the target currency, so exporters can
+    write it with its cost in that currency.
+    """
+
+    def __init__(self, rates: RateStore, target: str):
+        self.rates = rates
+        self.target = target
+
+    def price(self, transaction: GenericTransaction) -> GenericTransaction:
+        if transaction.currency == self.target or transaction.price is not None:
+            return transaction
+        rate = self.rates.rate(
+            transaction.timestamp.date(), transaction.currency, self.target
+        )
+        if rate is None:
+            return transaction
+        return replace(transaction, price=rate, price_currency=self.target)
+
+    def convert(self, entries: Iterable[JournalEntry]) -> Iterator[JournalEntry]:
+        for entry in entries:
+            transactions = tuple(self.price(t) for t in entry.transactions)
+            if transactions != entry.transactions:
+                entry = replace(entry, transactions=transactions)
+            yield entry
@@ -0,0 +1,175 @@
+import importlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+from pathlib import Path
+from types import ModuleType
+
+from metamoney.client import EXIT, STDERR, STDOUT, pack_frame
+from metamoney.models.stream_info import StreamInfo
+from metamoney.utils import config_path
+
+logger = logging.getLogger(__name__)
+
+
+def config_version() -> tuple[int, int] | None:
+    try:
+        stat = config_path().stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FrameWriter(io.TextIOBase):
+    """Sends everything written to it to the client as frames of one kind."""
+
+    def __init__(self, connection: socket.socket, kind: bytes):
+        self.connection = connection
+        self.kind = kind
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        # Encoding even empty strings means writing bytes fails, which is how
+        # click tells text streams from binary ones
+        payload = text.encode()
+        if payload:
+            self.connection.sendall(pack_frame(self.kind, payload))
+        return len(text)
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    server: "JournalServer"
+
+    def handle(self):
+        line = self.rfile.readline()
+        # Checks for a running server connect without sending anything
+        if not line:
+            return
+        request = json.loads(line)
+        try:
+            code = self.server.run_job(
+                self.connection, request["args"], request["cwd"], request.get("stdin")
+            )
+            self.connection.sendall(pack_frame(EXIT, str(code).encode()))
+        except ConnectionError:
+            logger.warning("The client disconnected before its job finished")
+
+
+class JournalServer(socketserver.UnixStreamServer):
+    """
+    Runs CLI commands sent by metamoney.client, one at a time, in a process
+    which keeps its imports, config and registries loaded between them.
+    Before each job the config is loaded again if it's changed on disk.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.cli: ModuleType | None = None
+        self.loaded_config: tuple[int, int] | None = None
+        super().__init__(str(path), JobHandler)
+        # Jobs can read and write anything the user can, so nobody else
+        # should be able to send them
+        os.chmod(path, 0o600)
+        self.load_cli()
+
+    def load_cli(self) -> ModuleType:
+        version = config_version()
+        if self.cli is None:
+            self.cli = importlib.import_module("metamoney.cli")
+        elif version != self.loaded_config:
+            logger.info(f"{config_path()} changed, reloading")
+            # The command options are built from the config's importers and
+            # exporters, so the whole CLI is rebuilt around a new AppData
+            self.cli = importlib.reload(self.cli)
+        self.loaded_config = version
+        return self.cli
+
+    def run_job(
+        self, connection: socket.socket, args: list[str], cwd: str, stdin: str | None
+    ) -> int:
+        stdout = FrameWriter(connection, STDOUT)
+        stderr = FrameWriter(connection, STDERR)
+        saved = (sys.stdin, sys.stdout, sys.stderr, os.getcwd())
+        handlers = [
+            handler
+            for handler in logging.getLogger().handlers
+            if isinstance(handler, logging.StreamHandler) and handler.stream is saved[2]
+        ]
+        sys.stdin = io.StringIO(stdin or "")
+        sys.stdout, sys.stderr = stdout, stderr
+        for handler in handlers:
+            handler.setStream(stderr)
+        try:
+            if args and args[0] == "serve":
+                print("Can't start a server from inside one.", file=sys.stderr)
+                return 1
+            os.chdir(cwd)
+            cli = self.load_cli()
+            cli.app_data.output_stream = StreamInfo(stdout, "stdout")
+            cli.metamoney.main(args, prog_name="metamoney")
+            return 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except ConnectionError:
+            raise
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = saved[:3]
+            os.chdir(saved[3])
+            for handler in handlers:
+                handler.setStream(saved[2])
+            if self.cli:
+                self.cli.app_data.output_stream = StreamInfo(sys.stdout, "stdout")
+
+
+def remove_stale_socket(path: Path):
+    """Removes the socket left behind by a server which isn't running."""
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except ConnectionRefusedError:
+        path.unlink()
+        return
+    finally:
+        probe.close()
+    raise ValueError(f"A server is already running on {path}")
+
+
+def serve(path: Path):
+    # Forked worker processes, for --jobs and for parsing large files in
+    # chunks, would inherit a job's stdout and stderr, which write to the
+    # client's socket. Workers started by a fork server get the server's own.
+    multiprocessing.set_start_method("forkserver", force=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    remove_stale_socket(path)
+    server = JournalServer(path)
+    # Stop in the same way for kill as for Ctrl-C, so the socket is removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    logger.info(f"Serving on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
@@ -1,3 +1,20 @@
-from metamoney.exporters.beancount import BeancountExporter
 from metamoney.exporters.exporter import AbstractExporter
 from metamoney.models.exports import ExportFormat
+
+
+def __getattr__(name: str):
+    # Exporters are loaded lazily, like importers, so that importing this
+    # package doesn't pull in json or sqlite3.
+    if name == "BeancountExporter":
+        from metamoney.exporters.beancount import BeancountExporter
+
+        return BeancountExporter
+    if name == "JsonLinesExporter":
+        from metamoney.exporters.jsonl import JsonLinesExporter
+
+        return JsonLinesExporter
+    if name == "SqliteExporter":
+        from metamoney.exporters.sqlite import SqliteExporter
+
+        return SqliteExporter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
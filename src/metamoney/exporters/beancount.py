@@ -1,72 +1,142 @@
-from typing import Sequence
+from pathlib import Path
+from typing import Container, Iterable
 
 from metamoney.exporters.exporter import AbstractExporter
 from metamoney.models.stream_info import StreamInfo
 from metamoney.models.transactions import JournalEntry
 
+DEFAULT_WRITE_BUFFER_SIZE = 1 << 20
+
 
 class BeancountExporter(AbstractExporter):
 
+    def __init__(self, buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE):
+        # Output is collected into chunks of roughly this many characters
+        # before being written, and files opened by export_to_path use a
+        # buffer of the same size.
+        self.buffer_size = buffer_size
+
     @staticmethod
     def data_format() -> str:
         return "beancount"
 
+    def format_one_generic_to_beancount(
+        self, entry: JournalEntry, date_string: str
+    ) -> str:
+        postings = "".join(
+            (
+                f"\t{transaction.account} {transaction.amount} {transaction.currency}\n"
+                if transaction.price is None
+                else f"\t{transaction.account} {transaction.amount} {transaction.currency}"
+                f" @ {transaction.price} {transaction.price_currency}\n"
+            )
+            for transaction in entry.transactions
+        )
+        return f'{date_string} * "{entry.narration}"\n{postings}\n'
+
+    def format_balances(
+        self,
+        entry: JournalEntry,
+        date_string: str,
+        known_balances: Container[tuple[str, str]] = (),
+    ) -> str:
+        balances = "".join(
+            f"{date_string} balance {t.account} {t.balance} {t.currency}\n"
+            for t in entry.transactions
+            if t.balance and (date_string, t.account) not in known_balances
+        )
+        return f"{balances}\n"
+
     def write_one_generic_to_beancount(
         self, output_stream: StreamInfo, entry: JournalEntry
     ):
-
-        head = f"{entry.timestamp.strftime('%Y-%m-%d')} * \"{entry.narration}\""
-        lines = [head]
-
-        for transaction in entry.transactions:
-            line = (
-                f"\t{transaction.account} {transaction.amount} {transaction.currency}"
+        output_stream.stream.write(
+            self.format_one_generic_to_beancount(
+                entry, entry.timestamp.strftime("%Y-%m-%d")
             )
-            lines.append(line)
-        lines.append("\n")
-
-        print("\n".join(lines), file=output_stream.stream, end="")
+        )
 
     def write_generic_to_beancount(
         self,
         output_stream: StreamInfo,
-        journal_entries: Sequence[JournalEntry],
+        journal_entries: Iterable[JournalEntry],
+        known_balances: Container[tuple[str, str]] = (),
     ):
-        if len(journal_entries) == 0:
-            return
+        """
+        Writes entries with a balance assertion at the start of each new day.
+        Assertions whose (date, account) is in known_balances are left out.
+        """
+        write = output_stream.stream.write
+        chunk: list[str] = []
+        chunk_size = 0
 
-        cur_date = journal_entries[0].timestamp
-        prev_date = journal_entries[0].timestamp
+        prev_entry: JournalEntry | None = None
+        day = 0
+        date_string = ""
 
-        for i, entry in enumerate(journal_entries):
+        for entry in journal_entries:
 
             cur_date = entry.timestamp
+            prev_date = prev_entry.timestamp if prev_entry else cur_date
+
+            # Entries are mostly in date order, so only format the date when
+            # it changes
+            if cur_date.toordinal() != day:
+                day = cur_date.toordinal()
+                date_string = cur_date.strftime("%Y-%m-%d")
 
-            if (
+            if prev_entry and (
                 cur_date.day > prev_date.day
                 or cur_date.month > prev_date.month
                 or cur_date.year > prev_date.year
             ):
+                balances = self.format_balances(prev_entry, date_string, known_balances)
+                chunk.append(balances)
+                chunk_size += len(balances)
 
-                balanced_transactions = list(
-                    filter(lambda t: t.balance, journal_entries[i - 1].transactions)
-                )
+            formatted = self.format_one_generic_to_beancount(entry, date_string)
+            chunk.append(formatted)
+            chunk_size += len(formatted)
 
-                lines = list(
-                    map(
-                        lambda t: f"{cur_date.strftime('%Y-%m-%d')} balance {t.account} {t.balance} {t.currency}",
-                        balanced_transactions,
-                    )
-                )
-                lines.append("\n")
+            if chunk_size >= self.buffer_size:
+                write("".join(chunk))
+                chunk = []
+                chunk_size = 0
 
-                print("\n".join(lines), file=output_stream.stream, end="")
+            prev_entry = entry
 
-            self.write_one_generic_to_beancount(output_stream, entry)
-
-            prev_date = cur_date
+        if chunk:
+            write("".join(chunk))
 
     def export(
-        self, output_stream: StreamInfo, journal_entries: Sequence[JournalEntry]
+        self, output_stream: StreamInfo, journal_entries: Iterable[JournalEntry]
     ):
         self.write_generic_to_beancount(output_stream, journal_entries)
+
+    def export_to_path(self, path: Path, journal_entries: Iterable[JournalEntry]):
+        with open(path, "w", buffering=self.buffer_size) as stream:
+            self.export(StreamInfo(stream, str(path)), journal_entries)
+
+    def append_to_path(
+        self,
+        path: Path,
+        journal_entries: Iterable[JournalEntry],
+        known_balances: Container[tuple[str, str]] = (),
+    ):
+        """
+        Appends entries to the end of an existing ledger without rewriting
+        what is already there.
+        """
+        with open(path, "rb") as existing:
+            existing.seek(0, 2)
+            needs_newline = existing.tell() > 0
+            if needs_newline:
+                existing.seek(-1, 2)
+                needs_newline = existing.read(1) != b"\n"
+
+        with open(path, "a", buffering=self.buffer_size) as stream:
+            if needs_newline:
+                stream.write("\n")
+            self.write_generic_to_beancount(
+                StreamInfo(stream, str(path)), journal_entries, known_balances
+            )
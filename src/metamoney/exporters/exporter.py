@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import Sequence
+from pathlib import Path
+from typing import Iterable
 
 from metamoney.models.stream_info import StreamInfo
 from metamoney.models.transactions import JournalEntry
 
 
 class AbstractExporter(ABC):
+    # Exporters which can't write to a stream, such as stdout, only support
+    # export_to_path
+    can_stream = True
 
     @staticmethod
     @abstractmethod
@@ -14,6 +18,10 @@ class AbstractExporter(ABC):
 
     @abstractmethod
     def export(
-        self, output_stream: StreamInfo, journal_entries: Sequence[JournalEntry]
+        self, output_stream: StreamInfo, journal_entries: Iterable[JournalEntry]
     ):
         pass
+
+    def export_to_path(self, path: Path, journal_entries: Iterable[JournalEntry]):
+        with open(path, "w") as stream:
+            self.export(StreamInfo(stream, str(path)), journal_entries)
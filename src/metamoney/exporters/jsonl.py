@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+from typing import Any, Iterable
+
+from metamoney.exporters.exporter import AbstractExporter
+from metamoney.models.exports import ExportFormat
+from metamoney.models.stream_info import StreamInfo
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+
+DEFAULT_WRITE_BUFFER_SIZE = 1 << 20
+
+
+def decimal_string(value: Any) -> str | None:
+    return str(value) if value is not None else None
+
+
+class JsonLinesExporter(AbstractExporter):
+    """
+    Writes one JSON object per entry, with its postings nested inside.
+    Amounts are written as strings so they stay exact.
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_WRITE_BUFFER_SIZE):
+        # Lines are collected into chunks of roughly this many characters
+        # before being written
+        self.buffer_size = buffer_size
+        self.encoder = json.JSONEncoder(ensure_ascii=False)
+
+    @staticmethod
+    def data_format() -> str:
+        return ExportFormat.JSONL
+
+    def posting(self, transaction: GenericTransaction) -> dict[str, Any]:
+        return {
+            "transaction_id": transaction.transaction_id,
+            "timestamp": transaction.timestamp.isoformat(),
+            "payee": transaction.payee,
+            "description": transaction.description,
+            "amount": str(transaction.amount),
+            "balance": decimal_string(transaction.balance),
+            "currency": transaction.currency,
+            "account": transaction.account,
+            "institution": transaction.institution,
+            "price": decimal_string(transaction.price),
+            "price_currency": transaction.price_currency,
+        }
+
+    def format_entry(self, entry: JournalEntry) -> str:
+        line = self.encoder.encode(
+            {
+                "timestamp": entry.timestamp.isoformat(),
+                "narration": entry.narration,
+                "postings": [self.posting(t) for t in entry.transactions],
+            }
+        )
+        return f"{line}\n"
+
+    def export(
+        self, output_stream: StreamInfo, journal_entries: Iterable[JournalEntry]
+    ):
+        write = output_stream.stream.write
+        chunk: list[str] = []
+        chunk_size = 0
+        for entry in journal_entries:
+            line = self.format_entry(entry)
+            chunk.append(line)
+            chunk_size += len(line)
+            if chunk_size >= self.buffer_size:
+                write("".join(chunk))
+                chunk = []
+                chunk_size = 0
+        if chunk:
+            write("".join(chunk))
+
+    def export_to_path(self, path: Path, journal_entries: Iterable[JournalEntry]):
+        with open(path, "w", buffering=self.buffer_size, encoding="utf-8") as stream:
+            self.export(StreamInfo(stream, str(path)), journal_entries)
@@ -0,0 +1,153 @@
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+from metamoney.exporters.exporter import AbstractExporter
+from metamoney.models.exports import ExportFormat
+from metamoney.models.stream_info import StreamInfo
+from metamoney.models.transactions import JournalEntry
+from metamoney.utils import content_id
+
+DEFAULT_INSERT_BATCH_SIZE = 10_000
+
+# Amounts are stored as text to keep them exact, and timestamps as ISO 8601
+# text, which sorts in date order
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        id TEXT PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        narration TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS postings (
+        entry_id TEXT NOT NULL REFERENCES entries (id),
+        position INTEGER NOT NULL,
+        transaction_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        payee TEXT,
+        description TEXT,
+        amount TEXT NOT NULL,
+        balance TEXT,
+        currency TEXT NOT NULL,
+        account TEXT NOT NULL,
+        institution TEXT,
+        price TEXT,
+        price_currency TEXT,
+        PRIMARY KEY (entry_id, position)
+    );
+    """
+
+# Building indexes once after a load is much faster than updating them for
+# every row, so they're only created after the first export into a database.
+# The account index also holds currencies and amounts, so totals per account
+# can be read from the index alone. Statistics are refreshed after every load
+# so SQLite can pick the most selective index for a query.
+INDEXES = """
+    CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+    CREATE INDEX IF NOT EXISTS postings_timestamp ON postings (timestamp);
+    CREATE INDEX IF NOT EXISTS postings_account
+        ON postings (account, timestamp, currency, amount);
+    CREATE INDEX IF NOT EXISTS postings_transaction_id ON postings (transaction_id);
+    CREATE INDEX IF NOT EXISTS postings_payee ON postings (payee COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS postings_amount ON postings (CAST(amount AS REAL));
+    ANALYZE;
+    """
+
+
+def entry_id(entry: JournalEntry) -> str:
+    # Mappers only ever add transactions after the imported one
+    if entry.transactions:
+        return entry.transactions[0].transaction_id
+    return content_id(entry.timestamp.isoformat(), entry.narration)
+
+
+class SqliteExporter(AbstractExporter):
+    """
+    Loads entries and their postings into a SQLite database, in a single
+    transaction with bulk inserts. Exporting into an existing database adds
+    to it, replacing entries which are already there and their postings, so
+    entries mapped again with different rules are updated.
+    """
+
+    can_stream = False
+
+    def __init__(self, batch_size: int = DEFAULT_INSERT_BATCH_SIZE):
+        # The number of postings inserted per executemany
+        self.batch_size = batch_size
+
+    @staticmethod
+    def data_format() -> str:
+        return ExportFormat.SQLITE
+
+    def export(
+        self, output_stream: StreamInfo, journal_entries: Iterable[JournalEntry]
+    ):
+        raise ValueError("SQLite exports can only be written to a file.")
+
+    def export_to_path(self, path: Path, journal_entries: Iterable[JournalEntry]):
+        connection = sqlite3.connect(path)
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                self.insert(connection, journal_entries)
+            connection.executescript(INDEXES)
+        finally:
+            connection.close()
+
+    def insert(
+        self, connection: sqlite3.Connection, journal_entries: Iterable[JournalEntry]
+    ):
+        entry_rows: list[tuple] = []
+        posting_rows: list[tuple] = []
+        for entry in journal_entries:
+            key = entry_id(entry)
+            timestamp = entry.timestamp.isoformat(sep=" ")
+            entry_rows.append((key, timestamp, entry.narration))
+            for position, transaction in enumerate(entry.transactions):
+                posting_rows.append(
+                    (
+                        key,
+                        position,
+                        transaction.transaction_id,
+                        transaction.timestamp.isoformat(sep=" "),
+                        transaction.payee,
+                        transaction.description,
+                        str(transaction.amount),
+                        (
+                            str(transaction.balance)
+                            if transaction.balance is not None
+                            else None
+                        ),
+                        transaction.currency,
+                        transaction.account,
+                        transaction.institution,
+                        (
+                            str(transaction.price)
+                            if transaction.price is not None
+                            else None
+                        ),
+                        transaction.price_currency,
+                    )
+                )
+            if len(posting_rows) >= self.batch_size:
+                self.insert_rows(connection, entry_rows, posting_rows)
+                entry_rows = []
+                posting_rows = []
+        self.insert_rows(connection, entry_rows, posting_rows)
+
+    def insert_rows(
+        self,
+        connection: sqlite3.Connection,
+        entry_rows: list[tuple],
+        posting_rows: list[tuple],
+    ):
+        # An entry mapped again may have fewer postings than it had before
+        connection.executemany(
+            "DELETE FROM postings WHERE entry_id = ?", [(row[0],) for row in entry_rows]
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", entry_rows
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO postings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            posting_rows,
+        )
@@ -0,0 +1,87 @@
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+from metamoney.utils import metamoney_home
+
+# SQLite limits the number of parameters in a single query
+QUERY_CHUNK_SIZE = 500
+
+
+def default_fingerprint_path() -> Path:
+    return metamoney_home() / "fingerprints.sqlite3"
+
+
+class FingerprintStore:
+    """
+    A persistent record of the transaction IDs that incremental imports have
+    already exported, so that later imports can skip them.
+    """
+
+    def __init__(self, path: Path | None = None, read_only: bool = False):
+        self.path = path or default_fingerprint_path()
+        if read_only:
+            # Only absolute paths can be written as URIs
+            uri = self.path.expanduser().resolve().as_uri()
+            self.connection = sqlite3.connect(f"{uri}?mode=ro", uri=True)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                transaction_id TEXT PRIMARY KEY,
+                institution TEXT,
+                first_seen TEXT NOT NULL
+            ) WITHOUT ROWID
+            """)
+        self.connection.commit()
+
+    def __enter__(self) -> "FingerprintStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+    def seen(self, transaction_ids: list[str]) -> set[str]:
+        placeholders = ",".join("?" * len(transaction_ids))
+        rows = self.connection.execute(
+            f"SELECT transaction_id FROM fingerprints WHERE transaction_id IN ({placeholders})",
+            transaction_ids,
+        )
+        return {row[0] for row in rows}
+
+    def unseen(
+        self, transactions: Iterable[GenericTransaction]
+    ) -> Iterator[GenericTransaction]:
+        """Filters out transactions recorded by a previous import."""
+        iterator = iter(transactions)
+        while chunk := list(islice(iterator, QUERY_CHUNK_SIZE)):
+            seen = self.seen([transaction.transaction_id for transaction in chunk])
+            for transaction in chunk:
+                if transaction.transaction_id not in seen:
+                    yield transaction
+
+    def record_new(self, entries: Iterable[JournalEntry]) -> Iterator[JournalEntry]:
+        """
+        Records the imported transaction of each entry, dropping entries whose
+        transaction has already been recorded, e.g. because it appeared in two
+        overlapping statements. Changes are only kept once the store is closed
+        without an error.
+        """
+        first_seen = datetime.now().isoformat(timespec="seconds")
+        for entry in entries:
+            # Mappers only ever add transactions after the imported one
+            transaction = entry.transactions[0]
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?)",
+                (transaction.transaction_id, transaction.institution, first_seen),
+            )
+            if cursor.rowcount:
+                yield entry
@@ -1,4 +1,16 @@
-import metamoney.importers.cathay as cathay
-from metamoney.importers.cathay import CathayCsvImporter
 from metamoney.importers.importer import AbstractImporter
 from metamoney.registry import importers
+
+
+def __getattr__(name: str):
+    # Importers are loaded lazily so that importing this package doesn't pull
+    # in every importer's dependencies.
+    if name == "cathay":
+        import metamoney.importers.cathay as cathay
+
+        return cathay
+    if name == "CathayCsvImporter":
+        from metamoney.importers.cathay import CathayCsvImporter
+
+        return CathayCsvImporter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
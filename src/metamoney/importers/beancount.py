@@ -0,0 +1,104 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from metamoney.models.transactions import JournalEntry
+
+DATE = r"(\d{4}-\d{2}-\d{2})"
+ACCOUNT = r"([A-Z][^\s:]*(?::[^\s:]+)+)"
+NUMBER = r"([-+]?[\d,]*\.?\d+)"
+CURRENCY = r"([A-Z][A-Z0-9'._-]*)"
+
+TRANSACTION_LINE = re.compile(rf"{DATE}\s+(?:\*|!|txn)(?:\s|$)")
+POSTING_LINE = re.compile(rf"\s+(?:[!*]\s+)?{ACCOUNT}\s+{NUMBER}\s+{CURRENCY}")
+BALANCE_LINE = re.compile(rf"{DATE}\s+balance\s+{ACCOUNT}\s+{NUMBER}\s+{CURRENCY}")
+
+# A posting is identified by its date, account, amount and currency
+PostingKey = tuple[str, str, Decimal, str]
+BalanceKey = tuple[str, str]
+
+
+def parse_number(number: str) -> Decimal | None:
+    try:
+        return Decimal(number.replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+@dataclass
+class BeancountLedger:
+    """
+    An index of the postings and balance assertions in an existing Beancount
+    ledger, used to tell which imported entries it already contains.
+    """
+
+    postings: Counter[PostingKey] = field(default_factory=Counter)
+    balances: set[BalanceKey] = field(default_factory=set)
+
+    def new_entries(self, entries: Iterable[JournalEntry]) -> Iterator[JournalEntry]:
+        """
+        Filters out entries already in the ledger. Each posting in the ledger
+        only accounts for one entry, so that repeated identical transactions
+        on the same day are still imported.
+        """
+        for entry in entries:
+            if not entry.transactions:
+                yield entry
+                continue
+            # Mappers only ever add transactions after the imported one
+            transaction = entry.transactions[0]
+            key = (
+                entry.timestamp.strftime("%Y-%m-%d"),
+                transaction.account,
+                transaction.amount,
+                transaction.currency,
+            )
+            if self.postings[key] > 0:
+                self.postings[key] -= 1
+            else:
+                yield entry
+
+
+def read_beancount_ledger(stream: TextIO) -> BeancountLedger:
+    """
+    Indexes the transactions and balance assertions in a Beancount file. Only
+    postings with an explicit amount are indexed; other directives are
+    skipped.
+    """
+    ledger = BeancountLedger()
+    date: str | None = None
+
+    for line in stream:
+        if not line.strip():
+            date = None
+            continue
+
+        if not line[0].isspace():
+            date = None
+            transaction = TRANSACTION_LINE.match(line)
+            if transaction:
+                date = transaction.group(1)
+                continue
+            balance = BALANCE_LINE.match(line)
+            if balance:
+                ledger.balances.add((balance.group(1), balance.group(2)))
+            continue
+
+        if date is None:
+            continue
+        posting = POSTING_LINE.match(line)
+        if not posting:
+            continue
+        amount = parse_number(posting.group(2))
+        if amount is not None:
+            ledger.postings[(date, posting.group(1), amount, posting.group(3))] += 1
+
+    return ledger
+
+
+def read_beancount_ledger_path(path: Path) -> BeancountLedger:
+    with open(path) as stream:
+        return read_beancount_ledger(stream)
@@ -1,36 +1,131 @@
 import csv
 import logging
-import sys
-import uuid
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Sequence
-
-from playwright.sync_api import sync_playwright
-
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from metamoney.importers.chunks import (
+    DEFAULT_CHUNK_BYTES,
+    DEFAULT_MIN_PARALLEL_BYTES,
+    map_chunks_in_order,
+    parallel_jobs,
+    read_csv_chunk,
+    split_csv_file,
+)
 from metamoney.importers.importer import AbstractImporter
 from metamoney.models.data_sources import (
     DataSource,
     DataSourceFormat,
     DataSourceInstitution,
 )
+from metamoney.models.filters import TransactionFilter
 from metamoney.models.stream_info import StreamInfo
 from metamoney.models.transactions import CathayTransaction, GenericTransaction
-from metamoney.utils import get_config_module
+from metamoney.pipeline import DEFAULT_BUFFER_SIZE, reverse_buffered
+from metamoney.utils import content_id, get_config_module
+
+if TYPE_CHECKING:
+    from metamoney.retrieval import BrowserPool
+
+
+CATHAY_BASE_URL = "https://www.cathaybk.com.tw"
+CATHAY_ACCOUNT = "Assets:Checking:Cathay"
+
+# The day a row is on, if it was checked, and what reading it produced
+CathayRow = tuple[str | None, CathayTransaction | Exception | None]
+
+# Use the character code for − because it is NOT an ASCII dash
+UNICODE_MINUS = chr(8722)
+ZERO = Decimal(0)
 
 
 def clean_number_string(num_string: str) -> Decimal:
-    # Use the character code for − because it is NOT an ASCII dash
-    clean = num_string.replace(",", "").replace(chr(8722), "")
-    if len(clean) > 0:
-        return Decimal(clean)
+    if not num_string:
+        return ZERO
+    # Most amounts have neither character, and checking is cheaper than copying
+    if "," in num_string:
+        num_string = num_string.replace(",", "")
+    if UNICODE_MINUS in num_string:
+        num_string = num_string.replace(UNICODE_MINUS, "")
+    if num_string:
+        return Decimal(num_string)
     else:
-        return Decimal(0)
+        return ZERO
+
+
+@lru_cache(maxsize=4096)
+def parse_cathay_date(date_string: str) -> datetime:
+    """
+    Parses dates in the format "%Y/%m/%d". Statements repeat the same few
+    dates on many rows, so results are cached.
+    """
+    if (
+        len(date_string) == 10
+        and date_string[4] == "/"
+        and date_string[7] == "/"
+        and date_string.isascii()
+        and date_string[:4].isdigit()
+        and date_string[5:7].isdigit()
+        and date_string[8:].isdigit()
+    ):
+        return datetime(
+            int(date_string[:4]), int(date_string[5:7]), int(date_string[8:])
+        )
+    return datetime.strptime(date_string, "%Y/%m/%d")
+
+
+def is_cathay_date_prefix(value: str) -> bool:
+    """Checks whether a value starts with a date in the format "%Y/%m/%d"."""
+    return (
+        len(value) >= 10
+        and value[:10].isascii()
+        and value[4] == "/"
+        and value[7] == "/"
+        and value[:4].isdigit()
+        and value[5:7].isdigit()
+        and value[8:10].isdigit()
+    )
+
+
+def parse_cathay_timestamp(timestamp_string: str) -> datetime:
+    """Parses timestamps in the format "%Y/%m/%d\n%H:%M"."""
+    if (
+        len(timestamp_string) == 16
+        and timestamp_string[10] == "\n"
+        and timestamp_string[13] == ":"
+        and timestamp_string[11:13].isdigit()
+        and timestamp_string[14:].isdigit()
+        and timestamp_string.isascii()
+    ):
+        return parse_cathay_date(timestamp_string[:10]).replace(
+            hour=int(timestamp_string[11:13]), minute=int(timestamp_string[14:])
+        )
+    return datetime.strptime(timestamp_string, "%Y/%m/%d\n%H:%M")
 
 
 class CathayCsvImporter(AbstractImporter[CathayTransaction]):
     logger = logging.getLogger("CathayCsvImporter")
+    # Cathay statements list the newest transaction first, so transform has
+    # to reverse them; this bounds how many are held in memory while it does.
+    reorder_buffer_size = DEFAULT_BUFFER_SIZE
+
+    def __init__(
+        self,
+        base_url: str = CATHAY_BASE_URL,
+        jobs: int | None = None,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        min_parallel_bytes: int = DEFAULT_MIN_PARALLEL_BYTES,
+    ):
+        # Can point at a local stand-in for the bank's site, e.g. for testing
+        self.base_url = base_url
+        # Files bigger than min_parallel_bytes are parsed in chunks of
+        # chunk_bytes by this many processes, or one per CPU if it's None.
+        # There are never more processes than CPUs.
+        self.jobs = jobs
+        self.chunk_bytes = chunk_bytes
+        self.min_parallel_bytes = min_parallel_bytes
 
     @staticmethod
     def data_format() -> DataSourceFormat:
@@ -41,8 +136,8 @@ class CathayCsvImporter(AbstractImporter[CathayTransaction]):
         return DataSourceInstitution.CATHAY_BANK_TW
 
     def read_cathay_csv_row(self, row: list[str]) -> CathayTransaction:
-        transaction_date = datetime.strptime(row[0], "%Y/%m/%d\n%H:%M")
-        billing_date = datetime.strptime(row[1], "%Y/%m/%d")
+        transaction_date = parse_cathay_timestamp(row[0])
+        billing_date = parse_cathay_date(row[1])
         description = row[2].strip()
 
         withdraw = clean_number_string(row[3])
@@ -54,7 +149,7 @@ class CathayCsvImporter(AbstractImporter[CathayTransaction]):
         transaction_data = row[6]
         notes = row[7].strip()
         return CathayTransaction(
-            uuid.uuid4().hex,
+            content_id(DataSourceInstitution.CATHAY_BANK_TW, *row),
             transaction_date,
             billing_date,
             description,
@@ -65,24 +160,120 @@ class CathayCsvImporter(AbstractImporter[CathayTransaction]):
             notes,
         )
 
-    def read_cathay_csv(self, input_stream: StreamInfo) -> list[CathayTransaction]:
-        reader = csv.reader(input_stream.stream)
-        transactions = []
-        count = 0
-        for i, row in enumerate(reader):
-            count += 1
+    def read_cathay_rows(
+        self, rows: Iterable[list[str]], since: str | None, until: str | None
+    ) -> Iterator[CathayRow]:
+        """
+        Parses rows, yielding the day each is on if a date range is being
+        checked, and the transaction or the exception reading it raised. Rows
+        outside the range aren't parsed, and come with None instead.
+        """
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        check_dates = since is not None or until is not None
+        for row in rows:
+            day = None
+            if check_dates and row and is_cathay_date_prefix(row[0]):
+                day = row[0][:10]
+                if (since is not None and day < since) or (
+                    until is not None and day > until
+                ):
+                    yield day, None
+                    continue
             try:
-                self.logger.debug(row)
-                transactions.append(self.read_cathay_csv_row(row))
+                if debug:
+                    self.logger.debug(row)
+                yield day, self.read_cathay_csv_row(row)
             except Exception as e:
-                self.logger.debug(e)
+                yield day, e
+
+    def read_cathay_chunk(
+        self,
+        since: str | None,
+        until: str | None,
+        path: str,
+        encoding: str,
+        start: int,
+        end: int,
+    ) -> list[CathayRow]:
+        rows = read_csv_chunk(path, encoding, start, end)
+        return list(self.read_cathay_rows(rows, since, until))
+
+    def read_cathay_csv(
+        self,
+        input_stream: StreamInfo,
+        transaction_filter: TransactionFilter | None = None,
+    ) -> Iterator[CathayTransaction]:
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        valid = 0
+        count = 0
+
+        if transaction_filter and not transaction_filter.matches_account(
+            CATHAY_ACCOUNT
+        ):
+            return
+
+        # Dates in the first column are zero-padded, so they can be compared
+        # as strings without parsing the row
+        since = until = None
+        if transaction_filter and transaction_filter.since:
+            since = transaction_filter.since.strftime("%Y/%m/%d")
+        if transaction_filter and transaction_filter.until:
+            until = transaction_filter.until.strftime("%Y/%m/%d")
+        previous_day: str | None = None
+        # Rows are only known to be newest first once two of them have been
+        # seen in descending order, and none in ascending order
+        in_order = True
+        descending = False
+
+        # Large files are split into chunks at record boundaries and parsed
+        # in worker processes, but the rows still come back in file order
+        jobs = parallel_jobs(self.jobs)
+        encoding = getattr(input_stream.stream, "encoding", None)
+        chunks = None
+        if jobs > 1 and Path(input_stream.name).is_file():
+            chunks = split_csv_file(
+                input_stream.name,
+                encoding,
+                jobs,
+                self.chunk_bytes,
+                self.min_parallel_bytes,
+            )
+        if chunks:
+            rows = map_chunks_in_order(
+                partial(self.read_cathay_chunk, since, until),
+                input_stream.name,
+                encoding,
+                chunks,
+                jobs,
+            )
+        else:
+            rows = self.read_cathay_rows(csv.reader(input_stream.stream), since, until)
+
+        for i, (day, transaction) in enumerate(rows):
+            count += 1
+            if day is not None:
+                if previous_day is not None and day > previous_day:
+                    in_order = False
+                elif previous_day is not None and day < previous_day:
+                    descending = True
+                previous_day = day
+                if since is not None and day < since:
+                    # Every later row in a newest-first file is older still
+                    if in_order and descending:
+                        break
+                    continue
+                if until is not None and day > until:
+                    continue
+            if isinstance(transaction, Exception):
+                if debug:
+                    self.logger.debug(transaction)
                 self.logger.info(
                     f"Failed to read row {i} of {input_stream.name} in read_cathay_csv."
                 )
-        self.logger.debug(
-            f"{len(transactions)} valid transactions found in {count} rows."
-        )
-        return transactions
+                continue
+            valid += 1
+            yield transaction
+        self.logger.debug(f"{valid} valid transactions found in {count} rows.")
 
     def convert_one_cathay_to_generic(
         self, transaction: CathayTransaction
@@ -102,97 +293,126 @@ class CathayCsvImporter(AbstractImporter[CathayTransaction]):
             amount=amount,
             balance=transaction.balance,
             currency="NTD",
-            account="Assets:Checking:Cathay",
+            account=CATHAY_ACCOUNT,
             institution=DataSourceInstitution.CATHAY_BANK_TW,
         )
 
-        self.logger.debug(generic)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(generic)
 
         return generic
 
     def convert_cathay_to_generic(
-        self, transactions: Sequence[CathayTransaction]
-    ) -> list[GenericTransaction]:
-        generics = []
+        self, transactions: Iterable[CathayTransaction]
+    ) -> Iterator[GenericTransaction]:
         for transaction in transactions:
-            generics.append(self.convert_one_cathay_to_generic(transaction))
-        return generics[::-1]
+            yield self.convert_one_cathay_to_generic(transaction)
 
-    def scrape_cathay(self):
+    def download_root(self) -> str:
         config = get_config_module()
-        if not (config and config.download_root):
+        if not (config and getattr(config, "download_root", None)):
             raise ValueError("No download root found in config.")
-        download_root = config.download_root
-        if not (
-            config
-            and config.accounts
-            and config.accounts.get(DataSourceInstitution.CATHAY_BANK_TW)
-        ):
-            raise ValueError("Couldn't find account information for Cathay Bank")
-        account_info: dict[str, str] = config.accounts.get(
-            DataSourceInstitution.CATHAY_BANK_TW
-        )
+        return config.download_root
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-            page.goto("https://www.cathaybk.com.tw/mybank")
-            page.goto(
-                "https://www.cathaybk.com.tw/mybank/quicklinks/home/setmultilanguage?Culture=en-US"
-            )
+    async def scrape_cathay_async(
+        self, pool: "BrowserPool", account_info: dict[str, str]
+    ) -> str:
+        download_root = self.download_root()
 
-            page.get_by_label("ID Number").fill(account_info["id_number"])
-            page.get_by_label("Username").fill(account_info["username"])
-            page.get_by_label("Password", exact=True).fill(account_info["password"])
+        async with pool.context() as context:
+            page = await context.new_page()
+            try:
+                await page.goto(f"{self.base_url}/mybank")
+                await page.goto(
+                    f"{self.base_url}/mybank/quicklinks/home/setmultilanguage?Culture=en-US"
+                )
 
-            page.get_by_role("button", name="Login").click()
+                await page.get_by_label("ID Number").fill(account_info["id_number"])
+                await page.get_by_label("Username").fill(account_info["username"])
+                await page.get_by_label("Password", exact=True).fill(
+                    account_info["password"]
+                )
 
-            # <div class="btn-count-down btn  btn-size-md m-btn-height-sm sent-code-btn  " id="js-otp-send" data-btn-word="Send">
-            #     <div class="btn-count-down-bar" style="width: 90%; display: none;">
-            #     </div>
-            # </div>
+                await page.get_by_role("button", name="Login").click()
 
-            page.locator("#js-otp-send").click()
-            # click button "Send"
-            # fill out OTP
-            print("Please enter OTP from SMS:", file=sys.stderr)
-            otp = input()
-            # <input class="has-prefix-code" name="OtpPassword" id="OtpPassword" value="" required="" maxlength="6" tabindex="1" autocomplete="off" data-valid="OtpPassword" pattern="[0-9]*" oninput="NumberFilter(this.value,'OtpPassword')" type="text" placeholder="last 6 numbers">
-            page.get_by_placeholder("last 6 numbers").fill(otp)
+                # <div class="btn-count-down btn  btn-size-md m-btn-height-sm sent-code-btn  " id="js-otp-send" data-btn-word="Send">
+                #     <div class="btn-count-down-bar" style="width: 90%; display: none;">
+                #     </div>
+                # </div>
 
-            # click Submit
-            page.get_by_role("button", name="OK").click()
-            page.get_by_role("button", name="暫時不用").click()
-            page.get_by_role("link", name=account_info["account_no"]).click()
+                await page.locator("#js-otp-send").click()
+                # click button "Send"
+                # fill out OTP
+                otp = await pool.prompt(
+                    f"Please enter OTP from SMS for account {account_info['account_no']}:"
+                )
+                # <input class="has-prefix-code" name="OtpPassword" id="OtpPassword" value="" required="" maxlength="6" tabindex="1" autocomplete="off" data-valid="OtpPassword" pattern="[0-9]*" oninput="NumberFilter(this.value,'OtpPassword')" type="text" placeholder="last 6 numbers">
+                await page.get_by_placeholder("last 6 numbers").fill(otp)
 
-            page.get_by_role("button", name="Print/Download").click()
+                # click Submit
+                await page.get_by_role("button", name="OK").click()
+                await page.get_by_role("button", name="暫時不用").click()
+                await page.get_by_role("link", name=account_info["account_no"]).click()
 
-            with page.expect_download() as download_info:
-                page.get_by_role("menuitem", name="Download CSV").click()
-            download = download_info.value
+                await page.get_by_role("button", name="Print/Download").click()
 
-            ts = datetime.now()
-            filename = ts.strftime(
-                f"%Y-%m-%d-%H%M%S-cathay-{account_info["account_no"]}.csv"
-            )
-            file_path = f"{download_root}/{filename}"
+                async with page.expect_download() as download_info:
+                    await page.get_by_role("menuitem", name="Download CSV").click()
+                download = await download_info.value
 
-            download.save_as(file_path)
+                ts = datetime.now()
+                filename = ts.strftime(
+                    f"%Y-%m-%d-%H%M%S-cathay-{account_info["account_no"]}.csv"
+                )
+                file_path = f"{download_root}/{filename}"
 
-            return file_path
+                await download.save_as(file_path)
+            finally:
+                await page.close()
 
-    def retrieve(self) -> DataSource:
-        file_path = self.scrape_cathay()
+        return file_path
+
+    def scrape_cathay(self) -> str:
+        import asyncio
+
+        from metamoney.retrieval import BrowserPool
+
+        accounts = self.remote_accounts()
+        if not accounts:
+            raise ValueError("Couldn't find account information for Cathay Bank")
+
+        async def scrape_first_account() -> str:
+            async with BrowserPool(size=1) as pool:
+                return await self.scrape_cathay_async(pool, accounts[0])
+
+        return asyncio.run(scrape_first_account())
+
+    def open_download(self, file_path: str) -> DataSource:
         return DataSource(
             DataSourceInstitution.CATHAY_BANK_TW,
             DataSourceFormat.CSV,
             StreamInfo(Path(file_path).open(), file_path),
         )
 
-    def extract(self, data_source: DataSource) -> list[CathayTransaction]:
-        return self.read_cathay_csv(data_source.stream)
+    def retrieve(self) -> DataSource:
+        return self.open_download(self.scrape_cathay())
+
+    async def retrieve_async(
+        self, pool: "BrowserPool", account_info: dict[str, str]
+    ) -> DataSource:
+        return self.open_download(await self.scrape_cathay_async(pool, account_info))
+
+    def extract(
+        self,
+        data_source: DataSource,
+        transaction_filter: TransactionFilter | None = None,
+    ) -> Iterator[CathayTransaction]:
+        return self.read_cathay_csv(data_source.stream, transaction_filter)
 
     def transform(
-        self, source_transactions: Sequence[CathayTransaction]
-    ) -> list[GenericTransaction]:
-        return self.convert_cathay_to_generic(source_transactions)
+        self, source_transactions: Iterable[CathayTransaction]
+    ) -> Iterator[GenericTransaction]:
+        return reverse_buffered(
+            self.convert_cathay_to_generic(source_transactions),
+            self.reorder_buffer_size,
+        )
@@ -0,0 +1,148 @@
+import codecs
+import csv
+import io
+import mmap
+import os
+from collections import deque
+from multiprocessing import parent_process
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+# Starting workers and sending parsed rows back to this process costs more
+# than parsing smaller files in it
+DEFAULT_MIN_PARALLEL_BYTES = 32 * 1024 * 1024
+# How many chunks each worker can have parsed ahead of the one being read
+CHUNKS_AHEAD_PER_JOB = 2
+
+
+def csv_record_boundaries(
+    buffer: bytes | mmap.mmap, chunk_bytes: int = DEFAULT_CHUNK_BYTES
+) -> list[tuple[int, int]]:
+    """
+    Splits a CSV file into (start, end) byte ranges of about chunk_bytes,
+    each ending after a complete record. Quoted fields can contain newlines,
+    so a newline only ends a record if an even number of quotes comes before
+    it in the record. Escaped quotes are doubled, so they don't change that.
+    """
+    size = len(buffer)
+    chunks = []
+    start = 0
+    while start < size:
+        position = start + chunk_bytes
+        if position >= size:
+            chunks.append((start, size))
+            break
+        # Every chunk starts at a record boundary, outside any quotes
+        quoted = buffer[start:position].count(b'"') % 2 == 1
+        end = size
+        while (newline := buffer.find(b"\n", position)) != -1:
+            if buffer[position:newline].count(b'"') % 2 == 1:
+                quoted = not quoted
+            position = newline + 1
+            if not quoted:
+                end = position
+                break
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def read_csv_chunk(path: str, encoding: str, start: int, end: int) -> list[list[str]]:
+    with (
+        open(path, "rb") as csv_file,
+        mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        text = buffer[start:end].decode(encoding)
+    # Translate line endings the same way as a file opened in text mode
+    return list(csv.reader(io.StringIO(text, newline=None)))
+
+
+def chunk_encoding(encoding: str | None) -> str | None:
+    """
+    The encoding to decode chunks with, or None if a chunk boundary could
+    split a character. Newlines and quotes are single bytes which can't be
+    part of another character in UTF-8, Big5 or any ASCII-based encoding.
+    """
+    name = codecs.lookup(encoding or "utf-8").name
+    if name.startswith(("utf-16", "utf-32")):
+        return None
+    return name
+
+
+def usable_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def parallel_jobs(jobs: int | None) -> int:
+    """How many workers to parse chunks with, at most one per usable CPU."""
+    return min(jobs or usable_cpus(), usable_cpus())
+
+
+def split_csv_file(
+    path: str,
+    encoding: str | None,
+    jobs: int,
+    chunk_bytes: int,
+    min_bytes: int = DEFAULT_MIN_PARALLEL_BYTES,
+) -> list[tuple[int, int]] | None:
+    """
+    The chunks to parse a CSV file in, or None if it should be read in one
+    piece: when there's only one job, the file is smaller than min_bytes or
+    fits in one chunk, it can't be split safely, or this is already a worker
+    process.
+    """
+    if jobs < 2 or parent_process() is not None or chunk_encoding(encoding) is None:
+        return None
+    try:
+        if os.path.getsize(path) <= max(chunk_bytes, min_bytes):
+            return None
+        with (
+            open(path, "rb") as csv_file,
+            mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+        ):
+            chunks = csv_record_boundaries(buffer, chunk_bytes)
+    except (OSError, ValueError):
+        return None
+    return chunks if len(chunks) > 1 else None
+
+
+def map_chunks_in_order(
+    parse_chunk: Callable[[str, str, int, int], list[T]],
+    path: str,
+    encoding: str | None,
+    chunks: Iterable[tuple[int, int]],
+    jobs: int,
+) -> Iterator[T]:
+    """
+    Parses chunks of a file in a pool of worker processes, yielding what
+    each returns in file order. Only a few chunks are parsed ahead of the
+    one being read, and the rest are cancelled if the caller stops early.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    decode_as = chunk_encoding(encoding)
+    if decode_as is None:
+        raise ValueError(f"Can't split files encoded as {encoding} into chunks.")
+    chunks = iter(chunks)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        try:
+            for start, end in chunks:
+                pending.append(pool.submit(parse_chunk, path, decode_as, start, end))
+                if len(pending) >= jobs * CHUNKS_AHEAD_PER_JOB:
+                    break
+            while pending:
+                results = pending.popleft().result()
+                for start, end in chunks:
+                    pending.append(
+                        pool.submit(parse_chunk, path, decode_as, start, end)
+                    )
+                    break
+                yield from results
+        finally:
+            for future in pending:
+                future.cancel()
@@ -1,13 +1,30 @@
 from abc import ABC, abstractmethod
-from typing import Generic, Sequence, TypeVar
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Generic,
+    Iterable,
+    Iterator,
+    Sequence,
+    TypeVar,
+)
 
 from metamoney.models.data_sources import DataSource
+from metamoney.models.filters import TransactionFilter
 from metamoney.models.transactions import GenericTransaction
+from metamoney.utils import get_config_module
+
+if TYPE_CHECKING:
+    from metamoney.retrieval import BrowserPool
 
 T = TypeVar("T")
 
 
 class AbstractImporter(ABC, Generic[T]):
+    # Bump this whenever a change to extract or transform would produce
+    # different transactions from the same file, so cached statements aren't
+    # reused
+    version = "1"
 
     @staticmethod
     @abstractmethod
@@ -23,17 +40,65 @@ class AbstractImporter(ABC, Generic[T]):
     def retrieve(self) -> DataSource:
         pass
 
+    def remote_accounts(self) -> Sequence[dict[str, str]]:
+        """
+        The accounts to retrieve, from the config's accounts for this
+        importer's institution. Either one account or a list can be given.
+        """
+        config = get_config_module()
+        accounts = getattr(config, "accounts", None) or {}
+        account_info = accounts.get(self.data_institution())
+        if not account_info:
+            return []
+        if isinstance(account_info, dict):
+            return [account_info]
+        return list(account_info)
+
+    async def retrieve_async(
+        self, pool: "BrowserPool", account_info: dict[str, str]
+    ) -> DataSource:
+        raise NotImplementedError(
+            f"{self.__class__.__name__} doesn't support async retrieval."
+        )
+
+    async def retrieve_many(
+        self,
+        pool: "BrowserPool",
+        accounts: Sequence[dict[str, str]] | None = None,
+    ) -> AsyncIterator[DataSource]:
+        """
+        Retrieves several accounts concurrently, yielding each data source as
+        soon as it has been downloaded.
+        """
+        # asyncio is only imported when something is actually retrieved
+        from metamoney.retrieval import as_completed
+
+        if accounts is None:
+            accounts = self.remote_accounts()
+        jobs = [self.retrieve_async(pool, account_info) for account_info in accounts]
+        async for data_source in as_completed(jobs):
+            yield data_source
+
     @abstractmethod
-    def extract(self, data_source: DataSource) -> Sequence[T]:
+    def extract(
+        self,
+        data_source: DataSource,
+        transaction_filter: TransactionFilter | None = None,
+    ) -> Iterator[T]:
+        """
+        Reads source transactions. transaction_filter is a hint which lets
+        importers skip rows cheaply; anything it lets through is filtered
+        again after transform, so importers don't have to apply it exactly.
+        """
         pass
 
     @abstractmethod
     def transform(
-        self, source_transactions: Sequence[T]
-    ) -> Sequence[GenericTransaction]:
+        self, source_transactions: Iterable[T]
+    ) -> Iterator[GenericTransaction]:
         pass
 
-    def ingest(self) -> Sequence[GenericTransaction]:
+    def ingest(self) -> Iterator[GenericTransaction]:
         data_source: DataSource = self.retrieve()
-        transactions: Sequence = self.extract(data_source)
+        transactions: Iterator = self.extract(data_source)
         return self.transform(transactions)
@@ -0,0 +1,48 @@
+import re
+from functools import cached_property
+from typing import Callable
+
+from metamoney.models.transactions import JournalEntry
+
+# Conditions are callable objects rather than closures so that the rule
+# compiler in metamoney.mappers.rules can inspect them.
+
+
+class AllCondition:
+    def __init__(self, *conditions: Callable[[JournalEntry], bool]):
+        self.conditions = conditions
+
+    def __call__(self, entry: JournalEntry) -> bool:
+        # i.e. execute all of them with the entry provided, check that all return true
+        return all(condition(entry) for condition in self.conditions)
+
+
+class AnyCondition:
+    def __init__(self, *conditions: Callable[[JournalEntry], bool]):
+        self.conditions = conditions
+
+    def __call__(self, entry: JournalEntry) -> bool:
+        # i.e. execute all of them with the entry provided, check that at least one returns true
+        return any(condition(entry) for condition in self.conditions)
+
+
+class TransactionFieldMatchesCondition:
+    def __init__(self, field: str, regexp: str):
+        self.field = field
+        self.regexp = regexp
+
+    # Compiled on first use, since mappings compiled into a plan never need it
+    @cached_property
+    def pattern(self) -> re.Pattern:
+        return re.compile(self.regexp)
+
+    def __call__(self, entry: JournalEntry) -> bool:
+        for transaction in entry.transactions:
+            field_val = getattr(transaction, self.field)
+            if field_val is None:
+                continue
+            elif not isinstance(field_val, str):
+                raise TypeError()
+            if self.pattern.match(field_val):
+                return True
+        return False
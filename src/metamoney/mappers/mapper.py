@@ -1,15 +1,19 @@
 import re
 from abc import ABC, abstractmethod
-from copy import deepcopy
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Callable, Sequence
-from uuid import uuid4
-
-import yaml
-
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Sequence
+
+from metamoney.mappers.conditions import (
+    AllCondition,
+    AnyCondition,
+    TransactionFieldMatchesCondition,
+)
+from metamoney.mappers.rules import MappingPlan, compile_mappings
 from metamoney.models.transactions import GenericTransaction, JournalEntry
-from metamoney.utils import pascal_to_snake
+from metamoney.utils import content_id, pascal_to_snake
+
+if TYPE_CHECKING:
+    from metamoney.profiling import Profiler
 
 
 @dataclass
@@ -18,42 +22,9 @@ class Mapping:
     apply: Sequence[Callable[[JournalEntry], JournalEntry]]
 
 
-def AllCondition(
-    *args: Callable[[JournalEntry], bool]
-) -> Callable[[JournalEntry], bool]:
-    # i.e. execute all of them with the entry provided, check that all return true
-    return lambda e: all(map(lambda c: c(e), args))
-
-
-def AnyCondition(
-    *args: Callable[[JournalEntry], bool]
-) -> Callable[[JournalEntry], bool]:
-    # i.e. execute all of them with the entry provided, check that at least one returns true
-    return lambda e: any(map(lambda c: c(e), args))
-
-
-def TransactionFieldMatchesCondition(
-    field: str, regexp: str
-) -> Callable[[JournalEntry], bool]:
-    def fn(entry: JournalEntry):
-        for transaction in entry.transactions:
-            field_val = getattr(transaction, field)
-            if field_val is None:
-                continue
-            elif not isinstance(field_val, str):
-                raise TypeError()
-            if re.match(regexp, field_val):
-                return True
-        return False
-
-    return fn
-
-
 def SetNarrationRemap(new_narration: str) -> Callable[[JournalEntry], JournalEntry]:
     def remap(entry: JournalEntry) -> JournalEntry:
-        new_entry = deepcopy(entry)
-        new_entry.narration = new_narration
-        return new_entry
+        return replace(entry, narration=new_narration)
 
     return remap
 
@@ -62,7 +33,6 @@ def AddCounterTransactionRemap(
     counter_transaction_category: str,
 ) -> Callable[[JournalEntry], JournalEntry]:
     def remap(entry: JournalEntry) -> JournalEntry:
-        new_entry = deepcopy(entry)
         asset_transactions = list(
             filter(lambda t: re.match("^Assets.*", t.account), entry.transactions)
         )
@@ -70,7 +40,7 @@ def AddCounterTransactionRemap(
             raise ValueError()
         asset_transaction = asset_transactions[0]
         counter_transaction = GenericTransaction(
-            uuid4().hex,
+            content_id(asset_transaction.transaction_id, counter_transaction_category),
             asset_transaction.timestamp,
             None,
             None,
@@ -80,8 +50,7 @@ def AddCounterTransactionRemap(
             counter_transaction_category,
             None,
         )
-        new_entry.transactions.append(counter_transaction)
-        return new_entry
+        return replace(entry, transactions=(*entry.transactions, counter_transaction))
 
     return remap
 
@@ -90,9 +59,9 @@ class AbstractMapper(ABC):
     @abstractmethod
     def map(
         self,
-        transactions: Sequence[GenericTransaction],
-        journal_entries: Sequence[JournalEntry],
-    ) -> Sequence[JournalEntry]:
+        transactions: Iterable[GenericTransaction],
+        journal_entries: Iterable[JournalEntry],
+    ) -> Iterator[JournalEntry]:
         raise NotImplementedError()
 
 
@@ -104,33 +73,41 @@ class InitialMapper(AbstractMapper):
 
     def map(
         self,
-        transactions: Sequence[GenericTransaction],
-        journal_entries: Sequence[JournalEntry],
-    ) -> Sequence[JournalEntry]:
-        return [
+        transactions: Iterable[GenericTransaction],
+        journal_entries: Iterable[JournalEntry],
+    ) -> Iterator[JournalEntry]:
+        return (
             JournalEntry(
-                transaction.timestamp, transaction.description or "", [transaction]
+                transaction.timestamp, transaction.description or "", (transaction,)
             )
             for transaction in transactions
-        ]
+        )
 
 
 class GeneralMapper(AbstractMapper):
 
-    def __init__(self, mappings: Sequence[Mapping]):
+    def __init__(
+        self,
+        mappings: Sequence[Mapping],
+        plan: MappingPlan | None = None,
+        profiler: "Profiler | None" = None,
+    ):
         super(GeneralMapper, self).__init__()
         self.mappings = mappings
+        self.plan = plan or compile_mappings(mappings)
+        self.profiler = profiler
 
     def map(
         self,
-        transactions: Sequence[GenericTransaction],
-        journal_entries: Sequence[JournalEntry],
-    ) -> Sequence[JournalEntry]:
-        entries = list(journal_entries)
-        for mapping in self.mappings:
-            for i in range(len(entries)):
-                if not mapping.condition(entries[i]):
-                    continue
-                for apply_fn in mapping.apply:
-                    entries[i] = apply_fn(entries[i])
-        return entries
+        transactions: Iterable[GenericTransaction],
+        journal_entries: Iterable[JournalEntry],
+    ) -> Iterator[JournalEntry]:
+        # Entries are independent of each other, so applying every mapping to
+        # one entry before moving on is equivalent to applying each mapping to
+        # every entry in turn.
+        if self.profiler:
+            for entry in journal_entries:
+                yield self.plan.apply_profiled(entry, self.profiler)
+            return
+        for entry in journal_entries:
+            yield self.plan.apply(entry)
@@ -0,0 +1,307 @@
+import re
+from bisect import insort
+from itertools import compress
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Iterable, Sequence
+
+from metamoney.mappers.conditions import (
+    AllCondition,
+    AnyCondition,
+    TransactionFieldMatchesCondition,
+)
+from metamoney.models.transactions import JournalEntry
+
+if TYPE_CHECKING:
+    from metamoney.mappers.mapper import Mapping
+    from metamoney.profiling import MappingStats, Profiler
+
+# Patterns which only test for a literal prefix, e.g. "^Assets.*" or "VULTR"
+LITERAL_PREFIX = re.compile(
+    r"\^?((?:[^\\.^$*+?{}\[\]|()]|\\[\\.^$*+?{}\[\]|()])*)(?:\.\*)?"
+)
+UNESCAPE = re.compile(r"\\(.)")
+# Patterns which can't be merged into a combined regex because they depend on
+# group numbering, group names, or global inline flags
+UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?<[a-zA-Z_]|\(\?\(|\(\?[aiLmsux]+\)")
+
+# A leaf is identified by the field it tests and the index of its pattern in
+# that field's matcher.
+Leaf = tuple[str, int]
+# Fields holding a value which isn't a string map to None, so that the error is
+# only raised if a condition on that field is actually evaluated.
+MatchSets = dict[str, set[int] | None]
+
+
+class FieldMatcher:
+    """
+    Tests a single field value against every pattern used on that field in
+    one pass. Literal prefixes are looked up in a dictionary keyed by prefix;
+    all other patterns are merged into one regular expression, guarded by a
+    plain alternation which rejects non-matching values in a single call.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.pattern_ids: dict[str, int] = {}
+        self.prefixes: dict[str, list[int]] = {}
+        self.prefix_lengths: list[int] = []
+        self.merged: list[tuple[int, str]] = []
+        self.separate: list[tuple[int, re.Pattern]] = []
+        self.guard: re.Pattern | None = None
+        self.combined: re.Pattern | None = None
+        self.combined_ids: list[int] = []
+        self.combined_groups: list[bool] = []
+
+    def add(self, regexp: str) -> int:
+        if regexp in self.pattern_ids:
+            return self.pattern_ids[regexp]
+        pattern_id = len(self.pattern_ids)
+        self.pattern_ids[regexp] = pattern_id
+
+        literal = LITERAL_PREFIX.fullmatch(regexp)
+        if literal:
+            prefix = UNESCAPE.sub(r"\1", literal.group(1))
+            if prefix not in self.prefixes:
+                self.prefixes[prefix] = []
+                insort(self.prefix_lengths, len(prefix))
+            self.prefixes[prefix].append(pattern_id)
+        elif UNMERGEABLE.search(regexp):
+            self.separate.append((pattern_id, re.compile(regexp)))
+        else:
+            # Compile on its own first so that errors point at the user's pattern
+            re.compile(regexp)
+            self.merged.append((pattern_id, regexp))
+        return pattern_id
+
+    def build(self):
+        if not self.merged:
+            return
+        self.guard = re.compile("|".join(f"(?:{regexp})" for _, regexp in self.merged))
+        # An optional lookahead per pattern lets one match report every
+        # pattern which matches at the start of the value.
+        self.combined = re.compile(
+            "".join(
+                f"(?:(?=(?P<_p{pattern_id}>{regexp})))?"
+                for pattern_id, regexp in self.merged
+            )
+        )
+        self.combined_ids = [pattern_id for pattern_id, _ in self.merged]
+        groups = set(self.combined.groupindex.values())
+        self.combined_groups = [i + 1 in groups for i in range(self.combined.groups)]
+
+    def match(self, value: str, matched: set[int]):
+        for length in self.prefix_lengths:
+            if length > len(value):
+                break
+            pattern_ids = self.prefixes.get(value[:length])
+            if pattern_ids:
+                matched.update(pattern_ids)
+
+        if self.combined and self.guard.match(value):
+            groups = self.combined.match(value).groups()
+            matched.update(
+                compress(
+                    self.combined_ids,
+                    [
+                        group is not None
+                        for group in compress(groups, self.combined_groups)
+                    ],
+                )
+            )
+
+        for pattern_id, pattern in self.separate:
+            if pattern.match(value):
+                matched.add(pattern_id)
+
+
+class Node:
+    def evaluate(self, entry: JournalEntry, matches: MatchSets) -> bool:
+        raise NotImplementedError()
+
+    def trigger(self) -> set[Leaf] | None:
+        """
+        Returns a set of leaves at least one of which must match for this node
+        to be true, or None if no such set is known.
+        """
+        return None
+
+
+class FieldNode(Node):
+    def __init__(self, field: str, pattern_id: int):
+        self.field = field
+        self.pattern_id = pattern_id
+
+    def evaluate(self, entry: JournalEntry, matches: MatchSets) -> bool:
+        matched = matches[self.field]
+        if matched is None:
+            raise TypeError()
+        return self.pattern_id in matched
+
+    def trigger(self) -> set[Leaf] | None:
+        return {(self.field, self.pattern_id)}
+
+
+class AllNode(Node):
+    def __init__(self, children: Sequence[Node]):
+        self.children = children
+
+    def evaluate(self, entry: JournalEntry, matches: MatchSets) -> bool:
+        for child in self.children:
+            if not child.evaluate(entry, matches):
+                return False
+        return True
+
+    def trigger(self) -> set[Leaf] | None:
+        triggers = [t for t in (c.trigger() for c in self.children) if t is not None]
+        if not triggers:
+            return None
+        return min(triggers, key=len)
+
+
+class AnyNode(Node):
+    def __init__(self, children: Sequence[Node]):
+        self.children = children
+
+    def evaluate(self, entry: JournalEntry, matches: MatchSets) -> bool:
+        for child in self.children:
+            if child.evaluate(entry, matches):
+                return True
+        return False
+
+    def trigger(self) -> set[Leaf] | None:
+        leaves: set[Leaf] = set()
+        for child in self.children:
+            child_trigger = child.trigger()
+            if child_trigger is None:
+                return None
+            leaves |= child_trigger
+        return leaves
+
+
+class CallableNode(Node):
+    """Wraps a user-defined condition which the compiler can't see inside."""
+
+    def __init__(self, condition: Callable[[JournalEntry], bool]):
+        self.condition = condition
+
+    def evaluate(self, entry: JournalEntry, matches: MatchSets) -> bool:
+        return bool(self.condition(entry))
+
+
+class MappingPlan:
+    """
+    A compiled form of a sequence of mappings. Applying the plan to an entry
+    gives the same result as testing each mapping's condition in order and
+    applying its remaps whenever the condition holds.
+    """
+
+    def __init__(self, mappings: Sequence["Mapping"]):
+        self.mappings = mappings
+        self.matchers: dict[str, FieldMatcher] = {}
+        self.conditions = [self.compile(m.condition) for m in mappings]
+        for matcher in self.matchers.values():
+            matcher.build()
+
+        # Index every mapping by the leaves which can trigger it, so that only
+        # mappings which might match an entry are evaluated.
+        self.triggered_by: dict[Leaf, list[int]] = {}
+        self.triggered_by_field: dict[str, list[int]] = {}
+        self.always_candidates: list[int] = []
+        for i, condition in enumerate(self.conditions):
+            trigger = condition.trigger()
+            if trigger is None:
+                self.always_candidates.append(i)
+                continue
+            for leaf in trigger:
+                self.triggered_by.setdefault(leaf, []).append(i)
+                self.triggered_by_field.setdefault(leaf[0], []).append(i)
+
+    def compile(self, condition: Callable[[JournalEntry], bool]) -> Node:
+        if isinstance(condition, TransactionFieldMatchesCondition):
+            matcher = self.matchers.get(condition.field)
+            if matcher is None:
+                matcher = FieldMatcher(condition.field)
+                self.matchers[condition.field] = matcher
+            return FieldNode(condition.field, matcher.add(condition.regexp))
+        if isinstance(condition, AllCondition):
+            return AllNode([self.compile(c) for c in condition.conditions])
+        if isinstance(condition, AnyCondition):
+            return AnyNode([self.compile(c) for c in condition.conditions])
+        return CallableNode(condition)
+
+    def match_fields(self, entry: JournalEntry) -> MatchSets:
+        matches: MatchSets = {}
+        for field, matcher in self.matchers.items():
+            matched: set[int] | None = set()
+            for transaction in entry.transactions:
+                field_val = getattr(transaction, field)
+                if field_val is None:
+                    continue
+                elif not isinstance(field_val, str):
+                    matched = None
+                    break
+                matcher.match(field_val, matched)
+            matches[field] = matched
+        return matches
+
+    def candidates(self, matches: MatchSets, after: int) -> list[int]:
+        candidates = {i for i in self.always_candidates if i > after}
+        for field, matched in matches.items():
+            if matched is None:
+                candidates.update(
+                    i for i in self.triggered_by_field.get(field, ()) if i > after
+                )
+                continue
+            for pattern_id in matched:
+                for i in self.triggered_by.get((field, pattern_id), ()):
+                    if i > after:
+                        candidates.add(i)
+        return sorted(candidates)
+
+    def apply(self, entry: JournalEntry) -> JournalEntry:
+        last_applied = -1
+        while True:
+            matches = self.match_fields(entry)
+            for i in self.candidates(matches, last_applied):
+                if not self.conditions[i].evaluate(entry, matches):
+                    continue
+                for apply_fn in self.mappings[i].apply:
+                    entry = apply_fn(entry)
+                last_applied = i
+                # The remaps may have changed the fields that were matched,
+                # so the remaining candidates have to be worked out again.
+                break
+            else:
+                return entry
+
+    def apply_profiled(self, entry: JournalEntry, profiler: "Profiler") -> JournalEntry:
+        """The same as apply, but records how long each mapping takes."""
+        if len(profiler.mappings) != len(self.conditions):
+            profiler.profile_mappings(self.mappings)
+        stats: list["MappingStats"] = profiler.mappings
+
+        last_applied = -1
+        while True:
+            start = perf_counter()
+            matches = self.match_fields(entry)
+            profiler.field_matching_seconds += perf_counter() - start
+            for i in self.candidates(matches, last_applied):
+                start = perf_counter()
+                matched = self.conditions[i].evaluate(entry, matches)
+                applied = perf_counter()
+                stats[i].evaluations += 1
+                stats[i].condition_seconds += applied - start
+                if not matched:
+                    continue
+                for apply_fn in self.mappings[i].apply:
+                    entry = apply_fn(entry)
+                stats[i].fired += 1
+                stats[i].apply_seconds += perf_counter() - applied
+                last_applied = i
+                break
+            else:
+                return entry
+
+
+def compile_mappings(mappings: Iterable["Mapping"]) -> MappingPlan:
+    return MappingPlan(list(mappings))
@@ -1,101 +1,82 @@
 import sys
-from dataclasses import dataclass
-from typing import Iterable, Sequence, TextIO, Tuple
+from typing import TYPE_CHECKING, Iterable, Sequence, Tuple
 
-from metamoney.exporters import BeancountExporter
 from metamoney.exporters.exporter import AbstractExporter
-from metamoney.importers import CathayCsvImporter
 from metamoney.importers.importer import AbstractImporter
-from metamoney.mappers.mapper import Mapping
+from metamoney.mappers.mapper import GeneralMapper, Mapping
+from metamoney.mappers.rules import MappingPlan, compile_mappings
 from metamoney.models.stream_info import StreamInfo
-from metamoney.registry import Registry
+from metamoney.registry import (
+    BUILTIN_EXPORTERS,
+    BUILTIN_IMPORTERS,
+    Registry,
+    entry_point_specs,
+    exporter_key,
+    importer_key,
+)
 from metamoney.utils import get_config_module
 
+if TYPE_CHECKING:
+    from metamoney.profiling import Profiler
+    from metamoney.statement_cache import StatementCache
+
 
 class AppData:
     def __init__(self):
         config = get_config_module()
         self.config = config
-        self._importer_file_types: list[str] = []
-        self._importer_institutions: list[str] = []
-        self._exporter_file_types: list[str] = []
-        self.importers = Registry[AbstractImporter]()
-        self.exporters = Registry[AbstractExporter]()
-
-        file_importers = [CathayCsvImporter()]
-        for file_importer in file_importers:
-            self.importers.register(file_importer)
-            self._importer_file_types.append(file_importer.data_format())
-            self._importer_institutions.append(file_importer.data_institution())
-
-        file_exporters = [BeancountExporter()]
-        for file_exporter in file_exporters:
-            self.exporters.register(file_exporter)
-            self._exporter_file_types.append(file_exporter.data_format())
-
-        if config and isinstance(config.importers, Iterable):
-            for file_importer in config.importers:
+        self.importers = Registry[AbstractImporter](importer_key)
+        self.exporters = Registry[AbstractExporter](exporter_key)
+
+        # Built-in and installed services are only imported and constructed
+        # when they're looked up, using the keys they declare up front.
+        for spec in BUILTIN_IMPORTERS + entry_point_specs("metamoney.importers"):
+            self.importers.register_lazy(spec)
+
+        for spec in BUILTIN_EXPORTERS + entry_point_specs("metamoney.exporters"):
+            self.exporters.register_lazy(spec)
+
+        config_importers = getattr(config, "importers", None)
+        if config and isinstance(config_importers, Iterable):
+            for file_importer in config_importers:
                 if isinstance(file_importer, AbstractImporter):
-                    existing_importer = self.get_importer(
-                        file_importer.data_institution(), file_importer.data_format()
-                    )
-                    if existing_importer:
-                        self.importers.unregister(existing_importer.__class__)
-                    self.importers.register(file_importer)
-
-        if config and isinstance(config.exporters, Iterable):
-            for file_exporter in config.exporters:
+                    self.importers.replace(file_importer)
+
+        config_exporters = getattr(config, "exporters", None)
+        if config and isinstance(config_exporters, Iterable):
+            for file_exporter in config_exporters:
                 if isinstance(file_exporter, AbstractExporter):
-                    existing_exporter = self.get_exporter(file_exporter.data_format())
-                    if existing_exporter:
-                        self.exporters.unregister(existing_exporter.__class__)
-                    self.exporters.register(file_exporter)
+                    self.exporters.replace(file_exporter)
 
         self.output_stream = StreamInfo(sys.stdout, "stdout")
+        # Compiled on first use, and kept for every later job when serving
+        self.mapping_plan: MappingPlan | None = None
 
     def get_importer(
         self, institution: str, data_format: str
     ) -> AbstractImporter | None:
-        def filter_fn(importer: AbstractImporter) -> bool:
-            return (
-                importer.data_institution() == institution
-                and importer.data_format() == data_format
-            )
-
-        importer_list = self.importers.filter_services(filter_fn)
-        if not importer_list:
-            return None
-        return importer_list[0]
+        return self.importers.find((institution, data_format))
 
     def get_exporter(self, export_format: str) -> AbstractExporter | None:
+        return self.exporters.find((export_format,))
 
-        exporter_list = self.exporters.filter_services(
-            lambda ex: ex.data_format() == export_format
-        )
-        if not exporter_list:
-            return None
-        return exporter_list[0]
-
+    # These are all read straight off the registries' key indexes, and
+    # include any importers and exporters added by the config.
     @property
     def importer_file_types(self) -> Sequence[str]:
-        return self._importer_file_types
+        return list(dict.fromkeys(key[1] for key in self.importers.keys()))
 
     @property
     def importer_institutions(self) -> Sequence[str]:
-        return self._importer_institutions
+        return list(dict.fromkeys(key[0] for key in self.importers.keys()))
 
     @property
     def importer_pairs(self) -> Sequence[Tuple[str, str]]:
-        pairs = []
-        for importer in self.importers.filter_services(lambda _: True):
-            pairs.append(
-                    (importer.data_institution(),importer.data_format())
-            )
-        return pairs
+        return [(key[0], key[1]) for key in self.importers.keys()]
 
     @property
     def exporter_file_types(self) -> Sequence[str]:
-        return self._exporter_file_types
+        return [key[0] for key in self.exporters.keys()]
 
     @property
     def mappings(self) -> Sequence[Mapping]:
@@ -104,3 +85,28 @@ class AppData:
             return mappings
         mappings.extend(self.config.mappings)
         return mappings
+
+    def general_mapper(self, profiler: "Profiler | None" = None) -> GeneralMapper:
+        """Builds a mapper for the config's mappings."""
+        mappings = self.mappings
+        if self.mapping_plan is None:
+            self.mapping_plan = compile_mappings(mappings)
+        return GeneralMapper(mappings, self.mapping_plan, profiler)
+
+    def statement_cache(self) -> "StatementCache | None":
+        """
+        The cache of parsed statements, unless the config sets
+        cache_statements = False. Its size comes from statement_cache_bytes.
+        """
+        if not getattr(self.config, "cache_statements", True):
+            return None
+        from metamoney.statement_cache import (
+            DEFAULT_STATEMENT_CACHE_BYTES,
+            StatementCache,
+        )
+
+        return StatementCache(
+            max_bytes=getattr(
+                self.config, "statement_cache_bytes", DEFAULT_STATEMENT_CACHE_BYTES
+            )
+        )
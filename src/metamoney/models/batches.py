@@ -0,0 +1,203 @@
+from array import array
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+from metamoney.models.transactions import GenericTransaction
+
+DEFAULT_BATCH_SIZE = 4096
+ID_BYTES = 16
+
+ORDINAL_EPOCH = datetime(1, 1, 1)
+
+
+def timestamp_to_micros(timestamp: datetime) -> int:
+    if timestamp.tzinfo is not None:
+        raise ValueError("TransactionBatch can only hold naive timestamps.")
+    return (timestamp - ORDINAL_EPOCH) // timedelta(microseconds=1)
+
+
+def micros_to_timestamp(micros: int) -> datetime:
+    return ORDINAL_EPOCH + timedelta(microseconds=micros)
+
+
+class StringTable:
+    """
+    Interns repeated strings such as accounts and currencies so that a column
+    only needs to hold a small integer per row. Code 0 is reserved for None.
+    """
+
+    def __init__(self):
+        self.strings: list[Optional[str]] = [None]
+        self.codes: dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.codes[value] = code
+            self.strings.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> Optional[str]:
+        return self.strings[code]
+
+    # The codes can be rebuilt from the strings, so only those are pickled
+    def __getstate__(self) -> list[Optional[str]]:
+        return self.strings
+
+    def __setstate__(self, strings: list[Optional[str]]):
+        self.strings = strings
+        self.codes = {value: code for code, value in enumerate(strings) if code}
+
+
+class TransactionBatch:
+    """
+    A columnar block of generic transactions. Amounts and balances are held as
+    integers in minor units at a scale shared by the whole batch, timestamps as
+    microseconds, hex transaction IDs as raw bytes, and repeated strings as
+    codes into a per-batch string table.
+
+    Amounts are normalised to the batch's scale, so Decimal("1.5") in a batch
+    which also holds Decimal("0.25") comes back out as Decimal("1.50"). Prices
+    have a scale of their own, since exchange rates need many more places.
+    """
+
+    def __init__(self):
+        self.scale = 0
+        self.length = 0
+        self.id_bytes = bytearray()
+        # IDs which aren't 32 lowercase hex digits, keyed by row
+        self.other_ids: dict[int, str] = {}
+        self.timestamps = array("q")
+        self.amounts = array("q")
+        self.balances = array("q")
+        self.has_balance = bytearray()
+        self.price_scale = 0
+        self.prices = array("q")
+        self.price_currencies = array("I")
+        self.strings = StringTable()
+        self.payees = array("I")
+        self.descriptions = array("I")
+        self.currencies = array("I")
+        self.accounts = array("I")
+        self.institutions = array("I")
+
+    @classmethod
+    def from_transactions(
+        cls, transactions: Iterable[GenericTransaction]
+    ) -> "TransactionBatch":
+        batch = cls()
+        batch.extend(transactions)
+        return batch
+
+    def rescale(self, scale: int):
+        factor = 10 ** (scale - self.scale)
+        self.amounts = array("q", (amount * factor for amount in self.amounts))
+        self.balances = array("q", (balance * factor for balance in self.balances))
+        self.scale = scale
+
+    def fit_scale(self, value: Decimal):
+        exponent = value.as_tuple().exponent
+        if isinstance(exponent, int) and -exponent > self.scale:
+            self.rescale(-exponent)
+
+    def to_units(self, value: Decimal) -> int:
+        self.fit_scale(value)
+        return int(value.scaleb(self.scale))
+
+    def from_units(self, units: int) -> Decimal:
+        return Decimal(units).scaleb(-self.scale)
+
+    def price_to_units(self, price: Decimal) -> int:
+        exponent = price.as_tuple().exponent
+        if isinstance(exponent, int) and -exponent > self.price_scale:
+            factor = 10 ** (-exponent - self.price_scale)
+            self.prices = array("q", (p * factor for p in self.prices))
+            self.price_scale = -exponent
+        return int(price.scaleb(self.price_scale))
+
+    def append(self, transaction: GenericTransaction):
+        # Fit both amounts before converting either, since that can rescale
+        # the columns
+        if transaction.balance is not None:
+            self.fit_scale(transaction.balance)
+        amount = self.to_units(transaction.amount)
+        balance = (
+            self.to_units(transaction.balance) if transaction.balance is not None else 0
+        )
+        self.append_id(transaction.transaction_id)
+        self.timestamps.append(timestamp_to_micros(transaction.timestamp))
+        self.amounts.append(amount)
+        self.balances.append(balance)
+        self.has_balance.append(transaction.balance is not None)
+        # Unpriced rows have a price currency code of 0. Convert the price
+        # before appending, since that can replace the column.
+        price = (
+            self.price_to_units(transaction.price)
+            if transaction.price is not None
+            else 0
+        )
+        self.prices.append(price)
+        self.price_currencies.append(self.strings.code(transaction.price_currency))
+        self.payees.append(self.strings.code(transaction.payee))
+        self.descriptions.append(self.strings.code(transaction.description))
+        self.currencies.append(self.strings.code(transaction.currency))
+        self.accounts.append(self.strings.code(transaction.account))
+        self.institutions.append(self.strings.code(transaction.institution))
+        self.length += 1
+
+    def append_id(self, transaction_id: str):
+        raw = b""
+        if len(transaction_id) == 32:
+            try:
+                raw = bytes.fromhex(transaction_id)
+            except ValueError:
+                pass
+        if len(raw) != ID_BYTES or raw.hex() != transaction_id:
+            self.other_ids[self.length] = transaction_id
+            raw = bytes(ID_BYTES)
+        self.id_bytes += raw
+
+    def transaction_id(self, i: int) -> str:
+        other = self.other_ids.get(i)
+        if other is not None:
+            return other
+        return self.id_bytes[i * ID_BYTES : (i + 1) * ID_BYTES].hex()
+
+    def extend(self, transactions: Iterable[GenericTransaction]):
+        for transaction in transactions:
+            self.append(transaction)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, i: int) -> GenericTransaction:
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("TransactionBatch index out of range")
+        strings = self.strings
+        return GenericTransaction(
+            transaction_id=self.transaction_id(i),
+            timestamp=micros_to_timestamp(self.timestamps[i]),
+            payee=strings[self.payees[i]],
+            description=strings[self.descriptions[i]],
+            amount=self.from_units(self.amounts[i]),
+            balance=self.from_units(self.balances[i]) if self.has_balance[i] else None,
+            currency=strings[self.currencies[i]],
+            account=strings[self.accounts[i]],
+            institution=strings[self.institutions[i]],
+            price=(
+                Decimal(self.prices[i]).scaleb(-self.price_scale)
+                if self.price_currencies[i]
+                else None
+            ),
+            price_currency=strings[self.price_currencies[i]],
+        )
+
+    def __iter__(self) -> Iterator[GenericTransaction]:
+        for i in range(len(self)):
+            yield self[i]
@@ -2,3 +2,5 @@ from enum import StrEnum
 
 class ExportFormat(StrEnum):
     BEANCOUNT = "beancount"
+    JSONL = "jsonl"
+    SQLITE = "sqlite"
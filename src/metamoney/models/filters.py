@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable, Iterator
+
+from metamoney.models.transactions import GenericTransaction
+
+
+@dataclass(frozen=True)
+class TransactionFilter:
+    """
+    Limits which transactions are imported. Dates are inclusive, and an
+    account also matches its sub-accounts. Importers may use the filter to
+    skip rows before parsing them, but filter() is always applied to what
+    they produce as well.
+    """
+
+    since: date | None = None
+    until: date | None = None
+    accounts: frozenset[str] = frozenset()
+
+    def __bool__(self) -> bool:
+        return bool(self.since or self.until or self.accounts)
+
+    def matches_date(self, day: date) -> bool:
+        if self.since and day < self.since:
+            return False
+        if self.until and day > self.until:
+            return False
+        return True
+
+    def matches_account(self, account: str | None) -> bool:
+        if not self.accounts:
+            return True
+        if account is None:
+            return False
+        return any(
+            account == prefix or account.startswith(f"{prefix}:")
+            for prefix in self.accounts
+        )
+
+    def matches(self, transaction: GenericTransaction) -> bool:
+        timestamp: datetime = transaction.timestamp
+        return self.matches_date(timestamp.date()) and self.matches_account(
+            transaction.account
+        )
+
+    def filter(
+        self, transactions: Iterable[GenericTransaction]
+    ) -> Iterator[GenericTransaction]:
+        for transaction in transactions:
+            if self.matches(transaction):
+                yield transaction
@@ -6,10 +6,12 @@ from typing import Optional
 
 
 class AbstractTransaction(ABC):
-    pass
+    __slots__ = ()
 
 
-@dataclass
+# Generic transactions and journal entries are immutable so that remaps can
+# share everything they don't change; use dataclasses.replace to update them.
+@dataclass(frozen=True, slots=True)
 class GenericTransaction(AbstractTransaction):
     transaction_id: str
     timestamp: datetime
@@ -20,16 +22,19 @@ class GenericTransaction(AbstractTransaction):
     currency: str
     account: str
     institution: Optional[str]
+    # The cost of one unit of currency in price_currency, if it's been priced
+    price: Optional[Decimal] = None
+    price_currency: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class JournalEntry:
     timestamp: datetime
     narration: str
-    transactions: list[GenericTransaction]
+    transactions: tuple[GenericTransaction, ...]
 
 
-@dataclass
+@dataclass(slots=True)
 class CathayTransaction(AbstractTransaction):
     transaction_id: str
     transaction_date: datetime
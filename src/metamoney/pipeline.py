@@ -0,0 +1,128 @@
+import pickle
+import tempfile
+from itertools import islice
+from typing import IO, Callable, Iterable, Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUFFER_SIZE = 10_000
+
+
+def reverse_buffered(
+    items: Iterable[T], buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> Iterator[T]:
+    """
+    Yields items in reverse order while holding at most two buffers of
+    buffer_size items in memory. Earlier buffers are spilled to a temporary
+    file and read back last to first.
+    """
+    iterator = iter(items)
+    buffer = list(islice(iterator, buffer_size))
+    spill_file: IO[bytes] | None = None
+    offsets: list[int] = []
+
+    try:
+        while True:
+            next_buffer = list(islice(iterator, buffer_size))
+            if not next_buffer:
+                break
+            if spill_file is None:
+                spill_file = tempfile.TemporaryFile()
+            offsets.append(spill_file.tell())
+            pickle.dump(buffer, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+            buffer = next_buffer
+
+        yield from reversed(buffer)
+        buffer = []
+
+        if spill_file is None:
+            return
+        for offset in reversed(offsets):
+            spill_file.seek(offset)
+            yield from reversed(pickle.load(spill_file))
+    finally:
+        if spill_file is not None:
+            spill_file.close()
+
+
+DEFAULT_FAN_OUT_QUEUE_SIZE = 64
+DEFAULT_FAN_OUT_BATCH_SIZE = 256
+
+# Marks the end of a fanned out stream
+END = object()
+
+
+class FanOutAborted(Exception):
+    pass
+
+
+def fan_out(
+    items: Iterable[T],
+    consumers: Sequence[Callable[[Iterable[T]], None]],
+    queue_size: int = DEFAULT_FAN_OUT_QUEUE_SIZE,
+    batch_size: int = DEFAULT_FAN_OUT_BATCH_SIZE,
+):
+    """
+    Feeds the same items to several consumers, each running on its own
+    thread, while only iterating over items once. Items are handed over in
+    batches through bounded queues, so a slow consumer holds back the
+    producer rather than letting items pile up in memory. Re-raises the first
+    error from the producer or any consumer once every thread has stopped.
+    """
+    import queue
+    import threading
+
+    queues: list[queue.Queue] = [queue.Queue(queue_size) for _ in consumers]
+    errors: list[BaseException] = []
+    aborted = threading.Event()
+
+    def consume(consumer: Callable[[Iterable[T]], None], batches: queue.Queue):
+        ended = False
+
+        def receive() -> Iterator[T]:
+            nonlocal ended
+            while True:
+                batch = batches.get()
+                if batch is END:
+                    ended = True
+                    return
+                if aborted.is_set():
+                    raise FanOutAborted()
+                yield from batch
+
+        try:
+            consumer(receive())
+        except BaseException as e:
+            if not isinstance(e, FanOutAborted):
+                errors.append(e)
+            aborted.set()
+        # Keep draining so that the producer never blocks on a dead consumer
+        while not ended:
+            ended = batches.get() is END
+
+    threads = [
+        threading.Thread(target=consume, args=(consumer, batches), daemon=True)
+        for consumer, batches in zip(consumers, queues)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        iterator = iter(items)
+        while not aborted.is_set():
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            for batches in queues:
+                batches.put(batch)
+    except BaseException as e:
+        errors.append(e)
+        aborted.set()
+    finally:
+        for batches in queues:
+            batches.put(END)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
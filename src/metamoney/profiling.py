@@ -0,0 +1,219 @@
+import json
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Sequence, TypeVar
+
+from metamoney.mappers.conditions import (
+    AllCondition,
+    AnyCondition,
+    TransactionFieldMatchesCondition,
+)
+from metamoney.models.transactions import JournalEntry
+
+T = TypeVar("T")
+
+# Lazy stages sample the memory in use once per this many rows, rather than
+# tracking the peak while each row is produced
+MEMORY_SAMPLE_ROWS = 1024
+
+
+@dataclass
+class StageStats:
+    """
+    Timings for one stage of the pipeline, summed over every source. seconds
+    includes time spent pulling rows from earlier stages; self_seconds
+    doesn't.
+    """
+
+    name: str
+    rows: int = 0
+    seconds: float = 0.0
+    self_seconds: float = 0.0
+    peak_memory_bytes: int = 0
+
+    @property
+    def rows_per_second(self) -> float | None:
+        if not (self.rows and self.self_seconds):
+            return None
+        return self.rows / self.self_seconds
+
+
+@dataclass
+class MappingStats:
+    index: int
+    condition: str
+    evaluations: int = 0
+    fired: int = 0
+    condition_seconds: float = 0.0
+    apply_seconds: float = 0.0
+
+
+@dataclass
+class Frame:
+    stats: StageStats
+    child_seconds: float = 0.0
+    child_peak: int = 0
+
+
+def describe_condition(condition: Callable[[JournalEntry], bool]) -> str:
+    if isinstance(condition, TransactionFieldMatchesCondition):
+        return f"{condition.field} ~ {condition.regexp}"
+    if isinstance(condition, (AllCondition, AnyCondition)):
+        joiner = " and " if isinstance(condition, AllCondition) else " or "
+        return (
+            "(" + joiner.join(describe_condition(c) for c in condition.conditions) + ")"
+        )
+    return getattr(condition, "__qualname__", type(condition).__qualname__)
+
+
+class Profiler:
+    """
+    Records how long each stage of the pipeline takes, how many rows it
+    produces and how much memory is in use while it runs. Stages are lazy and
+    interleave, so a stage is timed while it is producing each row, and the
+    memory in use is sampled every MEMORY_SAMPLE_ROWS rows.
+
+    Memory is measured with tracemalloc, which slows everything down; pass
+    trace_memory=False for more accurate timings.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: dict[str, StageStats] = {}
+        self.mappings: list[MappingStats] = []
+        self.field_matching_seconds = 0.0
+        self.peak_memory_bytes: int | None = None
+        # The highest peak seen before tracemalloc's peak was last reset
+        self.earlier_peak = 0
+        self.stack: list[Frame] = []
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.started = perf_counter()
+
+    def stop(self):
+        self.finished = perf_counter()
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory_bytes = max(
+                self.earlier_peak,
+                tracemalloc.get_traced_memory()[1],
+                *(stats.peak_memory_bytes for stats in self.stages.values()),
+            )
+            tracemalloc.stop()
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stage_stats(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = StageStats(name)
+            self.stages[name] = stats
+        return stats
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[StageStats]:
+        """Times one step of a stage, excluding any stages it calls into."""
+        stats = self.stage_stats(name)
+        frame = Frame(stats)
+        self.stack.append(frame)
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.earlier_peak = max(
+                self.earlier_peak, tracemalloc.get_traced_memory()[1]
+            )
+            tracemalloc.reset_peak()
+        start = perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = perf_counter() - start
+            self.stack.pop()
+            stats.seconds += elapsed
+            stats.self_seconds += elapsed - frame.child_seconds
+
+            peak = 0
+            if self.trace_memory and tracemalloc.is_tracing():
+                # Nested stages reset the peak, so take theirs into account
+                peak = max(tracemalloc.get_traced_memory()[1], frame.child_peak)
+                stats.peak_memory_bytes = max(stats.peak_memory_bytes, peak)
+            if self.stack:
+                parent = self.stack[-1]
+                parent.child_seconds += elapsed
+                parent.child_peak = max(parent.child_peak, peak)
+
+    def stage(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Wraps a lazy stage, counting and timing every row it produces."""
+        stats = self.stage_stats(name)
+        # One frame is reused for every row, since a stage never runs inside
+        # itself
+        frame = Frame(stats)
+        sample_memory = self.trace_memory and tracemalloc.is_tracing()
+        iterator = iter(items)
+        while True:
+            frame.child_seconds = 0.0
+            self.stack.append(frame)
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed = perf_counter() - start
+                self.stack.pop()
+                stats.seconds += elapsed
+                stats.self_seconds += elapsed - frame.child_seconds
+                if self.stack:
+                    self.stack[-1].child_seconds += elapsed
+            stats.rows += 1
+            if sample_memory and stats.rows % MEMORY_SAMPLE_ROWS == 0:
+                stats.peak_memory_bytes = max(
+                    stats.peak_memory_bytes, tracemalloc.get_traced_memory()[0]
+                )
+            yield item
+
+    def count(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Counts the rows passing through a stage timed with measure."""
+        stats = self.stage_stats(name)
+        for item in items:
+            stats.rows += 1
+            yield item
+
+    def profile_mappings(self, mappings: Sequence) -> list[MappingStats]:
+        self.mappings = [
+            MappingStats(i, describe_condition(mapping.condition))
+            for i, mapping in enumerate(mappings)
+        ]
+        return self.mappings
+
+    def to_dict(self) -> dict:
+        total = None
+        if self.started is not None and self.finished is not None:
+            total = self.finished - self.started
+        return {
+            "total_seconds": total,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "stages": [
+                {
+                    **asdict(stats),
+                    "peak_memory_bytes": (
+                        stats.peak_memory_bytes if self.trace_memory else None
+                    ),
+                    "rows_per_second": stats.rows_per_second,
+                }
+                for stats in self.stages.values()
+            ],
+            "field_matching_seconds": self.field_matching_seconds,
+            "mappings": [asdict(stats) for stats in self.mappings],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
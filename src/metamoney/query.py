@@ -0,0 +1,254 @@
+import shlex
+import sqlite3
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Iterator
+
+from metamoney.utils import metamoney_home
+
+TEXT_FIELDS = {"payee", "description", "account", "currency", "institution"}
+COMPARISONS = {"=", "!=", "<", "<=", ">", ">="}
+# Text fields can also be searched with ~, which matches anywhere in the value
+# regardless of case
+TEXT_OPERATORS = {"=", "!=", "~"}
+# Amounts are stored as exact text, and indexed by their numeric value
+AMOUNT_VALUE = "CAST(amount AS REAL)"
+
+
+def default_journal_path() -> Path:
+    return metamoney_home() / "journal.sqlite3"
+
+
+@dataclass(frozen=True)
+class Query:
+    """A parsed query, as conditions on the postings table."""
+
+    conditions: tuple[str, ...] = ()
+    parameters: tuple[str | float, ...] = ()
+    # Whether there's a since or until condition
+    dated: bool = False
+
+    def where(self) -> str:
+        if not self.conditions:
+            return ""
+        return " WHERE " + " AND ".join(self.conditions)
+
+
+@dataclass(frozen=True)
+class Posting:
+    timestamp: str
+    account: str
+    amount: Decimal
+    currency: str
+    payee: str | None
+    description: str | None
+
+
+@dataclass(frozen=True)
+class AccountTotal:
+    account: str
+    currency: str
+    total: Decimal
+    postings: int
+
+
+def parse_date(value: str, end: bool = False) -> str:
+    """
+    Parses YYYY, YYYY-MM or YYYY-MM-DD into the first day of that period, or
+    the first day after it if end is set, as a timestamp to compare against.
+    """
+    try:
+        parts = [int(part) for part in value.split("-")]
+        if len(parts) == 1:
+            year, month, day = parts[0], 1, 1
+            if end:
+                year += 1
+        elif len(parts) == 2:
+            year, month, day = parts[0], parts[1], 1
+            if end:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        elif len(parts) == 3:
+            start = date(*parts)
+            if end:
+                start = date.fromordinal(start.toordinal() + 1)
+            return start.isoformat()
+        else:
+            raise ValueError
+        return date(year, month, day).isoformat()
+    except ValueError:
+        raise ValueError(
+            f"Expected a date like 2024, 2024-06 or 2024-06-17, not {value}"
+        )
+
+
+def account_condition(operator: str, value: str) -> tuple[str, list[str]]:
+    # An account also matches its sub-accounts. ";" sorts right after ":", so
+    # the sub-accounts are a range on the account index.
+    condition = "(account = ? OR (account >= ? AND account < ?))"
+    parameters = [value, f"{value}:", f"{value};"]
+    if operator == "!=":
+        condition = f"NOT {condition}"
+    return condition, parameters
+
+
+def parse_query(text: str) -> Query:
+    """
+    Parses queries like "payee ~ VULTR since 2024". A query is a list of
+    conditions which all have to match:
+
+    - FIELD OPERATOR VALUE, where FIELD is payee, description, account,
+      currency or institution with =, != or ~, or amount with =, !=, <, <=,
+      > or >=. Values with spaces can be quoted.
+    - since DATE and until DATE, where DATE is a year, a month (2024-06) or a
+      day (2024-06-17). Both include the whole of the period given.
+    """
+    lexer = shlex.shlex(text, posix=True, punctuation_chars="~=<>!")
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError as e:
+        raise ValueError(f"Couldn't parse query: {e}")
+
+    conditions: list[str] = []
+    parameters: list[str | float] = []
+    dated = False
+    i = 0
+    while i < len(tokens):
+        keyword = tokens[i].lower()
+        if keyword in ("since", "until"):
+            if i + 1 >= len(tokens):
+                raise ValueError(f"Expected a date after {keyword}")
+            if keyword == "since":
+                conditions.append("timestamp >= ?")
+                parameters.append(parse_date(tokens[i + 1]))
+            else:
+                conditions.append("timestamp < ?")
+                parameters.append(parse_date(tokens[i + 1], end=True))
+            dated = True
+            i += 2
+            continue
+
+        if i + 2 >= len(tokens):
+            raise ValueError(f"Expected FIELD OPERATOR VALUE at {' '.join(tokens[i:])}")
+        operator, value = tokens[i + 1], tokens[i + 2]
+        if keyword == "amount":
+            if operator not in COMPARISONS:
+                raise ValueError(f"Can't compare amounts with {operator}")
+            try:
+                amount = Decimal(value.replace(",", ""))
+            except InvalidOperation:
+                raise ValueError(f"Expected an amount, not {value}")
+            conditions.append(f"{AMOUNT_VALUE} {operator} ?")
+            parameters.append(float(amount))
+        elif keyword in TEXT_FIELDS:
+            if operator not in TEXT_OPERATORS:
+                raise ValueError(f"Can't compare {keyword} with {operator}")
+            if keyword == "account" and operator != "~":
+                condition, account_parameters = account_condition(operator, value)
+                conditions.append(condition)
+                parameters.extend(account_parameters)
+            elif operator == "~":
+                conditions.append(f"instr(lower({keyword}), ?) > 0")
+                parameters.append(value.lower())
+            elif keyword == "payee":
+                # Payees are indexed without case
+                conditions.append(f"payee {operator} ? COLLATE NOCASE")
+                parameters.append(value)
+            else:
+                conditions.append(f"{keyword} {operator} ?")
+                parameters.append(value)
+        else:
+            raise ValueError(f"Unknown field {tokens[i]}")
+        i += 3
+    return Query(tuple(conditions), tuple(parameters), dated)
+
+
+class JournalStore:
+    """
+    Reads the entries written by the SQLite exporter. Queries only touch
+    the postings table, whose indexes on account, timestamp, payee and
+    amount let SQLite answer most of them with range scans.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or default_journal_path()
+        # Only absolute paths can be written as URIs
+        uri = self.path.expanduser().resolve().as_uri()
+        self.connection = sqlite3.connect(f"{uri}?mode=ro", uri=True)
+
+    def __enter__(self) -> "JournalStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.close()
+
+    def postings(self, query: Query, limit: int | None = None) -> Iterator[Posting]:
+        # Without a date range, SQLite would rather walk the whole timestamp
+        # index than sort what another index finds, so stop it from using the
+        # index to sort unless there's nothing else to filter on
+        order = "+timestamp" if query.conditions and not query.dated else "timestamp"
+        sql = (
+            "SELECT timestamp, account, amount, currency, payee, description"
+            f" FROM postings{query.where()} ORDER BY {order}, entry_id, position"
+        )
+        parameters = list(query.parameters)
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        for (
+            timestamp,
+            account,
+            amount,
+            currency,
+            payee,
+            description,
+        ) in self.connection.execute(sql, parameters):
+            yield Posting(
+                timestamp, account, Decimal(amount), currency, payee, description
+            )
+
+    def totals(self, query: Query) -> list[AccountTotal]:
+        """
+        Totals the matching postings per account and currency. Amounts are
+        summed as integers in SQL, grouped by how many decimal places they
+        have, so the totals stay exact without reading every posting back.
+        """
+        # Decimal only writes exponents for very large or small amounts;
+        # those are added up here instead
+        places = (
+            "CASE WHEN instr(amount, '.') > 0"
+            " THEN length(amount) - instr(amount, '.') ELSE 0 END"
+        )
+        sql = (
+            f"SELECT account, currency, {places},"
+            " sum(CAST(replace(amount, '.', '') AS INTEGER)), count(*)"
+            f" FROM postings{query.where()}"
+            f"{' AND' if query.conditions else ' WHERE'} instr(amount, 'E') = 0"
+            " GROUP BY account, currency, 3"
+        )
+        totals: dict[tuple[str, str], tuple[Decimal, int]] = {}
+        for account, currency, scale, units, count in self.connection.execute(
+            sql, query.parameters
+        ):
+            total, postings = totals.get((account, currency), (Decimal(0), 0))
+            totals[(account, currency)] = (
+                total + Decimal(units).scaleb(-scale),
+                postings + count,
+            )
+
+        exponents = (
+            f"SELECT account, currency, amount FROM postings{query.where()}"
+            f"{' AND' if query.conditions else ' WHERE'} instr(amount, 'E') > 0"
+        )
+        for account, currency, amount in self.connection.execute(
+            exponents, query.parameters
+        ):
+            total, postings = totals.get((account, currency), (Decimal(0), 0))
+            totals[(account, currency)] = (total + Decimal(amount), postings + 1)
+
+        return [
+            AccountTotal(account, currency, total, postings)
+            for (account, currency), (total, postings) in sorted(totals.items())
+        ]
@@ -0,0 +1,199 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from importlib.util import find_spec
+from itertools import islice
+from typing import Iterable, Iterator
+
+from metamoney.models.batches import (
+    DEFAULT_BATCH_SIZE,
+    TransactionBatch,
+    micros_to_timestamp,
+)
+from metamoney.models.transactions import GenericTransaction
+
+logger = logging.getLogger("reconcile")
+
+# Running balances are kept per (account, currency)
+BalanceKey = tuple[str | None, str | None]
+
+
+@dataclass(frozen=True)
+class BalanceBreak:
+    """A reported balance which doesn't follow from the amounts before it."""
+
+    transaction_id: str
+    timestamp: datetime
+    account: str | None
+    currency: str | None
+    reported: Decimal
+    expected: Decimal
+
+
+class Reconciler:
+    """
+    Checks that the balance reported with each transaction equals the last
+    reported balance in the same account plus the amounts since. The first
+    reported balance in each account is taken as given.
+
+    Transactions have to be in date order within each account. Batches are
+    checked with integer arrays, using NumPy if it's installed, and running
+    totals carry over from one batch to the next.
+    """
+
+    def __init__(self, use_numpy: bool | None = None):
+        if use_numpy is None:
+            use_numpy = find_spec("numpy") is not None
+        self.use_numpy = use_numpy
+        self.scale = 0
+        # Sum of all amounts so far, and the opening balance implied by the
+        # last reported balance, in minor units at self.scale
+        self.running: dict[BalanceKey, int] = {}
+        self.offsets: dict[BalanceKey, int] = {}
+
+    def rescale(self, scale: int):
+        factor = 10 ** (scale - self.scale)
+        self.running = {key: value * factor for key, value in self.running.items()}
+        self.offsets = {key: value * factor for key, value in self.offsets.items()}
+        self.scale = scale
+
+    def check(self, batch: TransactionBatch) -> list[BalanceBreak]:
+        if not batch:
+            return []
+        if batch.scale > self.scale:
+            self.rescale(batch.scale)
+        factor = 10 ** (self.scale - batch.scale)
+        if self.use_numpy:
+            rows = self.check_numpy(batch, factor)
+        else:
+            rows = self.check_python(batch, factor)
+        return [self.balance_break(batch, i, expected) for i, expected in rows]
+
+    def balance_break(
+        self, batch: TransactionBatch, i: int, expected: int
+    ) -> BalanceBreak:
+        return BalanceBreak(
+            batch.transaction_id(i),
+            micros_to_timestamp(batch.timestamps[i]),
+            batch.strings[batch.accounts[i]],
+            batch.strings[batch.currencies[i]],
+            batch.from_units(batch.balances[i]),
+            Decimal(expected).scaleb(-self.scale),
+        )
+
+    def batch_key(self, batch: TransactionBatch, i: int) -> BalanceKey:
+        return (batch.strings[batch.accounts[i]], batch.strings[batch.currencies[i]])
+
+    def check_python(
+        self, batch: TransactionBatch, factor: int
+    ) -> list[tuple[int, int]]:
+        breaks = []
+        keys: dict[tuple[int, int], BalanceKey] = {}
+        running = self.running
+        offsets = self.offsets
+        for i, (account, currency, amount, balance, has_balance) in enumerate(
+            zip(
+                batch.accounts,
+                batch.currencies,
+                batch.amounts,
+                batch.balances,
+                batch.has_balance,
+            )
+        ):
+            key = keys.get((account, currency))
+            if key is None:
+                key = self.batch_key(batch, i)
+                keys[(account, currency)] = key
+            total = running.get(key, 0) + amount * factor
+            running[key] = total
+            if not has_balance:
+                continue
+            offset = balance * factor - total
+            previous = offsets.get(key)
+            if previous is not None and offset != previous:
+                breaks.append((i, previous + total))
+            offsets[key] = offset
+        return breaks
+
+    def check_numpy(
+        self, batch: TransactionBatch, factor: int
+    ) -> list[tuple[int, int]]:
+        import numpy as np
+
+        accounts = np.frombuffer(batch.accounts, dtype=np.uint32).astype(np.int64)
+        currencies = np.frombuffer(batch.currencies, dtype=np.uint32).astype(np.int64)
+        amounts = np.frombuffer(batch.amounts, dtype=np.int64) * factor
+        balances = np.frombuffer(batch.balances, dtype=np.int64) * factor
+        has_balance = np.frombuffer(batch.has_balance, dtype=np.uint8).astype(bool)
+
+        # Sort rows into groups by account and currency, keeping date order
+        groups = accounts * (int(currencies.max()) + 1) + currencies
+        order = np.argsort(groups, kind="stable")
+        groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        keys = [self.batch_key(batch, int(order[start])) for start in starts]
+        group_index = np.repeat(
+            np.arange(len(starts)), np.diff(np.r_[starts, len(groups)])
+        )
+
+        # Running totals within each group, plus what came before this batch
+        totals = np.cumsum(amounts[order])
+        before = np.r_[0, totals][starts]
+        carried = np.array([self.running.get(key, 0) for key in keys], dtype=np.int64)
+        totals = totals - before[group_index] + carried[group_index]
+        ends = np.r_[starts[1:], len(groups)] - 1
+        for key, total in zip(keys, totals[ends].tolist()):
+            self.running[key] = total
+
+        # Compare the implied opening balance of each row with a balance to
+        # that of the previous such row in the same group
+        reported = np.flatnonzero(has_balance[order])
+        if not len(reported):
+            return []
+        offsets = balances[order][reported] - totals[reported]
+        reported_groups = group_index[reported]
+        previous = np.empty_like(offsets)
+        previous[1:] = offsets[:-1]
+        has_previous = np.ones(len(reported), dtype=bool)
+        firsts = np.flatnonzero(
+            np.r_[True, reported_groups[1:] != reported_groups[:-1]]
+        )
+        for first in firsts.tolist():
+            carried_offset = self.offsets.get(keys[reported_groups[first]])
+            if carried_offset is None:
+                has_previous[first] = False
+            else:
+                previous[first] = carried_offset
+        lasts = np.r_[firsts[1:], len(reported)] - 1
+        for last in lasts.tolist():
+            self.offsets[keys[reported_groups[last]]] = int(offsets[last])
+
+        broken = np.flatnonzero(has_previous & (offsets != previous))
+        rows = order[reported[broken]].tolist()
+        expected = (previous[broken] + totals[reported[broken]]).tolist()
+        return sorted(zip(rows, expected))
+
+
+def reconcile(
+    transactions: Iterable[GenericTransaction],
+    reconciler: Reconciler | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[GenericTransaction]:
+    """
+    Passes transactions through unchanged, logging a warning for every
+    reported balance which breaks the running sum of amounts.
+    """
+    reconciler = reconciler or Reconciler()
+    iterator = iter(transactions)
+    while chunk := list(islice(iterator, batch_size)):
+        for balance_break in reconciler.check(
+            TransactionBatch.from_transactions(chunk)
+        ):
+            logger.warning(
+                f"Balance of {balance_break.account} on {balance_break.timestamp:%Y-%m-%d} "
+                f"is {balance_break.reported} {balance_break.currency}, but the "
+                f"running sum gives {balance_break.expected} "
+                f"(transaction {balance_break.transaction_id})."
+            )
+        yield from chunk
@@ -1,26 +1,148 @@
-from typing import Sequence, TypeVar, Callable
-from metamoney.importers.importer import AbstractImporter
-from metamoney.exporters.exporter import AbstractExporter
+import importlib
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from typing import TYPE_CHECKING, Callable, Hashable, KeysView, Sequence, TypeVar
+
+from metamoney.models.data_sources import DataSourceFormat, DataSourceInstitution
+from metamoney.models.exports import ExportFormat
+
+if TYPE_CHECKING:
+    from metamoney.exporters.exporter import AbstractExporter
+    from metamoney.importers.importer import AbstractImporter
 
 T = TypeVar("T")
 
+# What a service can do, e.g. (institution, format) for importers
+ServiceKey = tuple[Hashable, ...]
+
+
+@dataclass(frozen=True)
+class ServiceSpec:
+    """
+    Declares a service without importing it. target is a "module:Class"
+    reference, and key has to match what the class itself reports.
+    """
+
+    key: ServiceKey
+    target: str
+
+    def load(self):
+        module_name, _, class_name = self.target.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)()
+
+
 class Registry[T]():
 
-    def __init__(self):
+    def __init__(self, key_fn: Callable[[T], ServiceKey] | None = None):
         self.services = {}
-    
+        self.key_fn = key_fn
+        # Secondary index from each key to the service (or the spec of a lazy
+        # service) which handles it, so lookups don't scan every service.
+        self.index: dict[ServiceKey, T | ServiceSpec] = {}
+
     def register(self, service: T):
         self.services[service.__class__] = service
+        if self.key_fn:
+            # As with a scan, the first service registered for a key wins
+            self.index.setdefault(self.key_fn(service), service)
+
+    def register_lazy(self, spec: ServiceSpec):
+        """Registers a service which is only imported once it is looked up."""
+        self.index.setdefault(spec.key, spec)
+
+    def replace(self, service: T):
+        """
+        Registers a service in place of any existing service with the same
+        key, without importing lazy services to find out what they are.
+        """
+        if self.key_fn is None:
+            raise ValueError("Registry needs a key_fn to replace services.")
+        key = self.key_fn(service)
+        existing = self.index.pop(key, None)
+        if existing is not None and not isinstance(existing, ServiceSpec):
+            self.unregister(existing.__class__)
+        self.register(service)
+        self.index[key] = service
 
     def get_service(self, class_name: str) -> T | None:
         return self.services.get(class_name)
 
-    def filter_services(self, filter_fn: Callable[[T],bool]) -> Sequence[T]:
+    def find(self, key: ServiceKey) -> T | None:
+        if self.key_fn is None:
+            raise ValueError("Registry needs a key_fn to find services.")
+        service = self.index.get(key)
+        if isinstance(service, ServiceSpec):
+            return self.load(service)
+        return service
+
+    def keys(self) -> KeysView[ServiceKey]:
+        return self.index.keys()
+
+    def load(self, spec: ServiceSpec) -> T:
+        service = spec.load()
+        self.services[service.__class__] = service
+        if self.index.get(spec.key) is spec:
+            self.index[spec.key] = service
+        return service
+
+    def filter_services(self, filter_fn: Callable[[T], bool]) -> Sequence[T]:
+        # Filtering has to look at every service, so lazy ones are loaded
+        for service in list(self.index.values()):
+            if isinstance(service, ServiceSpec):
+                self.load(service)
         return list(filter(filter_fn, self.services.values()))
 
     def unregister(self, service_type: type):
         # May crash if service doesn't exist, but that's probably fine
-        del self.services[service_type]
+        service = self.services.pop(service_type)
+        if not self.key_fn:
+            return
+        key = self.key_fn(service)
+        if self.index.get(key) is not service:
+            return
+        del self.index[key]
+        # Fall back to another registered service with the same key, if any
+        for other in self.services.values():
+            if self.key_fn(other) == key:
+                self.index[key] = other
+                break
+
+
+def importer_key(importer: "AbstractImporter") -> ServiceKey:
+    return (importer.data_institution(), importer.data_format())
+
+
+def exporter_key(exporter: "AbstractExporter") -> ServiceKey:
+    return (exporter.data_format(),)
+
+
+BUILTIN_IMPORTERS = [
+    ServiceSpec(
+        (DataSourceInstitution.CATHAY_BANK_TW, DataSourceFormat.CSV),
+        "metamoney.importers.cathay:CathayCsvImporter",
+    ),
+]
+
+BUILTIN_EXPORTERS = [
+    ServiceSpec(
+        (ExportFormat.BEANCOUNT,), "metamoney.exporters.beancount:BeancountExporter"
+    ),
+    ServiceSpec((ExportFormat.JSONL,), "metamoney.exporters.jsonl:JsonLinesExporter"),
+    ServiceSpec((ExportFormat.SQLITE,), "metamoney.exporters.sqlite:SqliteExporter"),
+]
+
+
+def entry_point_specs(group: str) -> list[ServiceSpec]:
+    """
+    Finds services declared by installed packages. Importers are declared in
+    the "metamoney.importers" group with a name of "institution:format", and
+    exporters in the "metamoney.exporters" group with a name of "format".
+    """
+    return [
+        ServiceSpec(tuple(entry_point.name.split(":")), entry_point.value)
+        for entry_point in entry_points(group=group)
+    ]
+
 
-importers = Registry[AbstractImporter]()
-exporters = Registry[AbstractExporter]()
+importers = Registry["AbstractImporter"](importer_key)
+exporters = Registry["AbstractExporter"](exporter_key)
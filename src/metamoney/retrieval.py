@@ -0,0 +1,101 @@
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Playwright
+
+T = TypeVar("T")
+
+DEFAULT_POOL_SIZE = 4
+
+
+def read_stdin(message: str) -> str:
+    print(message, file=sys.stderr)
+    return input()
+
+
+class BrowserPool:
+    """
+    Shares one browser between concurrent retrievals. Each retrieval borrows
+    its own context, so logins don't share cookies, and at most size contexts
+    are open at once. Prompts, e.g. for an OTP, are asked one at a time.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        headless: bool = False,
+        prompt_fn: Callable[[str], str] = read_stdin,
+    ):
+        self.size = size
+        self.headless = headless
+        self.prompt_fn = prompt_fn
+        self.playwright: "Playwright | None" = None
+        self.browser: "Browser | None" = None
+        self.contexts: list["BrowserContext"] = []
+        # A slot is taken before a context is opened, so retrievals which
+        # start together can't open more than size between them
+        self.slots = asyncio.Semaphore(size)
+        self.available: asyncio.Queue["BrowserContext"] = asyncio.Queue()
+        self.prompt_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "BrowserPool":
+        # Playwright is slow to import and only needed for remote sources
+        from playwright.async_api import async_playwright
+
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for context in self.contexts:
+            await context.close()
+        self.contexts.clear()
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    @asynccontextmanager
+    async def context(self) -> AsyncIterator["BrowserContext"]:
+        if self.browser is None:
+            raise RuntimeError("BrowserPool must be entered before use.")
+        async with self.slots:
+            if self.available.empty():
+                context = await self.browser.new_context(accept_downloads=True)
+                self.contexts.append(context)
+            else:
+                context = self.available.get_nowait()
+            try:
+                yield context
+            finally:
+                # The next account to use this context has to log in afresh
+                await context.clear_cookies()
+                self.available.put_nowait(context)
+
+    async def prompt(self, message: str) -> str:
+        async with self.prompt_lock:
+            return await asyncio.to_thread(self.prompt_fn, message)
+
+
+async def as_completed(awaitables: Iterable[Awaitable[T]]) -> AsyncIterator[T]:
+    """
+    Runs awaitables concurrently and yields each result as soon as it's ready.
+    Anything still running is cancelled if the caller stops early.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
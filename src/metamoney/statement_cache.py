@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from array import array
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from metamoney.importers.importer import AbstractImporter
+from metamoney.models.batches import TransactionBatch, micros_to_timestamp
+from metamoney.models.data_sources import DataSource
+from metamoney.models.transactions import GenericTransaction
+from metamoney.utils import cache_home
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_CACHE_VERSION = 1
+DEFAULT_STATEMENT_CACHE_BYTES = 256 * 1024 * 1024
+STATEMENT_SUFFIX = ".statement"
+
+
+def default_statement_cache_dir() -> Path:
+    return cache_home() / "statements"
+
+
+def statement_path(data_source: DataSource) -> Path | None:
+    """The file a data source was opened from, if it was opened from one."""
+    if data_source.stream.name == "stdin":
+        return None
+    path = Path(data_source.stream.name)
+    return path if path.is_file() else None
+
+
+def exponent(value: Decimal) -> int:
+    value_exponent = value.as_tuple().exponent
+    # NaN and infinities can't go in a batch anyway
+    if not isinstance(value_exponent, int):
+        raise ValueError(f"Can't cache {value}.")
+    return value_exponent
+
+
+def restore(units: int, scale: int, value_exponent: int) -> Decimal:
+    # Batches hold every amount at the same scale, so put back the exponent it
+    # was parsed with, keeping e.g. 1.5 from coming back as 1.50
+    return Decimal(units // 10 ** (scale + value_exponent)).scaleb(value_exponent)
+
+
+class StatementCache:
+    """
+    Saves the generic transactions parsed from each statement file, so a file
+    whose bytes haven't changed only has to be mapped and exported again.
+
+    Entries are keyed on a hash of the file's contents together with the
+    importer's class and version, and are stored as pickled TransactionBatch
+    columns. When the cache grows past max_bytes, the least recently used
+    entries are deleted.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        max_bytes: int = DEFAULT_STATEMENT_CACHE_BYTES,
+    ):
+        self.directory = directory or default_statement_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, importer: AbstractImporter, path: Path) -> str:
+        with open(path, "rb") as statement:
+            digest = hashlib.file_digest(statement, "sha256")
+        importer_class = type(importer)
+        for part in (
+            f"{importer_class.__module__}.{importer_class.__qualname__}",
+            importer.version,
+            str(STATEMENT_CACHE_VERSION),
+        ):
+            digest.update(b"\x1f")
+            digest.update(part.encode())
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}{STATEMENT_SUFFIX}"
+
+    def get(self, key: str) -> Iterator[GenericTransaction] | None:
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, "rb") as entry:
+                version, batch, amount_exponents, balance_exponents = pickle.load(entry)
+            if version != STATEMENT_CACHE_VERSION:
+                return None
+            # Reading an entry makes it the most recently used
+            os.utime(entry_path)
+        except (OSError, pickle.PickleError, EOFError, ValueError, AttributeError):
+            return None
+        return self.transactions(batch, amount_exponents, balance_exponents)
+
+    def transactions(
+        self,
+        batch: TransactionBatch,
+        amount_exponents: array,
+        balance_exponents: array,
+    ) -> Iterator[GenericTransaction]:
+        # Rows are decoded here rather than with batch[i], since the amounts
+        # need their exponents back anyway
+        strings = batch.strings
+        scale = batch.scale
+        for i, (
+            timestamp,
+            amount,
+            amount_exponent,
+            balance,
+            balance_exponent,
+            has_balance,
+            payee,
+            description,
+            currency,
+            account,
+            institution,
+        ) in enumerate(
+            zip(
+                batch.timestamps,
+                batch.amounts,
+                amount_exponents,
+                batch.balances,
+                balance_exponents,
+                batch.has_balance,
+                batch.payees,
+                batch.descriptions,
+                batch.currencies,
+                batch.accounts,
+                batch.institutions,
+            )
+        ):
+            yield GenericTransaction(
+                transaction_id=batch.transaction_id(i),
+                timestamp=micros_to_timestamp(timestamp),
+                payee=strings[payee],
+                description=strings[description],
+                amount=restore(amount, scale, amount_exponent),
+                balance=(
+                    restore(balance, scale, balance_exponent) if has_balance else None
+                ),
+                currency=strings[currency],
+                account=strings[account],
+                institution=strings[institution],
+            )
+
+    def store(
+        self, key: str, transactions: Iterable[GenericTransaction]
+    ) -> Iterator[GenericTransaction]:
+        """
+        Passes transactions through, saving them once they've all been read.
+        Nothing is saved if the consumer stops early.
+        """
+        batch = TransactionBatch()
+        amount_exponents = array("b")
+        balance_exponents = array("b")
+        cacheable = True
+        for transaction in transactions:
+            yield transaction
+            # Importers don't price transactions, so prices aren't saved
+            if not cacheable or transaction.price is not None:
+                cacheable = False
+                continue
+            try:
+                amount_exponent = exponent(transaction.amount)
+                balance_exponent = (
+                    exponent(transaction.balance)
+                    if transaction.balance is not None
+                    else 0
+                )
+                amount_exponents.append(amount_exponent)
+                balance_exponents.append(balance_exponent)
+                batch.append(transaction)
+            except (ValueError, OverflowError):
+                cacheable = False
+        if cacheable:
+            self.put(
+                key,
+                (STATEMENT_CACHE_VERSION, batch, amount_exponents, balance_exponents),
+            )
+
+    def put(self, key: str, entry: tuple):
+        # The cache is only an optimisation, so failing to save to it isn't
+        # an error
+        temp_path = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Several workers can save the same statement at once, so each
+            # writes to its own temporary file first
+            with tempfile.NamedTemporaryFile(
+                "wb", dir=self.directory, suffix=".tmp", delete=False
+            ) as temp_file:
+                temp_path = Path(temp_file.name)
+                pickle.dump(entry, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+            temp_path.replace(self.entry_path(key))
+            temp_path = None
+            self.evict()
+        except OSError as e:
+            logger.debug(f"Couldn't save {key} to the statement cache: {e}")
+        finally:
+            if temp_path is not None:
+                temp_path.unlink(missing_ok=True)
+
+    def evict(self):
+        entries = []
+        for entry_path in self.directory.glob(f"*{STATEMENT_SUFFIX}"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total -= size
@@ -1,3 +1,4 @@
+import hashlib
 import importlib.util
 import pathlib
 import sys
@@ -16,13 +17,67 @@ def pascal_to_snake(pascal: str) -> str:
     return snake
 
 
+def content_id(*parts: str) -> str:
+    """
+    Returns a stable 32 character hex ID for a transaction, derived from the
+    content it was read from, so the same transaction gets the same ID on
+    every import.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def metamoney_home() -> pathlib.Path:
+    return pathlib.Path.home() / ".metamoney"
+
+
+def cache_home() -> pathlib.Path:
+    return metamoney_home() / "cache"
+
+
+def config_path() -> pathlib.Path:
+    return metamoney_home() / "__init__.py"
+
+
+def config_digest() -> str | None:
+    """
+    A digest of the config file, which changes whenever its mappings might
+    have. Modules imported by the config aren't included.
+    """
+    try:
+        return hashlib.blake2b(config_path().read_bytes(), digest_size=16).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+# Loaded config modules, keyed by path, along with the (mtime, size) of the
+# file they were loaded from
+CONFIG_MODULES: dict[pathlib.Path, tuple[tuple[int, int], ModuleType]] = {}
+
+
 def get_config_module() -> ModuleType | None:
-    spec = importlib.util.spec_from_file_location(
-        "config", pathlib.Path.home() / ".metamoney" / "__init__.py"
-    )
+    """
+    Loads the user's config, executing it at most once per process unless the
+    file changes. Bytecode is cached in __pycache__ like any other module.
+    """
+    path = config_path()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = CONFIG_MODULES.get(path)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    spec = importlib.util.spec_from_file_location("config", path)
     if spec and spec.loader:
         config = importlib.util.module_from_spec(spec)
         sys.modules[spec.name] = config
         spec.loader.exec_module(config)
+        CONFIG_MODULES[path] = (version, config)
         return config
     return None
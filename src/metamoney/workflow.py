@@ -0,0 +1,287 @@
+import glob
+import heapq
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
+
+from metamoney.importers.importer import AbstractImporter
+from metamoney.mappers.mapper import GeneralMapper, InitialMapper
+from metamoney.models.app_data import AppData
+from metamoney.models.data_sources import DataSource, DataSourceFormat
+from metamoney.models.filters import TransactionFilter
+from metamoney.models.stream_info import StreamInfo
+from metamoney.models.transactions import JournalEntry
+from metamoney.reconcile import reconcile
+
+if TYPE_CHECKING:
+    from metamoney.fingerprints import FingerprintStore
+    from metamoney.profiling import Profiler
+    from metamoney.statement_cache import StatementCache
+
+GLOB_CHARACTERS = set("*?[")
+
+
+def expand_sources(sources: Iterable[str], input_format: str | None) -> list[str]:
+    """
+    Expands globs and directories in a list of sources into file paths.
+    'stdin' and 'remote' are passed through unchanged.
+    """
+    expanded = []
+    for source in sources:
+        if source in ("stdin", "remote"):
+            expanded.append(source)
+        elif GLOB_CHARACTERS.intersection(source):
+            expanded.extend(sorted(glob.glob(source)))
+        elif Path(source).is_dir():
+            expanded.extend(
+                str(path)
+                for path in sorted(Path(source).iterdir())
+                if path.is_file()
+                and (not input_format or path.suffix[1:] == input_format)
+            )
+        else:
+            expanded.append(source)
+    return expanded
+
+
+def infer_input_type(source: str, input_format: str | None) -> str:
+    if input_format:
+        return input_format
+    if source != "stdin" and source != "remote":
+        return Path(source).suffix[1:]
+    return DataSourceFormat.CSV
+
+
+def open_data_source(
+    importer: AbstractImporter, institution: str, input_type: str, source: str
+) -> DataSource:
+    if source == "remote":
+        return importer.retrieve()
+    if source == "stdin":
+        return DataSource(institution, input_type, StreamInfo(sys.stdin, "stdin"))
+    source_as_path = Path(source)
+    return DataSource(
+        institution,
+        input_type,
+        StreamInfo(source_as_path.open(), str(source_as_path.resolve())),
+    )
+
+
+def journal_entries(
+    importer: AbstractImporter,
+    data_source: DataSource,
+    general_mapper: GeneralMapper,
+    fingerprints: "FingerprintStore | None" = None,
+    profiler: "Profiler | None" = None,
+    transaction_filter: TransactionFilter | None = None,
+    reconcile_balances: bool = False,
+    statement_cache: "StatementCache | None" = None,
+) -> Iterator[JournalEntry]:
+    # TODO: Make this a proper workflow which calls multiple mappers
+    # Every stage is lazy, so entries are pulled through the whole pipeline one
+    # at a time by whoever consumes them.
+    stage = profiler.stage if profiler else lambda name, items: items
+    cache_key = None
+    cached = None
+    if statement_cache:
+        from metamoney.statement_cache import statement_path
+
+        path = statement_path(data_source)
+        if path:
+            cache_key = statement_cache.key(importer, path)
+            cached = statement_cache.get(cache_key)
+    if cached is not None:
+        generic_transactions = stage("statement_cache", cached)
+    # Reconciling needs every row for its running sums, so the filter can't
+    # be used to skip rows in extract
+    elif transaction_filter and not reconcile_balances:
+        institution_transactions = stage(
+            "extract", importer.extract(data_source, transaction_filter)
+        )
+        # Rows the filter let the importer skip are missing, so this can't
+        # be cached
+        generic_transactions = stage(
+            "transform", importer.transform(institution_transactions)
+        )
+    else:
+        institution_transactions = stage("extract", importer.extract(data_source))
+        generic_transactions = stage(
+            "transform", importer.transform(institution_transactions)
+        )
+        # Only unfiltered runs save to the cache, so nothing a filter has
+        # touched can end up in it
+        if statement_cache and cache_key and not transaction_filter:
+            generic_transactions = statement_cache.store(
+                cache_key, generic_transactions
+            )
+    # Nothing has been filtered out yet when reconciling, so the running sums
+    # start from the first row of the source
+    if reconcile_balances:
+        generic_transactions = stage("reconcile", reconcile(generic_transactions))
+    if transaction_filter:
+        generic_transactions = transaction_filter.filter(generic_transactions)
+    if fingerprints:
+        generic_transactions = stage(
+            "fingerprints", fingerprints.unseen(generic_transactions)
+        )
+    entries = stage("initial_map", InitialMapper().map(generic_transactions, []))
+    return stage("general_map", general_mapper.map([], entries))
+
+
+def journal_remote(
+    importer: AbstractImporter,
+    general_mapper: GeneralMapper,
+    fingerprints: "FingerprintStore | None" = None,
+    transaction_filter: TransactionFilter | None = None,
+    reconcile_balances: bool = False,
+    statement_cache: "StatementCache | None" = None,
+) -> list[list[JournalEntry]]:
+    """
+    Retrieves every account configured for the importer concurrently. Each
+    download is extracted, transformed and mapped as soon as it lands, while
+    the others are still being retrieved.
+    """
+    import asyncio
+
+    from metamoney.retrieval import BrowserPool
+
+    def journal_download(data_source: DataSource) -> list[JournalEntry]:
+        with data_source.stream.stream:
+            if fingerprints is None:
+                return list(
+                    journal_entries(
+                        importer,
+                        data_source,
+                        general_mapper,
+                        transaction_filter=transaction_filter,
+                        reconcile_balances=reconcile_balances,
+                        statement_cache=statement_cache,
+                    )
+                )
+            from metamoney.fingerprints import FingerprintStore
+
+            # SQLite connections can't be shared between threads, so each
+            # download reads the store through its own connection.
+            with FingerprintStore(fingerprints.path, read_only=True) as store:
+                return list(
+                    journal_entries(
+                        importer,
+                        data_source,
+                        general_mapper,
+                        store,
+                        transaction_filter=transaction_filter,
+                        reconcile_balances=reconcile_balances,
+                        statement_cache=statement_cache,
+                    )
+                )
+
+    async def retrieve_and_journal() -> list[list[JournalEntry]]:
+        journaled = []
+        async with BrowserPool() as pool:
+            async for data_source in importer.retrieve_many(pool):
+                journaled.append(
+                    asyncio.create_task(
+                        asyncio.to_thread(journal_download, data_source)
+                    )
+                )
+            return list(await asyncio.gather(*journaled))
+
+    return asyncio.run(retrieve_and_journal())
+
+
+def merge_entries(streams: Iterable[Iterable[JournalEntry]]) -> Iterator[JournalEntry]:
+    # Each stream is already in timestamp order; ties keep the order of streams
+    return heapq.merge(*streams, key=lambda entry: entry.timestamp)
+
+
+# Each worker process builds its own app data and mapping plan once, rather
+# than having them pickled for every file.
+worker_app_data: AppData | None = None
+worker_mapper: GeneralMapper | None = None
+
+
+def init_worker():
+    global worker_app_data, worker_mapper
+    worker_app_data = AppData()
+    worker_mapper = worker_app_data.general_mapper()
+
+
+def journal_file(
+    institution: str,
+    input_type: str,
+    path: str,
+    fingerprint_path: str | None,
+    transaction_filter: TransactionFilter | None = None,
+    reconcile_balances: bool = False,
+    statement_cache: "StatementCache | None" = None,
+) -> list[JournalEntry]:
+    if worker_app_data is None or worker_mapper is None:
+        raise RuntimeError("journal_file must run in a worker started by init_worker")
+    importer = worker_app_data.get_importer(institution, input_type)
+    if not importer:
+        raise ValueError(
+            f"Couldn't find an importer for data type {input_type} and institution {institution}"
+        )
+    data_source = open_data_source(importer, institution, input_type, path)
+    with data_source.stream.stream:
+        if fingerprint_path is None:
+            return list(
+                journal_entries(
+                    importer,
+                    data_source,
+                    worker_mapper,
+                    transaction_filter=transaction_filter,
+                    reconcile_balances=reconcile_balances,
+                    statement_cache=statement_cache,
+                )
+            )
+        from metamoney.fingerprints import FingerprintStore
+
+        # Workers only read the store; the main process records new entries
+        fingerprints = FingerprintStore(Path(fingerprint_path), read_only=True)
+        with fingerprints:
+            return list(
+                journal_entries(
+                    importer,
+                    data_source,
+                    worker_mapper,
+                    fingerprints,
+                    transaction_filter=transaction_filter,
+                    reconcile_balances=reconcile_balances,
+                    statement_cache=statement_cache,
+                )
+            )
+
+
+def journal_files_in_parallel(
+    institution: str,
+    files: Sequence[tuple[str, str]],
+    jobs: int,
+    fingerprints: "FingerprintStore | None" = None,
+    transaction_filter: TransactionFilter | None = None,
+    reconcile_balances: bool = False,
+    statement_cache: "StatementCache | None" = None,
+) -> list[list[JournalEntry]]:
+    """
+    Extracts, transforms and maps each (path, input type) pair in a pool of
+    worker processes, returning the entries for each file in the order given.
+    """
+    # Only pay for importing multiprocessing when it is actually used
+    from concurrent.futures import ProcessPoolExecutor
+
+    fingerprint_path = str(fingerprints.path) if fingerprints else None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as pool:
+        futures = [
+            pool.submit(
+                journal_file,
+                institution,
+                input_type,
+                path,
+                fingerprint_path,
+                transaction_filter,
+                reconcile_balances,
+                statement_cache,
+            )
+            for path, input_type in files
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,76 @@
+from datetime import datetime
+from decimal import Decimal
+
+from metamoney.budget import RollupStore
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+
+
+def entries(counter_account: str) -> list[JournalEntry]:
+    journal = []
+    for month in range(1, 4):
+        timestamp = datetime(2024, month, 15)
+        asset = GenericTransaction(
+            str(month),
+            timestamp,
+            "VULTR INC",
+            None,
+            Decimal("-10.00"),
+            None,
+            "NTD",
+            "Assets:Bank",
+            None,
+        )
+        counter = GenericTransaction(
+            f"{month}-counter",
+            timestamp,
+            None,
+            None,
+            Decimal("10.00"),
+            None,
+            "NTD",
+            counter_account,
+            None,
+        )
+        journal.append(JournalEntry(timestamp, "Hosting", (asset, counter)))
+    return journal
+
+
+def accounts(rollups: RollupStore) -> list[str]:
+    return [projection.account for projection in rollups.project(3, 12)]
+
+
+def test_rebuild_after_mappings_change(tmp_path):
+    path = tmp_path / "rollups.sqlite3"
+    with RollupStore(path, mappings="old") as rollups:
+        assert rollups.fold(entries("Expenses:Hosting")) == 3
+        assert not rollups.stale()
+
+    with RollupStore(path, mappings="new") as rollups:
+        assert rollups.stale()
+        # Folded transactions are skipped, even though they'd be mapped differently
+        assert rollups.fold(entries("Expenses:Cloud")) == 0
+        assert accounts(rollups) == ["Assets:Bank", "Expenses:Hosting"]
+        assert rollups.stale()
+
+        rollups.rebuild()
+        assert rollups.fold(entries("Expenses:Cloud")) == 3
+        assert accounts(rollups) == ["Assets:Bank", "Expenses:Cloud"]
+        assert not rollups.stale()
+        assert rollups.project(3, 12)[1].total == Decimal("120.00")
+
+
+def test_rebuild_is_rolled_back_on_error(tmp_path):
+    path = tmp_path / "rollups.sqlite3"
+    with RollupStore(path, mappings="old") as rollups:
+        rollups.fold(entries("Expenses:Hosting"))
+
+    try:
+        with RollupStore(path, mappings="new") as rollups:
+            rollups.rebuild()
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+
+    with RollupStore(path, mappings="old") as rollups:
+        assert accounts(rollups) == ["Assets:Bank", "Expenses:Hosting"]
+        assert not rollups.stale()
@@ -0,0 +1,63 @@
+import csv
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import CATHAY_HEADER, cathay_rows
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.models.data_sources import DataSource
+from metamoney.models.filters import TransactionFilter
+from metamoney.models.stream_info import StreamInfo
+from metamoney.models.transactions import GenericTransaction
+
+ROWS = list(cathay_rows(2_000))
+FILTERS = [
+    TransactionFilter(since=date(2015, 6, 1)),
+    TransactionFilter(until=date(2015, 3, 1)),
+    TransactionFilter(since=date(2015, 4, 1), until=date(2015, 5, 1)),
+]
+
+
+def write_statement(path: Path, rows: list[list[str]]) -> Path:
+    with open(path, "w", newline="") as stream:
+        writer = csv.writer(stream)
+        writer.writerow(CATHAY_HEADER)
+        writer.writerows(rows)
+    return path
+
+
+def read(
+    path: Path, transaction_filter: TransactionFilter | None = None
+) -> list[GenericTransaction]:
+    importer = CathayCsvImporter(jobs=1)
+    with open(path, newline="") as stream:
+        data_source = DataSource(
+            importer.data_institution(),
+            importer.data_format(),
+            StreamInfo(stream, str(path)),
+        )
+        transactions = importer.transform(
+            importer.extract(data_source, transaction_filter)
+        )
+        if transaction_filter:
+            transactions = transaction_filter.filter(transactions)
+        return list(transactions)
+
+
+@pytest.mark.parametrize("transaction_filter", FILTERS)
+@pytest.mark.parametrize(
+    "order",
+    [
+        pytest.param(lambda rows: rows[::-1], id="newest_first"),
+        pytest.param(lambda rows: rows, id="oldest_first"),
+        pytest.param(lambda rows: rows[1000:] + rows[:1000], id="concatenated"),
+    ],
+)
+def test_date_filters_match_unfiltered_import(tmp_path, transaction_filter, order):
+    path = write_statement(tmp_path / "cathay.csv", order(ROWS))
+    expected = transaction_filter.filter(read(path))
+    expected_ids = {t.transaction_id for t in expected}
+
+    assert expected_ids
+    assert {t.transaction_id for t in read(path, transaction_filter)} == expected_ids
@@ -0,0 +1,98 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.synthetic import cathay_rows
+from metamoney.importers.cathay import (
+    clean_number_string,
+    parse_cathay_date,
+    parse_cathay_timestamp,
+)
+
+ROWS = list(cathay_rows(300, seed=5))
+
+DATES = [row[1] for row in ROWS[::10]] + [
+    "2024/02/29",
+    "2023/02/29",
+    "2024/13/01",
+    "2024/00/10",
+    "2024/01/32",
+    "0000/01/01",
+    "2024/1/5",
+    "2024/01/5",
+    "2024-01-05",
+    "2024/01/05 ",
+    " 2024/01/05",
+    "+024/01/05",
+    "２０２４/01/05",
+    "2024/０1/05",
+    "",
+    "2024/01/05\n09:30",
+]
+
+TIMESTAMPS = [row[0] for row in ROWS[::10]] + [
+    "2024/01/05\n00:00",
+    "2024/01/05\n23:59",
+    "2024/01/05\n24:00",
+    "2024/01/05\n09:60",
+    "2024/01/05\n9:30",
+    "2024/01/05\n09:3",
+    "2024/01/05 09:30",
+    "2024/01/05\n٠٩:٣٠",
+    "2024/02/30\n09:30",
+    "2024/1/5\n09:30",
+    "2024/01/05",
+    "",
+]
+
+AMOUNTS = [amount for row in ROWS[::10] for amount in row[3:6]] + [
+    "",
+    "0",
+    "1,234",
+    "1,234,567.89",
+    "−1,234.5",
+    "−",
+    ",",
+    "-12",
+    " 12 ",
+    "1e3",
+    "NaN",
+    "12.3.4",
+    "abc",
+]
+
+
+def outcome(parse, value):
+    try:
+        return parse(value)
+    except Exception as e:
+        return type(e)
+
+
+def old_amount(value: str) -> Decimal:
+    clean = value.replace(",", "").replace(chr(8722), "")
+    if len(clean) > 0:
+        return Decimal(clean)
+    else:
+        return Decimal(0)
+
+
+@pytest.mark.parametrize("value", DATES)
+def test_parse_cathay_date(value):
+    expected = outcome(lambda v: datetime.strptime(v, "%Y/%m/%d"), value)
+    assert outcome(parse_cathay_date, value) == expected
+
+
+@pytest.mark.parametrize("value", TIMESTAMPS)
+def test_parse_cathay_timestamp(value):
+    expected = outcome(lambda v: datetime.strptime(v, "%Y/%m/%d\n%H:%M"), value)
+    assert outcome(parse_cathay_timestamp, value) == expected
+
+
+@pytest.mark.parametrize("value", AMOUNTS)
+def test_clean_number_string(value):
+    # Equal decimals can still be written differently, e.g. 1.50 and 1.5, and
+    # NaN isn't equal to itself, so their reprs are compared
+    expected = outcome(old_amount, value)
+    assert repr(outcome(clean_number_string, value)) == repr(expected)
@@ -0,0 +1,103 @@
+import csv
+import io
+from functools import partial
+
+import pytest
+
+from benchmarks.synthetic import CATHAY_HEADER, cathay_rows
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.importers.chunks import (
+    csv_record_boundaries,
+    map_chunks_in_order,
+    read_csv_chunk,
+    split_csv_file,
+)
+
+# Quoted fields with newlines, doubled quotes and commas, as in Cathay exports
+TRICKY_ROWS = [
+    ["2024/01/02\n10:00", "2024/01/02", 'ATM "A"', "1,000", "", "9,000", "x", ""],
+    ["2024/01/03\n11:30", "2024/01/03", "line\nbreak", "", "500", "9,500", "", '"'],
+    ["2024/01/04\n12:45", "2024/01/04", '""', "", "", "", "\n\n", "end"],
+]
+
+
+def csv_bytes(rows: list[list[str]], line_terminator: str = "\r\n") -> bytes:
+    stream = io.StringIO(newline="")
+    writer = csv.writer(stream, lineterminator=line_terminator)
+    writer.writerow(CATHAY_HEADER)
+    writer.writerows(rows)
+    return stream.getvalue().encode()
+
+
+def read_whole(data: bytes) -> list[list[str]]:
+    return list(csv.reader(io.StringIO(data.decode(), newline=None)))
+
+
+@pytest.mark.parametrize("line_terminator", ["\r\n", "\n"])
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 30, 64, 1000])
+def test_chunks_end_at_record_boundaries(line_terminator, chunk_bytes):
+    data = csv_bytes(TRICKY_ROWS * 20, line_terminator)
+    chunks = csv_record_boundaries(data, chunk_bytes)
+
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+    # Reading each chunk on its own gives the same records as the whole file
+    rows = [row for start, end in chunks for row in read_whole(data[start:end])]
+    assert rows == read_whole(data)
+
+
+def test_read_csv_chunk_translates_line_endings(tmp_path):
+    path = tmp_path / "cathay.csv"
+    data = csv_bytes(TRICKY_ROWS)
+    path.write_bytes(data)
+
+    chunks = csv_record_boundaries(data, 30)
+    rows = [
+        row
+        for start, end in chunks
+        for row in read_csv_chunk(str(path), "utf-8", start, end)
+    ]
+
+    assert rows[1:] == TRICKY_ROWS
+
+
+def test_small_files_and_single_jobs_are_not_split(tmp_path):
+    path = tmp_path / "cathay.csv"
+    path.write_bytes(csv_bytes(TRICKY_ROWS * 100))
+
+    assert split_csv_file(str(path), "utf-8", 1, 100, min_bytes=0) is None
+    assert split_csv_file(str(path), "utf-8", 2, 100) is None
+    assert split_csv_file(str(path), "utf-16", 2, 100, min_bytes=0) is None
+    chunks = split_csv_file(str(path), "utf-8", 2, 100, min_bytes=0)
+    assert chunks is not None and len(chunks) > 1
+
+
+def test_chunks_parsed_in_workers_match_serial_parsing(tmp_path):
+    path = tmp_path / "cathay.csv"
+    rows = list(reversed(list(cathay_rows(2_000)))) + TRICKY_ROWS
+    data = csv_bytes(rows)
+    path.write_bytes(data)
+    importer = CathayCsvImporter()
+
+    serial = [
+        transaction
+        for _, transaction in importer.read_cathay_rows(
+            csv.reader(io.StringIO(data.decode(), newline=None)), None, None
+        )
+        if not isinstance(transaction, Exception)
+    ]
+    chunked = [
+        transaction
+        for _, transaction in map_chunks_in_order(
+            partial(importer.read_cathay_chunk, None, None),
+            str(path),
+            "utf-8",
+            csv_record_boundaries(data, 16 * 1024),
+            2,
+        )
+        if not isinstance(transaction, Exception)
+    ]
+
+    assert len(serial) > 2_000
+    assert chunked == serial
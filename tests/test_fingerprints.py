@@ -0,0 +1,35 @@
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from metamoney.fingerprints import FingerprintStore
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+
+
+def transaction(transaction_id: str) -> GenericTransaction:
+    return GenericTransaction(
+        transaction_id,
+        datetime(2024, 1, 1),
+        None,
+        None,
+        Decimal("1.00"),
+        None,
+        "NTD",
+        "Assets:Bank",
+        "cathay_tw",
+    )
+
+
+def test_read_only_relative_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = Path("fingerprints.sqlite3")
+    entries = [
+        JournalEntry(datetime(2024, 1, 1), "", (transaction(transaction_id),))
+        for transaction_id in ("a", "b", "a")
+    ]
+    with FingerprintStore(path) as store:
+        assert len(list(store.record_new(entries))) == 2
+
+    with FingerprintStore(path, read_only=True) as store:
+        unseen = store.unseen([transaction("a"), transaction("c")])
+        assert [t.transaction_id for t in unseen] == ["c"]
@@ -0,0 +1,107 @@
+import threading
+from itertools import count, islice
+
+import pytest
+
+from metamoney.pipeline import fan_out
+
+
+class SinkFailed(Exception):
+    pass
+
+
+def run(target, timeout: float = 10):
+    """Runs target on a thread, failing instead of hanging if it never returns."""
+    outcome: list[BaseException | None] = []
+
+    def call():
+        try:
+            target()
+            outcome.append(None)
+        except BaseException as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "fan_out blocked"
+    return outcome[0]
+
+
+def test_sink_error_reaches_caller_and_stops_the_others():
+    produced = count()
+    received: dict[str, int] = {"slow": 0, "fast": 0}
+
+    def failing(items):
+        for i, _ in enumerate(items):
+            if i == 50:
+                raise SinkFailed()
+
+    def counting(name):
+        def consume(items):
+            for _ in items:
+                received[name] += 1
+
+        return consume
+
+    # The producer never ends, so the other sinks only stop if they're told to
+    error = run(
+        lambda: fan_out(
+            produced,
+            [counting("slow"), failing, counting("fast")],
+            queue_size=1,
+            batch_size=4,
+        )
+    )
+    assert isinstance(error, SinkFailed)
+    produced_count = next(produced)
+    assert produced_count < 1000
+    assert all(items <= produced_count for items in received.values())
+
+
+def test_sink_which_stops_reading_doesnt_block_the_others():
+    totals = []
+
+    def first_only(items):
+        next(iter(items))
+
+    error = run(
+        lambda: fan_out(
+            range(10_000),
+            [first_only, lambda items: totals.append(sum(items))],
+            queue_size=1,
+            batch_size=8,
+        )
+    )
+    assert error is None
+    assert totals == [sum(range(10_000))]
+
+
+def test_producer_error_reaches_caller():
+    def items():
+        yield from range(100)
+        raise SinkFailed()
+
+    received = []
+    error = run(
+        lambda: fan_out(
+            items(),
+            [lambda items: received.extend(items) for _ in range(2)],
+            queue_size=1,
+            batch_size=8,
+        )
+    )
+    assert isinstance(error, SinkFailed)
+    assert len(received) <= 200
+
+
+@pytest.mark.parametrize("consumers", [1, 3])
+def test_every_sink_gets_every_item(consumers):
+    received = [[] for _ in range(consumers)]
+    fan_out(
+        islice(count(), 1_000),
+        [sink.extend for sink in received],
+        queue_size=2,
+        batch_size=7,
+    )
+    assert received == [list(range(1_000))] * consumers
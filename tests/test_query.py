@@ -0,0 +1,169 @@
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from metamoney.cli import metamoney
+from metamoney.exporters.sqlite import SqliteExporter
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+from metamoney.query import AccountTotal, JournalStore, parse_query
+
+
+def entry(
+    transaction_id: str, day: str, payee: str, amount: str, account: str
+) -> JournalEntry:
+    timestamp = datetime.fromisoformat(day)
+    asset = GenericTransaction(
+        transaction_id,
+        timestamp,
+        payee,
+        f"{payee} purchase",
+        Decimal(amount),
+        None,
+        "NTD",
+        "Assets:Bank",
+        "cathay_tw",
+    )
+    counter = GenericTransaction(
+        f"{transaction_id}-counter",
+        timestamp,
+        None,
+        None,
+        -Decimal(amount),
+        None,
+        "NTD",
+        account,
+        None,
+    )
+    return JournalEntry(timestamp, f"{payee} purchase", (asset, counter))
+
+
+ENTRIES = [
+    entry("1", "2024-01-05", "VULTR INC", "-10.00", "Expenses:Hosting"),
+    entry("2", "2024-02-10", "Coffee Shop", "-3.50", "Expenses:Food:Coffee"),
+    entry("3", "2024-02-29", "Grocer", "-20.25", "Expenses:Foodstuff"),
+    entry("4", "2024-12-31", "Employer", "1000.00", "Income:Salary"),
+    entry("5", "2025-01-02", "Vultr Inc", "-12.00", "Expenses:Hosting"),
+    # Decimal writes this one with an exponent, which totals add up apart
+    entry("6", "2025-03-01", "Gift Shop", "-1E+2", "Expenses:Gifts"),
+]
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> Path:
+    path = tmp_path / "journal.sqlite3"
+    SqliteExporter().export_to_path(path, ENTRIES)
+    return path
+
+
+def postings(database: Path, text: str, limit: int | None = None) -> list[tuple]:
+    with JournalStore(database) as store:
+        return [
+            (posting.timestamp[:10], posting.account, posting.amount)
+            for posting in store.postings(parse_query(text), limit)
+        ]
+
+
+@pytest.mark.parametrize(
+    "text, parameters, dated",
+    [
+        ("payee ~ VULTR", ("vultr",), False),
+        ('payee = "Coffee Shop"', ("Coffee Shop",), False),
+        ("payee!='Coffee Shop'", ("Coffee Shop",), False),
+        ("amount<=-1,000.5", (-1000.5,), False),
+        (
+            "account != Expenses:Food",
+            ("Expenses:Food", "Expenses:Food:", "Expenses:Food;"),
+            False,
+        ),
+        ("since 2024", ("2024-01-01",), True),
+        ("until 2024", ("2025-01-01",), True),
+        ("SINCE 2024-06 UNTIL 2024-12", ("2024-06-01", "2025-01-01"), True),
+        ("until 2024-02-29", ("2024-03-01",), True),
+        ("currency = NTD since 2024-02-10", ("NTD", "2024-02-10"), True),
+    ],
+)
+def test_parse_query(text, parameters, dated):
+    query = parse_query(text)
+    assert query.parameters == parameters
+    assert query.dated == dated
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "payee",
+        "payee ~",
+        "since",
+        "since 2024-13",
+        "until 2024-02-30",
+        "since last-year",
+        "colour = red",
+        "amount ~ 5",
+        "amount > lots",
+        "payee < x",
+        'payee = "unterminated',
+    ],
+)
+def test_parse_query_rejects(text):
+    with pytest.raises(ValueError):
+        parse_query(text)
+
+
+def test_postings(database):
+    assert postings(database, "payee ~ vultr") == [
+        ("2024-01-05", "Assets:Bank", Decimal("-10.00")),
+        ("2025-01-02", "Assets:Bank", Decimal("-12.00")),
+    ]
+    # Sub-accounts match, but accounts which only start with the same text don't
+    assert postings(database, "account = Expenses:Food") == [
+        ("2024-02-10", "Expenses:Food:Coffee", Decimal("3.50")),
+    ]
+    assert postings(database, "since 2024-02 until 2024-02 account ~ bank") == [
+        ("2024-02-10", "Assets:Bank", Decimal("-3.50")),
+        ("2024-02-29", "Assets:Bank", Decimal("-20.25")),
+    ]
+    assert postings(database, "amount < -50") == [
+        ("2024-12-31", "Income:Salary", Decimal("-1000.00")),
+        ("2025-03-01", "Assets:Bank", Decimal("-1E+2")),
+    ]
+    assert len(postings(database, "")) == 2 * len(ENTRIES)
+    assert len(postings(database, "", limit=3)) == 3
+
+
+def test_totals(database):
+    with JournalStore(database) as store:
+        assert store.totals(parse_query("")) == [
+            AccountTotal("Assets:Bank", "NTD", Decimal("854.25"), 6),
+            AccountTotal("Expenses:Food:Coffee", "NTD", Decimal("3.50"), 1),
+            AccountTotal("Expenses:Foodstuff", "NTD", Decimal("20.25"), 1),
+            AccountTotal("Expenses:Gifts", "NTD", Decimal("100"), 1),
+            AccountTotal("Expenses:Hosting", "NTD", Decimal("22.00"), 2),
+            AccountTotal("Income:Salary", "NTD", Decimal("-1000.00"), 1),
+        ]
+        assert store.totals(parse_query("account = Expenses until 2024")) == [
+            AccountTotal("Expenses:Food:Coffee", "NTD", Decimal("3.50"), 1),
+            AccountTotal("Expenses:Foodstuff", "NTD", Decimal("20.25"), 1),
+            AccountTotal("Expenses:Hosting", "NTD", Decimal("10.00"), 1),
+        ]
+        assert store.totals(parse_query("payee = nobody")) == []
+
+
+@pytest.mark.parametrize(
+    "options, expected",
+    [
+        ([], ["2024-01-05", "2025-01-02"]),
+        (["--totals"], ["Assets:Bank", "-22.00", "(2 postings)"]),
+    ],
+)
+def test_query_relative_database(database, monkeypatch, options, expected):
+    monkeypatch.chdir(database.parent)
+    result = CliRunner().invoke(
+        metamoney,
+        ["query", "--database", database.name, *options, "payee", "~", "vultr"],
+    )
+    assert result.exit_code == 0, result.output
+    for text in expected:
+        assert text in result.output
@@ -0,0 +1,120 @@
+import csv
+import logging
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from benchmarks.synthetic import CATHAY_HEADER, cathay_rows
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.mappers.mapper import GeneralMapper
+from metamoney.models.batches import TransactionBatch
+from metamoney.models.data_sources import DataSource
+from metamoney.models.filters import TransactionFilter
+from metamoney.models.stream_info import StreamInfo
+from metamoney.models.transactions import GenericTransaction
+from metamoney.reconcile import BalanceBreak, Reconciler
+from metamoney.workflow import journal_entries
+
+
+def ledger(count: int) -> list[GenericTransaction]:
+    transactions = []
+    balance = Decimal("1000.00")
+    for i in range(count):
+        amount = Decimal(f"{(i % 7) - 3}.25")
+        balance += amount
+        transactions.append(
+            GenericTransaction(
+                transaction_id=str(i),
+                timestamp=datetime(2024, 1, 1) + timedelta(hours=i),
+                payee=None,
+                description=None,
+                amount=amount,
+                balance=balance,
+                currency="NTD",
+                account="Assets:Checking",
+                institution=None,
+            )
+        )
+    return transactions
+
+
+def check(
+    transactions: list[GenericTransaction], use_numpy: bool, batch_size: int = 16
+) -> list[BalanceBreak]:
+    if use_numpy:
+        pytest.importorskip("numpy")
+    reconciler = Reconciler(use_numpy)
+    # Small batches, so running totals have to carry over between them
+    breaks = []
+    for start in range(0, len(transactions), batch_size):
+        batch = TransactionBatch.from_transactions(
+            transactions[start : start + batch_size]
+        )
+        breaks.extend(reconciler.check(batch))
+    return breaks
+
+
+@pytest.mark.parametrize("use_numpy", [False, True], ids=["python", "numpy"])
+def test_consistent_balances_pass(use_numpy):
+    assert check(ledger(100), use_numpy) == []
+
+
+@pytest.mark.parametrize("use_numpy", [False, True], ids=["python", "numpy"])
+def test_tampered_balance_is_flagged(use_numpy):
+    transactions = ledger(100)
+    original = transactions[40]
+    transactions[40] = replace(original, balance=original.balance + Decimal("0.01"))
+
+    breaks = check(transactions, use_numpy)
+
+    # The row after the tampered one breaks from it as well
+    assert [b.transaction_id for b in breaks] == ["40", "41"]
+    assert breaks[0].reported == original.balance + Decimal("0.01")
+    assert breaks[0].expected == original.balance
+
+
+def journal_statement(path, transaction_filter: TransactionFilter) -> int:
+    importer = CathayCsvImporter(jobs=1)
+    with open(path, newline="") as stream:
+        data_source = DataSource(
+            importer.data_institution(),
+            importer.data_format(),
+            StreamInfo(stream, str(path)),
+        )
+        return sum(
+            1
+            for _ in journal_entries(
+                importer,
+                data_source,
+                GeneralMapper([]),
+                transaction_filter=transaction_filter,
+                reconcile_balances=True,
+            )
+        )
+
+
+@pytest.mark.parametrize(
+    "transaction_filter",
+    [
+        TransactionFilter(since=date(2015, 3, 1)),
+        TransactionFilter(until=date(2015, 3, 1)),
+        TransactionFilter(since=date(2015, 2, 1), until=date(2015, 3, 1)),
+    ],
+)
+def test_filtered_statements_reconcile_every_row(tmp_path, caplog, transaction_filter):
+    rows = list(cathay_rows(1_000))
+    # Reconciling sees every row, so the newest balance is flagged whether
+    # or not the filter keeps its row
+    rows[-1][5] = "1"
+    path = tmp_path / "cathay.csv"
+    with open(path, "w", newline="") as stream:
+        writer = csv.writer(stream)
+        writer.writerow(CATHAY_HEADER)
+        writer.writerows(reversed(rows))
+
+    with caplog.at_level(logging.WARNING, logger="reconcile"):
+        assert journal_statement(path, transaction_filter) > 0
+
+    assert len(caplog.records) == 1
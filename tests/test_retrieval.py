@@ -0,0 +1,174 @@
+import asyncio
+import csv
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import CATHAY_HEADER, cathay_rows
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.retrieval import BrowserPool
+
+ACCOUNTS = {"1111111111": 30, "2222222222": 50, "3333333333": 70}
+
+LOGIN_PAGE = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+<label for="id-number">ID Number</label><input id="id-number">
+<label for="username">Username</label><input id="username">
+<label for="password">Password</label><input id="password" type="password">
+<button type="button">Login</button>
+<div id="js-otp-send">Send</div>
+<input placeholder="last 6 numbers">
+<button type="button">OK</button>
+<button type="button">暫時不用</button>
+{"".join(f'<a href="/account/{account_no}">{account_no}</a>' for account_no in ACCOUNTS)}
+</body></html>"""
+
+ACCOUNT_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+<button type="button">Print/Download</button>
+<a role="menuitem" href="/statement/{account_no}.csv" download>Download CSV</a>
+</body></html>"""
+
+
+def statement(account_no: str) -> bytes:
+    stream = io.StringIO(newline="")
+    writer = csv.writer(stream)
+    writer.writerow(CATHAY_HEADER)
+    writer.writerows(reversed(list(cathay_rows(ACCOUNTS[account_no]))))
+    return stream.getvalue().encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves just enough of the bank's site for scrape_cathay_async."""
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/statement/"):
+            body = statement(Path(path).stem)
+            content_type = "text/csv"
+        elif path.startswith("/account/"):
+            body = ACCOUNT_PAGE.format(account_no=Path(path).name).encode()
+            content_type = "text/html; charset=utf-8"
+        else:
+            body = LOGIN_PAGE.encode()
+            content_type = "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def require_chromium():
+    from playwright.sync_api import Error, sync_playwright
+
+    with sync_playwright() as playwright:
+        try:
+            playwright.chromium.launch().close()
+        except Error:
+            pytest.skip("Playwright's Chromium isn't installed")
+
+
+class FakeContext:
+    open = 0
+    most_open = 0
+
+    def __init__(self):
+        FakeContext.open += 1
+        FakeContext.most_open = max(FakeContext.most_open, FakeContext.open)
+
+    async def clear_cookies(self):
+        pass
+
+    async def close(self):
+        FakeContext.open -= 1
+
+
+class FakeBrowser:
+    async def new_context(self, **kwargs) -> FakeContext:
+        # Give every other retrieval the chance to start while this one waits
+        await asyncio.sleep(0.01)
+        return FakeContext()
+
+    async def close(self):
+        pass
+
+
+def test_pool_opens_at_most_size_contexts():
+    FakeContext.open = FakeContext.most_open = 0
+    pool = BrowserPool(size=2)
+    pool.browser = FakeBrowser()
+    running = 0
+    most_running = 0
+
+    async def retrieve():
+        nonlocal running, most_running
+        async with pool.context():
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def retrieve_all():
+        # The fake browser stands in for the one __aenter__ would launch
+        try:
+            await asyncio.gather(*(retrieve() for _ in range(8)))
+        finally:
+            await pool.__aexit__(None, None, None)
+
+    asyncio.run(retrieve_all())
+    assert FakeContext.most_open == 2
+    assert most_running == 2
+    assert FakeContext.open == 0
+
+
+def test_retrieve_many_from_stand_in(stand_in_url, tmp_path, monkeypatch):
+    require_chromium()
+    monkeypatch.setattr(CathayCsvImporter, "download_root", lambda self: str(tmp_path))
+    importer = CathayCsvImporter(base_url=stand_in_url, jobs=1)
+    accounts = [
+        {
+            "id_number": "A123456789",
+            "username": "user",
+            "password": "secret",
+            "account_no": account_no,
+        }
+        for account_no in ACCOUNTS
+    ]
+    prompts = []
+
+    def prompt(message: str) -> str:
+        prompts.append(message)
+        return "123456"
+
+    async def retrieve() -> dict[str, int]:
+        counts = {}
+        async with BrowserPool(size=2, headless=True, prompt_fn=prompt) as pool:
+            async for data_source in importer.retrieve_many(pool, accounts):
+                with data_source.stream.stream:
+                    transactions = list(
+                        importer.transform(importer.extract(data_source))
+                    )
+                account_no = Path(data_source.stream.name).stem.split("-")[-1]
+                counts[account_no] = len(transactions)
+        return counts
+
+    assert asyncio.run(retrieve()) == ACCOUNTS
+    assert len(prompts) == len(ACCOUNTS)
+    assert len(list(tmp_path.glob("*-cathay-*.csv"))) == len(ACCOUNTS)
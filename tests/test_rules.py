@@ -0,0 +1,123 @@
+import random
+from dataclasses import replace
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from metamoney.mappers.conditions import (
+    AllCondition,
+    AnyCondition,
+    TransactionFieldMatchesCondition,
+)
+from metamoney.mappers.mapper import (
+    AddCounterTransactionRemap,
+    Mapping,
+    SetNarrationRemap,
+)
+from metamoney.mappers.rules import compile_mappings
+from metamoney.models.transactions import GenericTransaction, JournalEntry
+
+PAYEES = ["VULTR INC", "7-ELEVEN", "FAMILY MART", "UBER EATS", "vultr", "", "A.B"]
+DESCRIPTIONS = ["ATM", "CARD", "FEE", "TRANSFER 7-ELEVEN", "MART FEE"]
+FIELDS = ["payee", "description", "account"]
+# Literal prefixes, patterns merged into one regex, and patterns which have to
+# be matched on their own
+PATTERNS = [
+    "^VULTR.*",
+    "VULTR",
+    "7-ELEVEN",
+    r"A\.B",
+    "^Assets.*",
+    "Expenses:Rule1",
+    "",
+    ".*MART",
+    "(?:UBER|TAI)",
+    "[A-Z]+ FEE$",
+    ".*FEE",
+    "A.B",
+    r"(\w)\1",
+    "(?i)vultr",
+    "(?P<name>FAMILY)",
+    "(?=.*EATS)",
+]
+
+
+def random_condition(rng: random.Random, depth: int = 0):
+    kind = rng.random()
+    if depth < 2 and kind < 0.2:
+        return AllCondition(
+            *(random_condition(rng, depth + 1) for _ in range(rng.randint(1, 3)))
+        )
+    if depth < 2 and kind < 0.4:
+        return AnyCondition(
+            *(random_condition(rng, depth + 1) for _ in range(rng.randint(1, 3)))
+        )
+    if kind < 0.45:
+        # A user-defined condition the compiler can't look inside
+        return lambda entry: len(entry.transactions) % 2 == 0
+    return TransactionFieldMatchesCondition(rng.choice(FIELDS), rng.choice(PATTERNS))
+
+
+def set_payee(payee: str):
+    # Changes a field other mappings match on, so they have to be checked again
+    def remap(entry: JournalEntry) -> JournalEntry:
+        return replace(
+            entry,
+            transactions=tuple(replace(t, payee=payee) for t in entry.transactions),
+        )
+
+    return remap
+
+
+def random_mappings(rng: random.Random, count: int) -> list[Mapping]:
+    mappings = []
+    for i in range(count):
+        remaps = [
+            rng.choice(
+                [
+                    SetNarrationRemap(f"Rule {i}"),
+                    AddCounterTransactionRemap(f"Expenses:Rule{i}"),
+                    set_payee(rng.choice(PAYEES)),
+                ]
+            )
+            for _ in range(rng.randint(1, 2))
+        ]
+        mappings.append(Mapping(random_condition(rng), remaps))
+    return mappings
+
+
+def random_entry(rng: random.Random, i: int) -> JournalEntry:
+    timestamp = datetime(2024, 1, 1, i % 24)
+    payee = rng.choice(PAYEES + [None])
+    transaction = GenericTransaction(
+        str(i),
+        timestamp,
+        payee,
+        rng.choice(DESCRIPTIONS + [None]),
+        Decimal(-i),
+        None,
+        "NTD",
+        "Assets:Checking:Cathay",
+        None,
+    )
+    return JournalEntry(timestamp, payee or "", (transaction,))
+
+
+def apply_naively(mappings: list[Mapping], entry: JournalEntry) -> JournalEntry:
+    for mapping in mappings:
+        if mapping.condition(entry):
+            for apply_fn in mapping.apply:
+                entry = apply_fn(entry)
+    return entry
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_compiled_plan_matches_naive_evaluation(seed):
+    rng = random.Random(seed)
+    mappings = random_mappings(rng, rng.randint(1, 12))
+    plan = compile_mappings(mappings)
+
+    for i in range(20):
+        entry = random_entry(rng, i)
+        assert plan.apply(entry) == apply_naively(mappings, entry)
@@ -0,0 +1,93 @@
+import sqlite3
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from metamoney.exporters.sqlite import SqliteExporter
+from metamoney.mappers.conditions import TransactionFieldMatchesCondition
+from metamoney.mappers.mapper import (
+    AddCounterTransactionRemap,
+    GeneralMapper,
+    InitialMapper,
+    Mapping,
+    SetNarrationRemap,
+)
+from metamoney.models.transactions import GenericTransaction
+
+PAYEES = ["VULTR INC", "7-ELEVEN", "VULTR INC", "UBER EATS"]
+
+
+def transactions() -> list[GenericTransaction]:
+    return [
+        GenericTransaction(
+            str(i),
+            datetime(2024, 1, 1) + timedelta(days=i),
+            payee,
+            f"{payee} CARD",
+            Decimal(f"-{i + 1}.50"),
+            None,
+            "NTD",
+            "Assets:Bank",
+            "cathay_tw",
+        )
+        for i, payee in enumerate(PAYEES)
+    ]
+
+
+def export(path, mappings: list[Mapping], batch_size: int):
+    entries = InitialMapper().map(transactions(), [])
+    SqliteExporter(batch_size).export_to_path(
+        path, GeneralMapper(mappings).map([], entries)
+    )
+
+
+def payee_mapping(pattern: str, narration: str, *accounts: str) -> Mapping:
+    return Mapping(
+        TransactionFieldMatchesCondition("payee", pattern),
+        [
+            SetNarrationRemap(narration),
+            *(AddCounterTransactionRemap(account) for account in accounts),
+        ],
+    )
+
+
+def test_export_again_replaces_entries(tmp_path):
+    path = tmp_path / "journal.sqlite3"
+    export(
+        path,
+        [
+            payee_mapping("^VULTR", "Hosting", "Expenses:Hosting"),
+            payee_mapping("^UBER", "Food", "Expenses:Food", "Expenses:Tips"),
+        ],
+        batch_size=1,
+    )
+    export(
+        path,
+        [
+            payee_mapping("^VULTR", "Cloud", "Expenses:Cloud"),
+            # Fewer postings than before, so the old ones have to go
+            payee_mapping("^UBER", "Delivery"),
+        ],
+        batch_size=3,
+    )
+
+    with sqlite3.connect(path) as connection:
+        narrations = connection.execute(
+            "SELECT id, narration FROM entries ORDER BY id"
+        ).fetchall()
+        postings = connection.execute(
+            "SELECT entry_id, position, account FROM postings ORDER BY entry_id, position"
+        ).fetchall()
+    assert narrations == [
+        ("0", "Cloud"),
+        ("1", "7-ELEVEN CARD"),
+        ("2", "Cloud"),
+        ("3", "Delivery"),
+    ]
+    assert postings == [
+        ("0", 0, "Assets:Bank"),
+        ("0", 1, "Expenses:Cloud"),
+        ("1", 0, "Assets:Bank"),
+        ("2", 0, "Assets:Bank"),
+        ("2", 1, "Expenses:Cloud"),
+        ("3", 0, "Assets:Bank"),
+    ]
@@ -0,0 +1,146 @@
+import csv
+import os
+from dataclasses import replace
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import CATHAY_HEADER, cathay_rows
+from metamoney.importers.cathay import CathayCsvImporter
+from metamoney.mappers.mapper import GeneralMapper
+from metamoney.models.batches import TransactionBatch
+from metamoney.models.data_sources import DataSource
+from metamoney.models.filters import TransactionFilter
+from metamoney.models.stream_info import StreamInfo
+from metamoney.models.transactions import GenericTransaction
+from metamoney.statement_cache import STATEMENT_SUFFIX, StatementCache
+from metamoney.workflow import journal_entries
+
+
+@pytest.fixture
+def statement(tmp_path: Path) -> Path:
+    path = tmp_path / "cathay.csv"
+    with open(path, "w", newline="") as stream:
+        writer = csv.writer(stream)
+        writer.writerow(CATHAY_HEADER)
+        writer.writerows(reversed(list(cathay_rows(200))))
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> StatementCache:
+    return StatementCache(tmp_path / "cache")
+
+
+def parse(path: Path) -> list[GenericTransaction]:
+    importer = CathayCsvImporter(jobs=1)
+    with open(path, newline="") as stream:
+        data_source = DataSource(
+            importer.data_institution(),
+            importer.data_format(),
+            StreamInfo(stream, str(path)),
+        )
+        return list(importer.transform(importer.extract(data_source)))
+
+
+def journal(
+    path: Path,
+    cache: StatementCache,
+    transaction_filter: TransactionFilter | None = None,
+    reconcile_balances: bool = False,
+) -> list:
+    importer = CathayCsvImporter(jobs=1)
+    with open(path, newline="") as stream:
+        data_source = DataSource(
+            importer.data_institution(),
+            importer.data_format(),
+            StreamInfo(stream, str(path)),
+        )
+        return list(
+            journal_entries(
+                importer,
+                data_source,
+                GeneralMapper([]),
+                transaction_filter=transaction_filter,
+                reconcile_balances=reconcile_balances,
+                statement_cache=cache,
+            )
+        )
+
+
+def entries(cache: StatementCache) -> list[Path]:
+    return sorted(cache.directory.glob(f"*{STATEMENT_SUFFIX}"))
+
+
+def test_round_trip(statement, cache):
+    transactions = parse(statement)
+    # Amounts with fewer places than the batch's scale keep their exponent
+    transactions[0] = replace(transactions[0], amount=Decimal("1.5"), balance=None)
+    key = cache.key(CathayCsvImporter(), statement)
+    assert list(cache.store(key, transactions)) == transactions
+
+    loaded = list(cache.get(key))
+    assert loaded == transactions
+    assert [repr(t) for t in loaded] == [repr(t) for t in transactions]
+    assert list(TransactionBatch.from_transactions(loaded)) == list(
+        TransactionBatch.from_transactions(transactions)
+    )
+
+
+def test_nothing_saved_if_not_read_to_the_end(statement, cache):
+    key = cache.key(CathayCsvImporter(), statement)
+    next(cache.store(key, parse(statement)))
+    assert cache.get(key) is None
+    assert entries(cache) == []
+
+
+def test_miss_after_version_change(statement, cache):
+    importer = CathayCsvImporter()
+    key = cache.key(importer, statement)
+    list(cache.store(key, parse(statement)))
+    assert cache.get(key) is not None
+
+    importer.version = "2"
+    changed_key = cache.key(importer, statement)
+    assert changed_key != key
+    assert cache.get(changed_key) is None
+
+
+def test_least_recently_used_are_evicted(statement, cache):
+    transactions = parse(statement)
+    for i, key in enumerate("abc"):
+        list(cache.store(key, transactions))
+        # Older than anything written from here on, in the order written
+        os.utime(cache.entry_path(key), ns=(i * 10**9, i * 10**9))
+    # Reading a makes it the most recently used, so b goes first
+    assert cache.get("a") is not None
+
+    cache.max_bytes = sum(path.stat().st_size for path in entries(cache))
+    list(cache.store("d", transactions))
+    assert [path.stem for path in entries(cache)] == ["a", "c", "d"]
+
+
+@pytest.mark.parametrize(
+    "transaction_filter",
+    [
+        TransactionFilter(since=date(2015, 1, 20)),
+        TransactionFilter(until=date(2015, 1, 20)),
+        TransactionFilter(accounts=frozenset({"Assets:Checking"})),
+    ],
+)
+@pytest.mark.parametrize("reconcile_balances", [False, True])
+def test_filtered_runs_never_save(
+    statement, cache, transaction_filter, reconcile_balances
+):
+    filtered = journal(statement, cache, transaction_filter, reconcile_balances)
+    assert filtered
+    assert entries(cache) == []
+
+    # They can still read what an unfiltered run saved
+    journal(statement, cache)
+    assert len(entries(cache)) == 1
+    cached = journal(statement, cache, transaction_filter, reconcile_balances)
+    assert cached == filtered
+    assert len(entries(cache)) == 1